@@ -0,0 +1,4 @@
+"""Minecraft 基岩版服务器与存档管理的核心逻辑 (不依赖 Qt).
+
+图形界面 (main_qt.py) 和命令行 (python -m bedrock_core) 共用这些模块.
+"""
@@ -0,0 +1,1050 @@
+"""世界备份: 文件夹/ZIP/增量快照备份, 恢复, 备份索引, 保留策略和校验"""
+
+import os
+import json
+import re
+import shutil
+import zipfile
+import tempfile
+import struct
+import contextlib
+import hashlib
+import zlib
+import collections
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from .storage import COPY_BUFFER_SIZE, replace_dir, ContentStore, lock_file, unlock_file
+from .trace import span, traced
+
+SNAPSHOT_STORE_DIRNAME = ".snapshot_store" # 增量快照的文件内容存储, 位于 world_backups 下
+SNAPSHOT_SUFFIX = ".snapshot.json" # 增量快照清单: world_backups/<世界>_backup_<时间>.snapshot.json
+SNAPSHOT_VERSION = 1
+ZIP_BACKUP_DEFAULT_LEVEL = 6
+STORED_BACKUP_EXTENSIONS = (".ldb",) # LevelDB tables are already zlib-compressed by Bedrock
+COMPRESSIBILITY_SAMPLE_SIZE = 64 * 1024 # 其它文件先压缩这么大的样本, 几乎无法压缩时直接存储
+COMPRESSED_MEMBER_SPOOL_LIMIT = 16 * 1024 * 1024
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_UTF8_FLAG = 0x800
+ZIP_DATA_DESCRIPTOR_FLAG = 0x8 # CRC 和大小写在成员数据之后的数据描述符中
+ZIP_DATA_DESCRIPTOR_SIGNATURE = 0x08074b50
+BACKUP_MANIFEST_DIRNAME = ".manifests" # 文件夹备份的文件清单 (路径/大小/mtime/SHA-256), 位于 world_backups 下
+BACKUP_CATALOG_FILENAME = ".backup_catalog.json" # world_backups 下的备份索引
+BACKUP_CATALOG_VERSION = 1
+BACKUP_TYPES = ("folder", "zip", "snapshot")
+BACKUP_NAME_PATTERN = re.compile(r"^(?P<world>.+)_backup_(?P<stamp>\d{8}_\d{6})(?:\.zip|\.snapshot\.json)?$")
+RETENTION_POLICY_FILENAME = ".retention.json" # world_backups 下按世界保存的保留策略
+RETENTION_DEFAULT_POLICY = {"enabled": False, "keep_last": 5, "hourly": 24, "daily": 7, "weekly": 4}
+RETENTION_PERIODS = (("hourly", "%Y%m%d%H"), ("daily", "%Y%m%d"), ("weekly", "%G%V")) # 各代的时间分桶方式
+VERIFY_ZIP_TASK_BYTES = 32 * 1024 * 1024 # 校验 ZIP 时每个任务读取的压缩数据量上限, 使取消和进度都及时
+
+
+def is_world_dir(world_path):
+    """判断目录是否为有效的世界文件夹 (包含 levelname.txt 或 level.dat)"""
+    return os.path.exists(os.path.join(world_path, "levelname.txt")) or \
+           os.path.exists(os.path.join(world_path, "level.dat"))
+
+
+def backup_world_name(backup_name):
+    """从 <世界名>_backup_<时间戳>[.zip|.snapshot.json] 中精确解析世界名, 不符合格式时返回 None"""
+    match = BACKUP_NAME_PATTERN.match(backup_name)
+    return match.group("world") if match else None
+
+
+def write_json_hashed(path, data):
+    """原子写入 JSON 文件并返回其内容的 SHA-256"""
+    content = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+    return hashlib.sha256(content).hexdigest()
+
+
+def load_snapshot_manifest(snapshot_path):
+    with open(snapshot_path, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"无效的快照文件: {os.path.basename(snapshot_path)}")
+    return snapshot
+
+
+def find_latest_snapshot(backup_dir, world_name):
+    """返回该世界最近一次增量快照的清单, 没有时返回 None"""
+    candidates = sorted((name for name in os.listdir(backup_dir)
+                         if backup_world_name(name) == world_name and name.endswith(SNAPSHOT_SUFFIX)),
+                        reverse=True)
+    for name in candidates:
+        try:
+            snapshot = load_snapshot_manifest(os.path.join(backup_dir, name))
+        except (OSError, ValueError):
+            continue
+        if snapshot.get("world") == world_name:
+            return snapshot
+    return None
+
+
+def create_world_snapshot(world_path, backup_dir, world_name, snapshot_name):
+    """创建增量快照: 记录每个文件的路径、大小、mtime 和 SHA-256, 只把新增或变化的文件写入快照存储.
+
+    大小和 mtime 与上一个快照相同的文件直接复用其哈希, 不再读取.
+    返回 (快照清单路径, 统计信息字典).
+    """
+    store = ContentStore(os.path.join(backup_dir, SNAPSHOT_STORE_DIRNAME))
+    # Shared store lock until the manifest names every object, so prune_snapshot_store() can't collect them
+    with store.lock():
+        previous = find_latest_snapshot(backup_dir, world_name)
+        previous_files = {entry["path"]: entry for entry in previous["files"]} if previous else {}
+
+        files = []
+        dirs = []
+        stats = {"files": 0, "reused": 0, "stored_files": 0, "bytes": 0, "stored_bytes": 0}
+        for root, dir_names, file_names in os.walk(world_path):
+            for dir_name in dir_names:
+                dirs.append(os.path.relpath(os.path.join(root, dir_name), world_path).replace(os.sep, "/"))
+            for file_name in file_names:
+                file_full_path = os.path.join(root, file_name)
+                rel_path = os.path.relpath(file_full_path, world_path).replace(os.sep, "/")
+                st = os.stat(file_full_path)
+                old = previous_files.get(rel_path)
+                if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns and \
+                   os.path.exists(store.object_path(old["sha256"])):
+                    digest = old["sha256"]
+                    stats["reused"] += 1
+                else:
+                    with span("store_snapshot_file", "backup", bytes=st.st_size):
+                        object_path = store.add_file(file_full_path)
+                    digest = os.path.basename(object_path)
+                    stats["stored_files"] += 1
+                    stats["stored_bytes"] += st.st_size
+                files.append({"path": rel_path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest})
+                stats["files"] += 1
+                stats["bytes"] += st.st_size
+
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "world": world_name,
+            "created": datetime.now().isoformat(),
+            "parent": previous.get("name") if previous else None,
+            "name": snapshot_name,
+            "dirs": dirs,
+            "files": files,
+        }
+        snapshot_path = os.path.join(backup_dir, snapshot_name + SNAPSHOT_SUFFIX)
+        # The snapshot only exists once all its objects are stored; its hash covers every file hash
+        with span("write_snapshot_manifest", "backup", files=len(files)):
+            stats["sha256"] = write_json_hashed(snapshot_path, snapshot)
+    return snapshot_path, stats
+
+
+def backup_manifest_path(backup_dir, backup_name):
+    return os.path.join(backup_dir, BACKUP_MANIFEST_DIRNAME, backup_name + ".json")
+
+
+def find_latest_folder_backup(backup_dir, world_name):
+    """返回 (备份名, 文件清单) 表示该世界最近一次带清单的文件夹备份, 没有时返回 (None, None)"""
+    candidates = sorted((name for name in os.listdir(backup_dir)
+                         if backup_world_name(name) == world_name and os.path.isdir(os.path.join(backup_dir, name))),
+                        reverse=True)
+    for name in candidates:
+        try:
+            with open(backup_manifest_path(backup_dir, name), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue # Created before manifests existed, or by hand
+        if manifest.get("world") == world_name:
+            return name, manifest
+    return None, None
+
+
+def copy_file_hashed(src_path, dest_path):
+    """复制文件 (保留 mtime 等属性) 并在复制过程中计算 SHA-256, 不额外读取"""
+    hasher = hashlib.sha256()
+    with open(src_path, 'rb') as src, open(dest_path, 'wb') as dst:
+        while True:
+            chunk = src.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            dst.write(chunk)
+    shutil.copystat(src_path, dest_path)
+    return hasher.hexdigest()
+
+
+def create_folder_backup(world_path, backup_dir, world_name, backup_name):
+    """创建完整可浏览的文件夹备份 (类似 rsync --link-dest).
+
+    与同一世界上一个文件夹备份相比大小、mtime 和 SHA-256 都相同的文件, 硬链接到上一个备份中的文件;
+    大小和 mtime 只用于筛选候选, 候选文件仍会读取并计算哈希 (mtime 精度内被改写或 mtime 被还原的文件不会被误链接).
+    其余文件在复制时计算哈希. 清单保存在 world_backups/.manifests/<备份名>.json. 返回统计信息字典.
+    """
+    previous_name, previous = find_latest_folder_backup(backup_dir, world_name)
+    previous_files = {entry["path"]: entry for entry in previous["files"]} if previous else {}
+    previous_path = os.path.join(backup_dir, previous_name) if previous_name else None
+
+    backup_path = os.path.join(backup_dir, backup_name)
+    partial_path = os.path.join(backup_dir, f".{backup_name}.partial") # Hidden until complete
+    stats = {"files": 0, "linked": 0, "copied": 0, "bytes": 0, "copied_bytes": 0}
+    files = []
+    try:
+        for root, dir_names, file_names in os.walk(world_path):
+            rel_root = os.path.relpath(root, world_path)
+            os.makedirs(os.path.normpath(os.path.join(partial_path, rel_root)), exist_ok=True)
+            for file_name in file_names:
+                file_full_path = os.path.join(root, file_name)
+                rel_path = os.path.normpath(os.path.join(rel_root, file_name)).replace(os.sep, "/")
+                dest_path = os.path.join(partial_path, rel_path)
+                st = os.stat(file_full_path)
+                old = previous_files.get(rel_path)
+                digest = None
+                if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                    with span("hash_file", "backup", bytes=st.st_size):
+                        source_digest = hash_file(file_full_path)
+                    if source_digest == old["sha256"]:
+                        try:
+                            os.link(os.path.join(previous_path, rel_path), dest_path)
+                            digest = source_digest
+                            stats["linked"] += 1
+                        except OSError:
+                            pass # Previous copy gone or not linkable (e.g. FAT): fall back to a copy
+                if digest is None:
+                    with span("copy_file_hashed", "backup", bytes=st.st_size):
+                        digest = copy_file_hashed(file_full_path, dest_path)
+                    stats["copied"] += 1
+                    stats["copied_bytes"] += st.st_size
+                files.append({"path": rel_path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest})
+                stats["files"] += 1
+                stats["bytes"] += st.st_size
+
+        manifest_path = backup_manifest_path(backup_dir, backup_name)
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        with span("write_backup_manifest", "backup", files=len(files)):
+            stats["sha256"] = write_json_hashed(manifest_path, {"version": 1, "world": world_name, "type": "folder",
+                                                                 "created": datetime.now().isoformat(),
+                                                                 "parent": previous_name, "files": files})
+        os.rename(partial_path, backup_path)
+    except BaseException:
+        shutil.rmtree(partial_path, ignore_errors=True)
+        raise
+    return stats
+
+
+class HashingWriter:
+    """包装只追加写入的文件对象, 在写入时计算 SHA-256 (避免写完后再读一遍)"""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.hasher = hashlib.sha256()
+
+    def write(self, data):
+        self.hasher.update(data)
+        return self.fileobj.write(data)
+
+    def tell(self):
+        return self.fileobj.tell()
+
+
+class ZipArchiveWriter:
+    """最小的 ZIP 写入器 (支持 ZIP64): 按顺序写入已经压缩好的成员数据, 最后写入中央目录.
+
+    zipfile.ZipFile 只能在写入时自己压缩, 无法写入在其它线程中预先压缩的数据, 因此这里直接生成 ZIP 结构.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.central_directory = []
+
+    def write_local_header(self, filename, flags, method, mtime, crc, file_size, compress_size, zip64_sizes):
+        header_offset = self.fileobj.tell()
+        local_extra = struct.pack("<HHQQ", 1, 16, file_size, compress_size) if zip64_sizes else b""
+        dos_time, dos_date = dos_datetime(mtime)
+        version = 45 if zip64_sizes or header_offset >= ZIP64_LIMIT else 20
+        self.fileobj.write(struct.pack(zipfile.structFileHeader, zipfile.stringFileHeader, version, 0, flags,
+                                       method, dos_time, dos_date, crc,
+                                       ZIP64_LIMIT if zip64_sizes else compress_size,
+                                       ZIP64_LIMIT if zip64_sizes else file_size,
+                                       len(filename), len(local_extra)))
+        self.fileobj.write(filename)
+        self.fileobj.write(local_extra)
+        return header_offset, dos_time, dos_date, version
+
+    def add(self, arcname, method, crc, file_size, compress_size, mtime, src):
+        """写入一个成员; src 为提供 compress_size 字节 (已压缩) 数据的文件对象"""
+        filename = arcname.encode('utf-8')
+        zip64_sizes = file_size >= ZIP64_LIMIT or compress_size >= ZIP64_LIMIT
+        header_offset, dos_time, dos_date, version = self.write_local_header(
+            filename, ZIP_UTF8_FLAG, method, mtime, crc, file_size, compress_size, zip64_sizes)
+        remaining = compress_size
+        while remaining > 0:
+            chunk = src.read(min(COPY_BUFFER_SIZE, remaining))
+            if not chunk:
+                raise IOError(f"写入 ZIP 成员时数据不完整: {arcname}")
+            self.fileobj.write(chunk)
+            remaining -= len(chunk)
+        self.central_directory.append((filename, ZIP_UTF8_FLAG, method, dos_time, dos_date, crc, file_size, compress_size,
+                                       header_offset, version))
+
+    def add_stored(self, arcname, mtime, src):
+        """写入一个不压缩 (STORED) 的成员: 复制 src 直到末尾, 同时计算 CRC 和大小, 写在数据之后的数据描述符中.
+
+        数据只读取一次, CRC 总是与写入的数据一致 (即使文件在备份过程中被修改). 返回 (crc32, 大小).
+        """
+        filename = arcname.encode('utf-8')
+        zip64_sizes = os.fstat(src.fileno()).st_size >= ZIP64_LIMIT
+        flags = ZIP_UTF8_FLAG | ZIP_DATA_DESCRIPTOR_FLAG
+        header_offset, dos_time, dos_date, version = self.write_local_header(
+            filename, flags, zipfile.ZIP_STORED, mtime, 0, 0, 0, zip64_sizes)
+        crc = 0
+        size = 0
+        while True:
+            chunk = src.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            self.fileobj.write(chunk)
+        if size >= ZIP64_LIMIT and not zip64_sizes:
+            raise IOError(f"文件在备份过程中增长到 4 GB 以上: {arcname}")
+        self.fileobj.write(struct.pack("<IIQQ" if zip64_sizes else "<IIII", ZIP_DATA_DESCRIPTOR_SIGNATURE, crc, size, size))
+        self.central_directory.append((filename, flags, zipfile.ZIP_STORED, dos_time, dos_date, crc, size, size,
+                                       header_offset, version))
+        return crc, size
+
+    def close(self):
+        cd_offset = self.fileobj.tell()
+        for filename, flags, method, dos_time, dos_date, crc, file_size, compress_size, header_offset, version in self.central_directory:
+            extra = b""
+            if file_size >= ZIP64_LIMIT or compress_size >= ZIP64_LIMIT or header_offset >= ZIP64_LIMIT:
+                # All three fields go to the ZIP64 extra field, in the order the spec requires
+                extra = struct.pack("<HHQQQ", 1, 24, file_size, compress_size, header_offset)
+                file_size = compress_size = header_offset = ZIP64_LIMIT
+            self.fileobj.write(struct.pack(zipfile.structCentralDir, zipfile.stringCentralDir, version, 3, version, 0,
+                                           flags, method, dos_time, dos_date, crc, compress_size, file_size,
+                                           len(filename), len(extra), 0, 0, 0, (0o100644 << 16), header_offset))
+            self.fileobj.write(filename)
+            self.fileobj.write(extra)
+        cd_end = self.fileobj.tell()
+        cd_size = cd_end - cd_offset
+        count = len(self.central_directory)
+        if count >= 0xFFFF or cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+            self.fileobj.write(struct.pack(zipfile.structEndArchive64, zipfile.stringEndArchive64,
+                                           44, 45, 45, 0, 0, count, count, cd_size, cd_offset))
+            self.fileobj.write(struct.pack(zipfile.structEndArchive64Locator, zipfile.stringEndArchive64Locator,
+                                           0, cd_end, 1))
+            count = min(count, 0xFFFF)
+            cd_size = min(cd_size, ZIP64_LIMIT)
+            cd_offset = min(cd_offset, ZIP64_LIMIT)
+        self.fileobj.write(struct.pack(zipfile.structEndArchive, zipfile.stringEndArchive,
+                                       0, 0, count, count, cd_size, cd_offset, 0))
+
+
+def dos_datetime(mtime):
+    t = time.localtime(mtime)
+    year = max(t.tm_year, 1980) # The DOS date format starts in 1980
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+@traced("compress_backup_member", "backup")
+def compress_backup_member(file_path, level):
+    """读取一个文件并选择压缩方式: .ldb 等已压缩的数据直接存储, 其余使用 deflate (样本几乎无法压缩时也改为存储).
+
+    返回 (方法, crc32, 原始大小, 压缩后大小, 压缩数据文件对象); 存储的成员返回 (ZIP_STORED, None, None, None, None),
+    在组装时由 ZipArchiveWriter.add_stored() 从源文件一次读取并计算 CRC.
+    """
+    if level == 0 or os.path.splitext(file_path)[1].lower() in STORED_BACKUP_EXTENSIONS:
+        return zipfile.ZIP_STORED, None, None, None, None
+    crc = 0
+    file_size = 0
+    with open(file_path, 'rb') as f:
+        chunk = f.read(COPY_BUFFER_SIZE)
+        if len(chunk) >= COMPRESSIBILITY_SAMPLE_SIZE:
+            sample = chunk[:COMPRESSIBILITY_SAMPLE_SIZE]
+            if len(zlib.compress(sample, 1)) > len(sample) * 0.95:
+                return zipfile.ZIP_STORED, None, None, None, None
+        compressed = tempfile.SpooledTemporaryFile(max_size=COMPRESSED_MEMBER_SPOOL_LIMIT)
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        while chunk:
+            crc = zlib.crc32(chunk, crc)
+            file_size += len(chunk)
+            compressed.write(compressor.compress(chunk))
+            chunk = f.read(COPY_BUFFER_SIZE)
+    compressed.write(compressor.flush())
+    compress_size = compressed.tell()
+    compressed.seek(0)
+    return zipfile.ZIP_DEFLATED, crc, file_size, compress_size, compressed
+
+
+def create_zip_backup(world_path, zip_path, level=ZIP_BACKUP_DEFAULT_LEVEL, max_workers=None):
+    """并行压缩世界文件并按顺序组装为 ZIP 备份; 先写入隐藏的临时文件, 完成后重命名. 返回统计信息字典"""
+    members = []
+    for root, _, files in os.walk(world_path):
+        for file in files:
+            file_full_path = os.path.join(root, file)
+            members.append((file_full_path, os.path.relpath(file_full_path, world_path).replace(os.sep, "/")))
+
+    max_workers = max_workers or os.cpu_count() or 1
+    stats = {"files": 0, "stored": 0, "bytes": 0, "compressed_bytes": 0}
+    partial_path = os.path.join(os.path.dirname(zip_path), f".{os.path.basename(zip_path)}.partial")
+    try:
+        with open(partial_path, 'wb') as out, ThreadPoolExecutor(max_workers=max_workers) as executor:
+            hashed_out = HashingWriter(out)
+            writer = ZipArchiveWriter(hashed_out)
+            pending = collections.deque()
+
+            def write_next():
+                file_full_path, archive_name, future = pending.popleft()
+                method, crc, file_size, compress_size, compressed = future.result()
+                mtime = os.path.getmtime(file_full_path)
+                if compressed is None:
+                    with open(file_full_path, 'rb') as src:
+                        _, file_size = writer.add_stored(archive_name, mtime, src)
+                    compress_size = file_size
+                else:
+                    with compressed:
+                        writer.add(archive_name, method, crc, file_size, compress_size, mtime, compressed)
+                stats["files"] += 1
+                stats["stored"] += method == zipfile.ZIP_STORED
+                stats["bytes"] += file_size
+                stats["compressed_bytes"] += compress_size
+
+            for file_full_path, archive_name in members:
+                pending.append((file_full_path, archive_name, executor.submit(compress_backup_member, file_full_path, level)))
+                if len(pending) >= max_workers * 2: # Bounded look-ahead keeps memory flat
+                    write_next()
+            while pending:
+                write_next()
+            writer.close()
+            stats["archive_bytes"] = hashed_out.tell()
+            stats["sha256"] = hashed_out.hasher.hexdigest()
+        os.replace(partial_path, zip_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+        raise
+    return stats
+
+
+def new_backup_name(world_name):
+    return f"{world_name}_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+
+def create_backup(world_path, backup_dir, world_name, backup_type, backup_name_base=None, zip_level=ZIP_BACKUP_DEFAULT_LEVEL):
+    """按类型 ("folder", "zip" 或 "snapshot") 备份世界, 返回 (备份名, 统计信息字典); 不写入备份索引 (见 record_backup)"""
+    backup_name_base = backup_name_base or new_backup_name(world_name)
+    os.makedirs(backup_dir, exist_ok=True)
+    with span("create_backup", "backup", world=world_name, type=backup_type) as trace_span:
+        if backup_type == "folder":
+            name, stats = backup_name_base, create_folder_backup(world_path, backup_dir, world_name, backup_name_base)
+        elif backup_type == "zip":
+            name = f"{backup_name_base}.zip"
+            stats = create_zip_backup(world_path, os.path.join(backup_dir, name), zip_level)
+        elif backup_type == "snapshot":
+            snapshot_path, stats = create_world_snapshot(world_path, backup_dir, world_name, backup_name_base)
+            name = os.path.basename(snapshot_path)
+        else:
+            raise ValueError(f"未知的备份类型: {backup_type}")
+        trace_span.add(files=stats["files"], bytes=stats["bytes"])
+    return name, stats
+
+
+def record_backup(backup_dir, name, world_name, backup_type, stats):
+    """把新备份写入备份索引 (ZIP 记录压缩包大小, 其它类型记录世界数据大小)"""
+    with span("record_backup", "backup", backup=name):
+        size = stats["archive_bytes"] if backup_type == "zip" else stats["bytes"]
+        with BackupCatalog(backup_dir).update() as catalog:
+            catalog.add(name, world_name, backup_type, size, stats["files"], stats["sha256"])
+
+
+class RestoreCancelled(Exception):
+    """恢复在替换目标世界之前被取消"""
+
+
+class RestoreProgress:
+    """在多个恢复线程间累计已写入的字节数并回调 progress(已完成, 总数); cancel_event 被设置后 check() 抛出 RestoreCancelled"""
+
+    def __init__(self, total, progress=None, cancel_event=None):
+        self.total = total
+        self.done = 0
+        self.progress = progress
+        self.cancel_event = cancel_event
+        self._lock = threading.Lock()
+
+    def check(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise RestoreCancelled()
+
+    def advance(self, nbytes):
+        with self._lock: # Report under the lock so progress never goes backwards
+            self.done += nbytes
+            if self.progress is not None:
+                self.progress(self.done, self.total)
+
+
+def restore_world_snapshot(snapshot_path, target_world_path, max_workers=None, progress=None, cancel_event=None):
+    """按快照清单从快照存储重建世界文件夹 (文件为独立副本, 并恢复原 mtime). 返回统计信息字典"""
+    snapshot = load_snapshot_manifest(snapshot_path)
+    tracker = RestoreProgress(sum(entry["size"] for entry in snapshot["files"]), progress, cancel_event)
+    store = ContentStore(os.path.join(os.path.dirname(snapshot_path), SNAPSHOT_STORE_DIRNAME))
+    os.makedirs(target_world_path, exist_ok=True)
+    for rel_dir in snapshot["dirs"]:
+        os.makedirs(os.path.join(target_world_path, rel_dir), exist_ok=True)
+    for entry in snapshot["files"]:
+        if not os.path.exists(store.object_path(entry["sha256"])):
+            raise ValueError(f"快照数据缺失: {entry['path']}")
+        os.makedirs(os.path.dirname(os.path.join(target_world_path, entry["path"])), exist_ok=True)
+
+    def restore_entry(entry):
+        tracker.check()
+        dest_path = os.path.join(target_world_path, entry["path"])
+        # materialize() never hardlinks: the server rewrites world files in place, which would corrupt the store
+        with span("restore_snapshot_file", "restore", bytes=entry["size"]):
+            store.materialize(store.object_path(entry["sha256"]), dest_path)
+        if os.path.getsize(dest_path) != entry["size"]:
+            raise ValueError(f"恢复后的文件大小不符: {entry['path']}")
+        os.utime(dest_path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+        tracker.advance(entry["size"])
+        return entry["size"]
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        sizes = list(executor.map(restore_entry, snapshot["files"]))
+    return {"files": len(sizes), "bytes": sum(sizes)}
+
+
+def restore_folder_backup(backup_path, target_world_path, manifest=None, max_workers=None, progress=None, cancel_event=None):
+    """并行复制文件夹备份; 有备份清单时逐个校验 SHA-256, 否则校验文件大小. 返回统计信息字典"""
+    expected = {entry["path"]: entry for entry in manifest["files"]} if manifest else None
+    copies = []
+    total = 0
+    for root, _, file_names in os.walk(backup_path):
+        rel_root = os.path.relpath(root, backup_path)
+        os.makedirs(os.path.normpath(os.path.join(target_world_path, rel_root)), exist_ok=True)
+        for file_name in file_names:
+            copies.append(os.path.normpath(os.path.join(rel_root, file_name)).replace(os.sep, "/"))
+            total += os.path.getsize(os.path.join(root, file_name))
+    if expected is not None and set(copies) != set(expected):
+        raise ValueError("备份文件与备份清单不一致, 备份可能已被修改")
+    tracker = RestoreProgress(total, progress, cancel_event)
+
+    def copy_entry(rel_path):
+        tracker.check()
+        src_path = os.path.join(backup_path, rel_path)
+        dest_path = os.path.join(target_world_path, rel_path)
+        with span("copy_file_hashed", "restore") as trace_span:
+            digest = copy_file_hashed(src_path, dest_path)
+            size = os.path.getsize(dest_path)
+            trace_span.add(bytes=size)
+        if expected is not None and digest != expected[rel_path]["sha256"]:
+            raise ValueError(f"文件校验失败: {rel_path}")
+        if size != os.path.getsize(src_path):
+            raise ValueError(f"恢复后的文件大小不符: {rel_path}")
+        tracker.advance(size)
+        return size
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        sizes = list(executor.map(copy_entry, copies))
+    return {"files": len(sizes), "bytes": sum(sizes)}
+
+
+def zip_member_dest(dest_root, filename):
+    """返回 ZIP 成员在 dest_root 中的目标路径; 拒绝绝对路径和 '..', 防止写到目标目录之外"""
+    parts = [part for part in filename.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or ".." in parts or os.path.isabs(filename) or ":" in parts[0]:
+        raise ValueError(f"ZIP 中包含不安全的路径: {filename}")
+    return os.path.join(dest_root, *parts)
+
+
+def extract_zip_members(zip_path, infos, dest_root, tracker=None):
+    """在独立的 ZipFile 句柄中解压一组成员 (读取到末尾时 zipfile 会校验 CRC), 返回写入的字节数"""
+    total = 0
+    with span("extract_zip_members", "restore", files=len(infos)) as trace_span, zipfile.ZipFile(zip_path, 'r') as zf:
+        for info in infos:
+            if tracker is not None:
+                tracker.check()
+            dest_path = zip_member_dest(dest_root, info.filename)
+            with zf.open(info) as src, open(dest_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            if os.path.getsize(dest_path) != info.file_size:
+                raise ValueError(f"恢复后的文件大小不符: {info.filename}")
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            os.utime(dest_path, (mtime, mtime))
+            total += info.file_size
+            if tracker is not None:
+                tracker.advance(info.file_size)
+        trace_span.add(bytes=total)
+    return total
+
+
+def balance_zip_members(file_infos, group_count):
+    """把 ZIP 成员按压缩后大小贪心地分成最多 group_count 组, 使各组数据量接近"""
+    groups = [[] for _ in range(max(1, min(group_count, len(file_infos))))]
+    group_sizes = [0] * len(groups)
+    for info in sorted(file_infos, key=lambda i: i.compress_size, reverse=True):
+        smallest = group_sizes.index(min(group_sizes))
+        groups[smallest].append(info)
+        group_sizes[smallest] += info.compress_size
+    return groups
+
+
+def restore_zip_backup(zip_path, target_world_path, max_workers=None, progress=None, cancel_event=None):
+    """并行解压 ZIP 备份: 成员按大小分成若干组, 每个线程用自己的 ZipFile 句柄解压一组. 返回统计信息字典"""
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        infos = zf.infolist()
+    os.makedirs(target_world_path, exist_ok=True)
+    file_infos = []
+    for info in infos:
+        if info.is_dir():
+            os.makedirs(zip_member_dest(target_world_path, info.filename), exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(zip_member_dest(target_world_path, info.filename)), exist_ok=True)
+            file_infos.append(info)
+
+    tracker = RestoreProgress(sum(info.file_size for info in file_infos), progress, cancel_event)
+    groups = balance_zip_members(file_infos, max_workers or os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        sizes = list(executor.map(lambda group: extract_zip_members(zip_path, group, target_world_path, tracker), groups))
+    return {"files": len(file_infos), "bytes": sum(sizes)}
+
+
+def restore_world_backup(backup_path, target_world_path, keep_old=False, max_workers=None, progress=None, cancel_event=None):
+    """把备份恢复到 worlds 目录下隐藏的暂存目录, 校验通过后用重命名替换目标世界; 失败或取消时目标世界保持不变.
+
+    keep_old 为 True 时旧世界改名为 <世界名>_before_restore_<时间> 保留, 否则删除. progress(已恢复字节, 总字节) 在恢复线程中调用;
+    cancel_event 被设置时在替换目标世界之前抛出 RestoreCancelled. 返回 (统计信息, 保留的旧世界路径或 None).
+    """
+    worlds_dir = os.path.dirname(target_world_path)
+    world_name = os.path.basename(target_world_path)
+    os.makedirs(worlds_dir, exist_ok=True)
+    staging_path = tempfile.mkdtemp(prefix=f".{world_name}.restore-", dir=worlds_dir)
+    try:
+        with span("restore_world_backup", "restore", backup=os.path.basename(backup_path), world=world_name) as trace_span:
+            if os.path.isdir(backup_path):
+                manifest = None
+                manifest_path = backup_manifest_path(os.path.dirname(backup_path), os.path.basename(backup_path))
+                if os.path.exists(manifest_path):
+                    with open(manifest_path, 'r', encoding='utf-8') as f:
+                        manifest = json.load(f)
+                stats = restore_folder_backup(backup_path, staging_path, manifest, max_workers, progress, cancel_event)
+            elif backup_path.endswith(".zip"):
+                stats = restore_zip_backup(backup_path, staging_path, max_workers, progress, cancel_event)
+            elif backup_path.endswith(SNAPSHOT_SUFFIX):
+                stats = restore_world_snapshot(backup_path, staging_path, max_workers, progress, cancel_event)
+            else:
+                raise ValueError(f"未知的备份格式: {os.path.basename(backup_path)}")
+            if not is_world_dir(staging_path):
+                raise ValueError("备份中没有找到 levelname.txt 或 level.dat, 不是有效的世界")
+            trace_span.add(files=stats["files"], bytes=stats["bytes"])
+            if cancel_event is not None and cancel_event.is_set(): # Last chance to cancel: the swap below is not undone
+                raise RestoreCancelled()
+
+            kept_path = None
+            if keep_old and os.path.exists(target_world_path):
+                kept_path = os.path.join(worlds_dir, f"{world_name}_before_restore_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+            with span("replace_world_dir", "restore"):
+                replace_dir(staging_path, target_world_path, worlds_dir, keep_old_path=kept_path)
+    except BaseException:
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise
+    return stats, kept_path
+
+
+class BackupCatalog:
+    """world_backups 中所有备份的索引 (JSON 文件): 世界名、类型、创建时间、大小、文件数和 SHA-256 校验和.
+
+    备份创建时由 add() 记录; sync() 移除已被删除的备份, 并按名称补录不是通过本工具创建的备份 (没有校验和).
+    图形界面的多个后台任务和命令行可能同时修改索引, 修改必须放在 update() 中进行.
+    """
+
+    def __init__(self, backup_dir):
+        self.backup_dir = backup_dir
+        self.catalog_path = os.path.join(backup_dir, BACKUP_CATALOG_FILENAME)
+        self.lock_path = self.catalog_path + ".lock"
+        self.entries = {}
+        self.last_scrub = None # ISO time of the last full verification
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        self.entries = {}
+        self.last_scrub = None
+        self.dirty = False
+        try:
+            with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get("version") == BACKUP_CATALOG_VERSION:
+                self.entries = data.get("backups", {})
+                self.last_scrub = data.get("last_scrub")
+        except (OSError, ValueError):
+            pass # Missing or corrupt catalog: sync() rebuilds it from the folder names
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(self.backup_dir, exist_ok=True)
+        temp_path = self.catalog_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": BACKUP_CATALOG_VERSION, "backups": self.entries, "last_scrub": self.last_scrub},
+                      f, ensure_ascii=False)
+        os.replace(temp_path, self.catalog_path)
+        self.dirty = False
+
+    @contextlib.contextmanager
+    def update(self):
+        """持有索引的跨进程锁, 重新读取索引, 修改后写回 (临时文件 + 重命名); 其它进程和线程的修改不会被覆盖"""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        with open(self.lock_path, 'a+b') as f:
+            lock_file(f)
+            try:
+                self.load()
+                try:
+                    yield self
+                finally:
+                    self.save()
+            finally:
+                unlock_file(f)
+
+    def add(self, name, world, backup_type, size, files, checksum=None, created=None):
+        self.entries[name] = {
+            "world": world,
+            "type": backup_type,
+            "created": created or datetime.now().isoformat(timespec="seconds"),
+            "bytes": size,
+            "files": files,
+            "sha256": checksum,
+        }
+        self.dirty = True
+
+    def remove(self, name):
+        if self.entries.pop(name, None) is not None:
+            self.dirty = True
+
+    def sync(self, names=None):
+        """让索引与目录内容一致; names 为已知的目录项 (省略时读取目录)"""
+        if names is None:
+            names = {name for name in os.listdir(self.backup_dir) if not name.startswith(".")}
+        for name in list(self.entries):
+            if name not in names:
+                self.remove(name)
+        for name in names - self.entries.keys():
+            described = describe_backup(self.backup_dir, name)
+            if described is not None:
+                self.add(name, *described)
+
+    def record_verification(self, name, state):
+        if name in self.entries:
+            self.entries[name]["verified"] = datetime.now().isoformat(timespec="seconds")
+            self.entries[name]["verify_state"] = state
+            self.dirty = True
+
+    def backups_for(self, world_name):
+        """返回该世界的 [(备份名, 条目)], 最新的在前"""
+        return sorted(((name, entry) for name, entry in self.entries.items() if entry["world"] == world_name),
+                      key=lambda item: (item[1]["created"], item[0]), reverse=True)
+
+
+def describe_backup(backup_dir, name):
+    """为目录中已有的备份生成索引信息 (world, type, bytes, files, sha256, created); 无法识别时返回 None"""
+    match = BACKUP_NAME_PATTERN.match(name)
+    if not match:
+        return None
+    path = os.path.join(backup_dir, name)
+    created = datetime.strptime(match.group("stamp"), "%Y%m%d_%H%M%S").isoformat()
+    try:
+        if os.path.isdir(path):
+            sizes = [os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(path) for file in files]
+            return match.group("world"), "folder", sum(sizes), len(sizes), None, created
+        if name.endswith(".zip"):
+            with zipfile.ZipFile(path, 'r') as zf:
+                count = sum(1 for info in zf.infolist() if not info.is_dir())
+            return match.group("world"), "zip", os.path.getsize(path), count, None, created
+        if name.endswith(SNAPSHOT_SUFFIX):
+            snapshot = load_snapshot_manifest(path)
+            return match.group("world"), "snapshot", sum(entry["size"] for entry in snapshot["files"]), \
+                len(snapshot["files"]), None, created
+    except (OSError, ValueError, zipfile.BadZipFile):
+        pass
+    return None
+
+
+def load_retention_policies(backup_dir):
+    try:
+        with open(os.path.join(backup_dir, RETENTION_POLICY_FILENAME), 'r', encoding='utf-8') as f:
+            policies = json.load(f)
+        return policies if isinstance(policies, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_retention_policies(backup_dir, policies):
+    os.makedirs(backup_dir, exist_ok=True)
+    policy_path = os.path.join(backup_dir, RETENTION_POLICY_FILENAME)
+    with open(policy_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(policies, f, ensure_ascii=False, indent=2)
+    os.replace(policy_path + ".tmp", policy_path)
+
+
+def retention_policy_for(policies, world_name):
+    return {**RETENTION_DEFAULT_POLICY, **policies.get(world_name, {})}
+
+
+def select_expired_backups(backups, policy):
+    """按 GFS 规则选出过期的备份名: 保留最近 keep_last 个, 以及最近若干小时/天/周中每段时间最新的一个.
+
+    backups 为 BackupCatalog.backups_for() 的结果 (最新的在前); 最新的备份总是保留.
+    """
+    keep = {name for name, _ in backups[:max(1, policy["keep_last"])]}
+    for period, bucket_format in RETENTION_PERIODS:
+        seen = set()
+        for name, entry in backups:
+            if len(seen) >= policy[period]:
+                break
+            bucket = datetime.fromisoformat(entry["created"]).strftime(bucket_format)
+            if bucket not in seen:
+                seen.add(bucket)
+                keep.add(name)
+    return [name for name, _ in backups if name not in keep]
+
+
+def delete_backup(backup_dir, name):
+    """删除一个备份并返回实际释放的字节数 (与其它备份硬链接共享的文件不计入)"""
+    path = os.path.join(backup_dir, name)
+    freed = 0
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for file in files:
+                st = os.lstat(os.path.join(root, file))
+                if st.st_nlink <= 1:
+                    freed += st.st_size
+        shutil.rmtree(path)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(backup_manifest_path(backup_dir, name))
+    elif os.path.exists(path):
+        freed = os.path.getsize(path)
+        os.unlink(path)
+    return freed
+
+
+def prune_snapshot_store(backup_dir):
+    """删除不再被任何增量快照引用的快照存储对象, 返回释放的字节数.
+
+    在存储的独占锁下进行: 正在创建 (已写入对象但清单尚未写入) 的快照持有共享锁, 清理会等待它完成.
+    """
+    store_root = os.path.join(backup_dir, SNAPSHOT_STORE_DIRNAME)
+    if not os.path.isdir(store_root):
+        return 0
+    store = ContentStore(store_root)
+    freed = 0
+    with store.lock(exclusive=True):
+        referenced = set()
+        for name in os.listdir(backup_dir):
+            if name.endswith(SNAPSHOT_SUFFIX):
+                try:
+                    snapshot = load_snapshot_manifest(os.path.join(backup_dir, name))
+                except (OSError, ValueError):
+                    return 0 # An unreadable snapshot might still need its objects; keep everything
+                referenced.update(entry["sha256"] for entry in snapshot["files"])
+        for prefix in os.listdir(store.objects_dir):
+            prefix_dir = os.path.join(store.objects_dir, prefix)
+            for digest in os.listdir(prefix_dir):
+                if digest not in referenced:
+                    object_path = os.path.join(prefix_dir, digest)
+                    freed += os.path.getsize(object_path)
+                    os.unlink(object_path)
+    return freed
+
+
+def apply_retention(backup_dir, world_names=None, cancel_event=None):
+    """按各世界的保留策略删除过期备份 (world_names 为 None 时处理所有世界). 返回 (已删除的备份名列表, 释放的字节数).
+
+    整个过程持有备份索引的锁, 同时完成的新备份会等到清理结束后再写入索引.
+    """
+    deleted = []
+    freed = 0
+    with BackupCatalog(backup_dir).update() as catalog:
+        catalog.sync()
+        policies = load_retention_policies(backup_dir)
+        if world_names is None:
+            world_names = {entry["world"] for entry in catalog.entries.values()}
+        for world_name in sorted(world_names):
+            policy = retention_policy_for(policies, world_name)
+            if not policy["enabled"]:
+                continue
+            for name in select_expired_backups(catalog.backups_for(world_name), policy):
+                if cancel_event is not None and cancel_event.is_set():
+                    return deleted, freed
+                freed += delete_backup(backup_dir, name)
+                catalog.remove(name)
+                deleted.append(name)
+        if any(name.endswith(SNAPSHOT_SUFFIX) for name in deleted):
+            freed += prune_snapshot_store(backup_dir)
+    return deleted, freed
+
+
+def hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def split_zip_members(file_infos, max_bytes=None):
+    """按压缩包中的顺序把成员分成压缩数据量不超过 max_bytes (默认 VERIFY_ZIP_TASK_BYTES) 的连续小组 (超过上限的成员单独一组)"""
+    max_bytes = max_bytes or VERIFY_ZIP_TASK_BYTES
+    groups = []
+    group_bytes = 0
+    for info in sorted(file_infos, key=lambda i: i.header_offset):
+        if not groups or group_bytes + info.compress_size > max_bytes:
+            groups.append([])
+            group_bytes = 0
+        groups[-1].append(info)
+        group_bytes += info.compress_size
+    return groups
+
+
+def check_zip_members(zip_path, infos, cancel_event=None):
+    """流式读取一组 ZIP 成员 (zipfile 在读到末尾时校验 CRC), 返回问题列表; cancel_event 被设置时在下一块数据前停止"""
+    problems = []
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        for info in infos:
+            try:
+                with zf.open(info) as src:
+                    while src.read(COPY_BUFFER_SIZE):
+                        if cancel_event is not None and cancel_event.is_set():
+                            return problems
+            except (zipfile.BadZipFile, zlib.error, EOFError, OSError) as e:
+                problems.append(f"{info.filename}: {e}")
+    return problems
+
+
+def check_hashed_file(path, size, digest):
+    """校验文件大小和 SHA-256, 返回问题描述, 没有问题时返回 None"""
+    try:
+        actual_size = os.path.getsize(path)
+        if actual_size != size:
+            return f"大小为 {actual_size}, 应为 {size} (文件被截断或修改)"
+        if hash_file(path) != digest:
+            return "SHA-256 不匹配"
+    except OSError as e:
+        return e.strerror or str(e)
+    return None
+
+
+def check_backup_file(path, item, object_results=None):
+    """校验清单中的一个文件; object_results 用于在多个快照之间共享同一存储对象的校验结果"""
+    if object_results is not None and item["sha256"] in object_results:
+        problem = object_results[item["sha256"]]
+    else:
+        problem = check_hashed_file(path, item["size"], item["sha256"])
+        if object_results is not None:
+            object_results[item["sha256"]] = problem
+    return [f"{item['path']}: {problem}"] if problem else []
+
+
+def plan_backup_verification(backup_dir, name, entry, object_results=None, cancel_event=None):
+    """把一个备份的校验拆成可并行执行的任务. 返回 (任务列表, 规划阶段已发现的问题, 是否可校验)"""
+    path = os.path.join(backup_dir, name)
+    checksum = entry.get("sha256") if entry else None
+    if not os.path.exists(path):
+        return [], ["备份文件不存在"], True
+
+    if name.endswith(".zip"):
+        try:
+            with zipfile.ZipFile(path, 'r') as zf:
+                file_infos = [info for info in zf.infolist() if not info.is_dir()]
+        except (zipfile.BadZipFile, OSError) as e:
+            return [], [f"无法读取 ZIP 目录 (文件可能被截断): {e}"], True
+        problems = []
+        if entry and entry.get("files") is not None and entry["files"] != len(file_infos):
+            problems.append(f"成员数为 {len(file_infos)}, 索引中记录为 {entry['files']}")
+        tasks = [lambda group=group: check_zip_members(path, group, cancel_event) for group in split_zip_members(file_infos)]
+        return tasks, problems, True
+
+    if name.endswith(SNAPSHOT_SUFFIX):
+        try:
+            if checksum and hash_file(path) != checksum:
+                return [], ["快照清单的 SHA-256 与索引不符"], True
+            snapshot = load_snapshot_manifest(path)
+        except (OSError, ValueError) as e:
+            return [], [f"无法读取快照清单: {e}"], True
+        store = ContentStore(os.path.join(backup_dir, SNAPSHOT_STORE_DIRNAME))
+        tasks = [lambda item=item: check_backup_file(store.object_path(item["sha256"]), item, object_results)
+                 for item in snapshot["files"]]
+        return tasks, [], True
+
+    manifest_path = backup_manifest_path(backup_dir, name)
+    if not os.path.exists(manifest_path):
+        return [], ["没有文件清单 (不是由本工具创建的文件夹备份), 无法校验"], False
+    try:
+        if checksum and hash_file(manifest_path) != checksum:
+            return [], ["文件清单的 SHA-256 与索引不符"], True
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        return [], [f"无法读取文件清单: {e}"], True
+    expected = {item["path"] for item in manifest["files"]}
+    actual = set()
+    for root, _, files in os.walk(path):
+        for file in files:
+            actual.add(os.path.relpath(os.path.join(root, file), path).replace(os.sep, "/"))
+    problems = [f"{rel_path}: 文件缺失" for rel_path in sorted(expected - actual)]
+    problems += [f"{rel_path}: 清单中没有的文件" for rel_path in sorted(actual - expected)]
+    tasks = [lambda item=item: check_backup_file(os.path.join(path, item["path"]), item)
+             for item in manifest["files"] if item["path"] in actual]
+    return tasks, problems, True
+
+
+def verify_backups(backup_dir, names, catalog_entries=None, max_workers=None, progress=None, cancel_event=None):
+    """并行校验多个备份 (所有备份的任务共用一个线程池).
+
+    返回 {备份名: (状态, 问题列表)}, 状态为 "ok"、"corrupt" 或 "unverifiable"; 取消时未完成的备份不在结果中.
+    """
+    catalog_entries = catalog_entries or {}
+    max_workers = max_workers or os.cpu_count() or 1
+    plans = {}
+    object_results = {} # Snapshots share store objects: hash each one once
+    for name in names:
+        plans[name] = plan_backup_verification(backup_dir, name, catalog_entries.get(name), object_results, cancel_event)
+
+    total = sum(len(tasks) for tasks, _, _ in plans.values())
+    done = 0
+    remaining = {name: len(tasks) for name, (tasks, _, _) in plans.items()}
+    problems = {name: list(found) for name, (_, found, _) in plans.items()}
+    results = {}
+
+    def finish(name):
+        _, _, verifiable = plans[name]
+        if problems[name] and verifiable:
+            results[name] = ("corrupt", problems[name])
+        else:
+            results[name] = ("ok" if verifiable else "unverifiable", problems[name])
+
+    for name, count in remaining.items():
+        if count == 0:
+            finish(name)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for name, (tasks, _, _) in plans.items():
+            for task in tasks:
+                futures[executor.submit(task)] = name
+        for future in futures:
+            if cancel_event is None or not cancel_event.is_set():
+                result = future.result()
+            if cancel_event is not None and cancel_event.is_set():
+                # A task that stopped early returned partial results; don't report its backup as verified
+                for pending in futures:
+                    pending.cancel()
+                break
+            name = futures[future]
+            problems[name].extend(result)
+            remaining[name] -= 1
+            done += 1
+            if remaining[name] == 0:
+                finish(name)
+            if progress is not None:
+                progress(done, total)
+    return results
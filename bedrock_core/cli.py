@@ -0,0 +1,265 @@
+"""命令行入口: python -m bedrock_core <命令> <服务器根目录> [参数...]
+
+不导入 Qt, 每个命令只在执行时导入它用到的模块, 适合在 cron 等无界面环境中使用.
+start/stop/send/status 通过后台守护进程 (见 daemon.py) 控制服务器; 由图形界面启动的服务器不受其管理.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+
+def fail(message):
+    print(f"错误: {message}", file=sys.stderr)
+    return 1
+
+
+def world_path_for(server_root, world_name):
+    world_path = os.path.join(server_root, "worlds", world_name)
+    if not os.path.isdir(world_path):
+        raise ValueError(f"世界目录不存在: {world_path}")
+    return world_path
+
+
+def active_world_is_running(server_root, world_name):
+    """服务器是否由守护进程运行且正在使用该世界"""
+    from .server import read_server_properties
+    from .daemon import daemon_running
+    return world_name == read_server_properties(server_root).get("level-name") and daemon_running(server_root)
+
+
+def cmd_scan(args):
+    from .packs import scan_server_packs
+    results = scan_server_packs(args.server_root)
+    rows = [{"type": pack_type, "folder": folder_name, "name": details["name"], "uuid": details["uuid"],
+             "version": details["version_display"], "error": details["error"]}
+            for pack_type, packs in results.items() for folder_name, _, _, details in packs]
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+    for row in rows:
+        line = f"{row['type']}\t{row['folder']}\t{row['name']}\t{row['version']}\t{row['uuid']}"
+        print(line + (f"\t错误: {row['error']}" if row["error"] else ""))
+    return 0
+
+
+def cmd_import(args):
+    import zipfile
+    from .packs import import_pack_archive
+    world_path = world_path_for(args.server_root, args.world) if args.world else None
+    status = 0
+    for file_path in args.files:
+        try:
+            imported, skipped = import_pack_archive(file_path, args.server_root, world_path)
+        except zipfile.BadZipFile:
+            status = fail(f"'{os.path.basename(file_path)}' 不是有效的ZIP/包文件")
+            continue
+        except Exception as e:
+            status = fail(f"导入包 '{os.path.basename(file_path)}' 失败: {e}")
+            continue
+        for module_type, pack_folder_name in imported:
+            print(f"已导入 ({module_type}): {pack_folder_name}")
+        for message in skipped:
+            print(f"跳过: {message}", file=sys.stderr)
+        if not imported:
+            status = fail(f"文件 '{os.path.basename(file_path)}' 中未找到有效的包内容")
+    return status
+
+
+def cmd_backup(args):
+    import shutil
+    from .backups import new_backup_name, create_backup, record_backup, apply_retention
+    world_path = world_path_for(args.server_root, args.world)
+    backup_dir = os.path.join(args.server_root, "world_backups")
+    backup_name_base = new_backup_name(args.world)
+    staging_path = None
+    if active_world_is_running(args.server_root, args.world):
+        # Same save hold/query/resume sequence as the GUI, run by the daemon that owns the server's stdin
+        from .daemon import daemon_request
+        os.makedirs(backup_dir, exist_ok=True)
+        staging_path = os.path.join(backup_dir, f".{backup_name_base}.hot")
+        copied = daemon_request(args.server_root, "hot_copy", world=args.world, dest=staging_path)["files"]
+        print(f"在线备份: 已复制 {copied} 个文件")
+        world_path = staging_path
+    try:
+        name, stats = create_backup(world_path, backup_dir, args.world, args.type, backup_name_base, args.level)
+    finally:
+        if staging_path:
+            shutil.rmtree(staging_path, ignore_errors=True)
+    try:
+        record_backup(backup_dir, name, args.world, args.type, stats)
+    except OSError as e:
+        print(f"警告: 写入备份索引失败: {e}", file=sys.stderr)
+    print(f"已创建备份: {name} ({stats['files']} 个文件, {stats['bytes'] / (1024 * 1024):.1f} MB)")
+    if not args.no_retention:
+        deleted, freed = apply_retention(backup_dir, [args.world])
+        if deleted:
+            print(f"已按保留策略删除 {len(deleted)} 个过期备份, 释放 {freed / (1024 * 1024):.1f} MB")
+    return 0
+
+
+def cmd_restore(args):
+    from .backups import BackupCatalog, restore_world_backup
+    target_world_path = os.path.join(args.server_root, "worlds", args.world)
+    backup_dir = os.path.join(args.server_root, "world_backups")
+    if active_world_is_running(args.server_root, args.world):
+        return fail(f"服务器正在使用世界 '{args.world}', 请先停止服务器再恢复")
+    backup_name = args.backup
+    if backup_name == "latest":
+        with BackupCatalog(backup_dir).update() as catalog:
+            catalog.sync()
+        backups = catalog.backups_for(args.world)
+        if not backups:
+            return fail(f"没有找到 '{args.world}' 的可用备份")
+        backup_name = backups[0][0]
+    backup_path = os.path.join(backup_dir, backup_name)
+    if not os.path.exists(backup_path):
+        return fail(f"备份源不存在: {backup_path}")
+    try:
+        stats, kept_path = restore_world_backup(backup_path, target_world_path, keep_old=not args.discard_old)
+    except Exception as e:
+        return fail(f"恢复世界失败: {e} (当前世界未被修改)")
+    print(f"已从备份 '{backup_name}' 恢复世界: {args.world} ({stats['files']} 个文件, {stats['bytes'] / (1024 * 1024):.1f} MB)")
+    if kept_path:
+        print(f"旧世界已保留为 '{os.path.basename(kept_path)}'")
+    return 0
+
+
+def cmd_start(args):
+    from .daemon import daemon_running, daemon_request, spawn_daemon
+    if daemon_running(args.server_root):
+        status = daemon_request(args.server_root, "start")
+    else:
+        status = spawn_daemon(args.server_root)
+    if not status["running"]:
+        return fail(f"服务器启动后立即退出 (退出码: {status['exit_code']})")
+    print(f"服务器已启动 (PID {status['server_pid']}, 守护进程 PID {status['pid']})")
+    return 0
+
+
+def cmd_stop(args):
+    from .daemon import daemon_request
+    exit_code = daemon_request(args.server_root, "stop")["exit_code"]
+    print(f"服务器已停止 (退出码: {exit_code})")
+    return 0
+
+
+def cmd_send(args):
+    from .daemon import daemon_request
+    output = daemon_request(args.server_root, "send", command=" ".join(args.server_command), wait=args.wait)["output"]
+    sys.stdout.write(output)
+    return 0
+
+
+def cmd_status(args):
+    from .daemon import daemon_request, DaemonError
+    try:
+        status = daemon_request(args.server_root, "status", timeout=5)
+    except DaemonError:
+        print("服务器未由守护进程运行")
+        return 3
+    del status["ok"]
+    if args.json:
+        print(json.dumps(status, ensure_ascii=False, indent=2))
+        return 0 if status["running"] else 3
+    if status["running"]:
+        players = status["online_players"]
+        print(f"运行中 (PID {status['server_pid']}), 在线玩家 {len(players)} 人" + (f": {', '.join(sorted(players))}" if players else ""))
+    else:
+        print(f"已停止 (退出码: {status['exit_code']}), 守护进程 PID {status['pid']}")
+    if args.output:
+        sys.stdout.write(status["recent_output"])
+    return 0 if status["running"] else 3
+
+
+def cmd_daemon(args):
+    import signal
+    from .daemon import ServerDaemon
+    daemon = ServerDaemon(args.server_root, keep_alive=args.keep_alive)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0)) # Unwind serve() so the server is stopped cleanly
+    try:
+        daemon.serve(start_server=not args.no_start)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m bedrock_core", description="Minecraft 基岩版服务器与存档管理 (命令行)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="记录各操作的耗时, 结束时导出为 Chrome trace JSON (也可以设置环境变量 BEDROCK_TRACE)")
+    root = argparse.ArgumentParser(add_help=False)
+    root.add_argument("server_root", help="服务器根目录")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", parents=[root], help="列出服务器级的行为包和资源包")
+    scan.add_argument("--json", action="store_true", help="以 JSON 输出")
+    scan.set_defaults(func=cmd_scan)
+
+    import_ = commands.add_parser("import", parents=[root], help="导入 .mcpack/.mcaddon")
+    import_.add_argument("files", nargs="+", help="包文件")
+    import_.add_argument("--world", help="同时复制到该世界的包目录")
+    import_.set_defaults(func=cmd_import)
+
+    backup = commands.add_parser("backup", parents=[root], help="备份世界 (服务器由守护进程运行时自动在线备份)")
+    backup.add_argument("world", help="世界名")
+    backup.add_argument("--type", choices=("folder", "zip", "snapshot"), default="snapshot", help="备份类型 (默认: snapshot)")
+    backup.add_argument("--level", type=int, choices=range(10), default=6, metavar="0-9", help="ZIP 压缩级别 (默认: 6)")
+    backup.add_argument("--no-retention", action="store_true", help="备份后不应用保留策略")
+    backup.set_defaults(func=cmd_backup)
+
+    restore = commands.add_parser("restore", parents=[root], help="从备份恢复世界")
+    restore.add_argument("world", help="要恢复到的世界名")
+    restore.add_argument("backup", help="world_backups 中的备份名, 或 latest 表示该世界最新的备份")
+    restore.add_argument("--discard-old", action="store_true", help="恢复后删除旧世界 (默认改名保留)")
+    restore.set_defaults(func=cmd_restore)
+
+    start = commands.add_parser("start", parents=[root], help="在后台守护进程中启动服务器")
+    start.set_defaults(func=cmd_start)
+
+    stop = commands.add_parser("stop", parents=[root], help="停止服务器")
+    stop.set_defaults(func=cmd_stop)
+
+    send = commands.add_parser("send", parents=[root], help="向服务器发送命令并打印其输出")
+    send.add_argument("server_command", nargs="+", help="服务器命令, 例如: say Hello")
+    send.add_argument("--wait", type=float, default=1.0, help="收集命令输出的秒数 (默认: 1)")
+    send.set_defaults(func=cmd_send)
+
+    status = commands.add_parser("status", parents=[root], help="显示服务器状态 (未运行时退出码为 3)")
+    status.add_argument("--json", action="store_true", help="以 JSON 输出")
+    status.add_argument("--output", action="store_true", help="同时打印最近的服务器输出")
+    status.set_defaults(func=cmd_status)
+
+    daemon = commands.add_parser("daemon", parents=[root], help="在前台运行守护进程 (供 systemd 等使用)")
+    daemon.add_argument("--keep-alive", action="store_true", help="服务器停止后守护进程继续运行, 可再次 start")
+    daemon.add_argument("--no-start", action="store_true", help="不立即启动服务器")
+    daemon.set_defaults(func=cmd_daemon)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.server_root = os.path.abspath(args.server_root)
+    if not os.path.isdir(args.server_root):
+        return fail(f"服务器根目录不存在: {args.server_root}")
+    from . import trace
+    trace_path = args.trace or trace.enable_from_env()
+    trace.set_enabled(bool(trace_path))
+    try:
+        with trace.span(f"cli {args.command}", "cli", server_root=args.server_root):
+            return args.func(args)
+    except (OSError, ValueError) as e:
+        return fail(str(e))
+    except Exception as e:
+        from .daemon import DaemonError
+        if isinstance(e, DaemonError):
+            return fail(str(e))
+        raise
+    finally:
+        if trace_path:
+            try:
+                count = trace.export_chrome_trace(trace_path)
+                print(f"已导出 {count} 个追踪事件到 {trace_path}", file=sys.stderr)
+            except OSError as e:
+                fail(f"导出追踪失败: {e}")
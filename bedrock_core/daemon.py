@@ -0,0 +1,344 @@
+"""后台守护进程: 不依赖 Qt 运行服务器进程, 通过本机 TCP 端口接受命令行的控制请求.
+
+守护进程启动后在服务器根目录写入 .manager_daemon.json (端口和随机令牌, 仅当前用户可读);
+请求和响应都是一行 JSON. 服务器输出照常写入 server_logs.
+"""
+
+import os
+import sys
+import json
+import codecs
+import collections
+import queue
+import secrets
+import shutil
+import socket
+import socketserver
+import subprocess
+import threading
+import time
+
+from .logs import SERVER_LOG_DIRNAME, ServerLogStore
+from .server import (HOT_BACKUP_TIMEOUT, HOT_BACKUP_QUERY_INTERVAL_MS, HOT_BACKUP_OUTPUT_TAIL, SERVER_STOP_TIMEOUT_MS,
+                     SERVER_TERMINATE_TIMEOUT_MS, ServerEventParser, server_executable_name, parse_save_query_files,
+                     copy_hot_backup_files)
+
+DAEMON_INFO_FILENAME = ".manager_daemon.json" # 服务器根目录下, 守护进程的端口和令牌
+DAEMON_START_TIMEOUT = 10 # 秒; 命令行等待新守护进程就绪的最长时间
+DAEMON_REQUEST_TIMEOUT = HOT_BACKUP_TIMEOUT + 30 # 秒; 在线备份的复制阶段可能较慢
+DAEMON_RECENT_OUTPUT_LIMIT = 64 * 1024 # status 请求返回的最近输出 (字符)
+DAEMON_COMMAND_OUTPUT_WAIT = 1.0 # 秒; send 请求收集命令输出的时间
+
+
+class DaemonError(Exception):
+    """守护进程不可用或拒绝了请求"""
+
+
+def daemon_info_path(server_root):
+    return os.path.join(server_root, DAEMON_INFO_FILENAME)
+
+
+def read_daemon_info(server_root):
+    try:
+        with open(daemon_info_path(server_root), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def daemon_request(server_root, request_name, timeout=DAEMON_REQUEST_TIMEOUT, **args):
+    """向服务器根目录的守护进程发送请求并返回响应字典; 守护进程未运行时抛出 DaemonError"""
+    info = read_daemon_info(server_root)
+    if info is None:
+        raise DaemonError("守护进程未运行")
+    request = json.dumps({"token": info["token"], "command": request_name, "args": args}) + "\n"
+    try:
+        with socket.create_connection(("127.0.0.1", info["port"]), timeout=timeout) as sock:
+            sock.sendall(request.encode('utf-8'))
+            with sock.makefile('rb') as f:
+                line = f.readline()
+    except OSError as e:
+        raise DaemonError(f"无法连接守护进程: {e}")
+    if not line:
+        raise DaemonError("守护进程没有响应")
+    response = json.loads(line)
+    if not response.get("ok"):
+        raise DaemonError(response.get("error", "请求失败"))
+    return response
+
+
+def daemon_running(server_root):
+    try:
+        daemon_request(server_root, "status", timeout=2)
+    except DaemonError:
+        return False
+    return True
+
+
+def spawn_daemon(server_root):
+    """在后台启动守护进程 (并由它启动服务器), 等待其就绪; 返回守护进程的 status 响应"""
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_parent, env.get("PYTHONPATH")]))
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
+    else:
+        kwargs["start_new_session"] = True # Survive the terminal (and cron job) that started it
+    process = subprocess.Popen([sys.executable, "-m", "bedrock_core", "daemon", server_root],
+                               stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               env=env, **kwargs)
+    deadline = time.monotonic() + DAEMON_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise DaemonError(f"守护进程启动失败 (退出码: {process.returncode})")
+        info = read_daemon_info(server_root)
+        if info is not None and info.get("pid") == process.pid:
+            return daemon_request(server_root, "status")
+        time.sleep(0.05)
+    raise DaemonError("等待守护进程就绪超时")
+
+
+class ControlServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True # A hung client must not keep the daemon alive
+
+
+class ServerDaemon:
+    """运行一个服务器进程并处理控制请求 (status, start, stop, send, hot_copy, shutdown).
+
+    keep_alive 为 False 时服务器进程退出后守护进程也随之退出.
+    """
+
+    def __init__(self, server_root, executable_name=None, keep_alive=False):
+        self.server_root = os.path.abspath(server_root)
+        self.executable_name = executable_name or server_executable_name()
+        self.keep_alive = keep_alive
+        self.token = secrets.token_hex(16)
+        self.process = None
+        self.started_at = None
+        self.exit_code = None
+        self.log_store = None
+        self.events = ServerEventParser()
+        self.events.subscribe("player_connected", self.on_player_connected)
+        self.events.subscribe("player_disconnected", self.on_player_disconnected)
+        self.online_players = {}
+        self.recent_output = collections.deque()
+        self.recent_size = 0
+        self.output_listeners = [] # queue.Queue per request waiting for server output
+        self.lock = threading.Lock() # Guards the process, stdin and listener list
+        self.hot_copy_lock = threading.Lock()
+        self.control_server = None
+
+    # -- Server process ---------------------------------------------------------------------
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start_server(self):
+        with self.lock:
+            if self.is_running():
+                raise DaemonError("服务器已在运行中")
+            exe_path = os.path.join(self.server_root, self.executable_name)
+            if not os.path.exists(exe_path):
+                raise DaemonError(f"服务器可执行文件未找到: {exe_path}")
+            self.log_store = ServerLogStore(os.path.join(self.server_root, SERVER_LOG_DIRNAME))
+            self.events.reset()
+            self.online_players = {}
+            self.exit_code = None
+            try:
+                self.process = subprocess.Popen([exe_path], cwd=self.server_root, stdin=subprocess.PIPE,
+                                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            except OSError as e:
+                self.log_store.close()
+                self.log_store = None
+                raise DaemonError(f"启动服务器失败: {e}")
+            self.started_at = time.time()
+            threading.Thread(target=self.read_output, args=(self.process,), daemon=True).start()
+
+    def read_output(self, process):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        fd = process.stdout.fileno()
+        while True:
+            chunk = os.read(fd, 65536)
+            data = decoder.decode(chunk, final=not chunk)
+            if data:
+                self.log_store.write(data)
+                with self.lock:
+                    self.events.feed(data) # Under the lock: its subscribers update online_players
+                    self.recent_output.append(data)
+                    self.recent_size += len(data)
+                    while self.recent_size > DAEMON_RECENT_OUTPUT_LIMIT and len(self.recent_output) > 1:
+                        self.recent_size -= len(self.recent_output.popleft())
+                    for listener in self.output_listeners:
+                        listener.put(data)
+            if not chunk:
+                break
+        self.exit_code = process.wait()
+        self.events.finish()
+        with self.lock:
+            self.online_players = {}
+            self.log_store.close()
+            self.log_store = None
+        if not self.keep_alive and self.control_server is not None:
+            threading.Thread(target=self.control_server.shutdown, daemon=True).start()
+
+    def on_player_connected(self, event):
+        self.online_players[event.data["player"]] = event.data["xuid"]
+
+    def on_player_disconnected(self, event):
+        self.online_players.pop(event.data["player"], None)
+
+    def write_command(self, command):
+        with self.lock:
+            if not self.is_running():
+                raise DaemonError("服务器未运行")
+            self.process.stdin.write((command + "\n").encode('utf-8'))
+            self.process.stdin.flush()
+
+    def listen_output(self):
+        listener = queue.Queue()
+        with self.lock:
+            self.output_listeners.append(listener)
+        return listener
+
+    def unlisten_output(self, listener):
+        with self.lock:
+            self.output_listeners.remove(listener)
+
+    def stop_server(self):
+        """发送 stop, 超时后依次 terminate 和 kill; 返回退出码"""
+        process = self.process
+        if not self.is_running():
+            raise DaemonError("服务器未运行")
+        self.write_command("stop")
+        for timeout_ms, escalate in ((SERVER_STOP_TIMEOUT_MS, process.terminate), (SERVER_TERMINATE_TIMEOUT_MS, process.kill)):
+            try:
+                return process.wait(timeout_ms / 1000)
+            except subprocess.TimeoutExpired:
+                escalate()
+        return process.wait()
+
+    def hot_copy(self, world_name, dest_path):
+        """在线复制世界: save hold, 轮询 save query 直到服务器报告文件列表, 复制后 save resume"""
+        if not self.hot_copy_lock.acquire(blocking=False):
+            raise DaemonError("在线备份正在进行中")
+        listener = self.listen_output()
+        try:
+            self.write_command("save hold")
+            output = ""
+            deadline = time.monotonic() + HOT_BACKUP_TIMEOUT
+            files = None
+            while files is None:
+                if time.monotonic() > deadline:
+                    raise DaemonError("等待服务器保存数据超时")
+                self.write_command("save query")
+                query_deadline = time.monotonic() + HOT_BACKUP_QUERY_INTERVAL_MS / 1000
+                while files is None and time.monotonic() < query_deadline:
+                    try:
+                        output += listener.get(timeout=max(query_deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    files = parse_save_query_files(output)
+                    output = output[-HOT_BACKUP_OUTPUT_TAIL:]
+            try:
+                copy_hot_backup_files(os.path.join(self.server_root, "worlds"), world_name, files, dest_path)
+            except Exception:
+                shutil.rmtree(dest_path, ignore_errors=True)
+                raise
+            return len(files)
+        finally:
+            self.unlisten_output(listener)
+            if self.is_running():
+                self.write_command("save resume")
+            self.hot_copy_lock.release()
+
+    def send(self, command, wait=DAEMON_COMMAND_OUTPUT_WAIT):
+        """发送命令并返回之后 wait 秒内的服务器输出"""
+        listener = self.listen_output()
+        try:
+            self.write_command(command)
+            output = []
+            deadline = time.monotonic() + wait
+            while time.monotonic() < deadline:
+                try:
+                    output.append(listener.get(timeout=deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            return "".join(output)
+        finally:
+            self.unlisten_output(listener)
+
+    def status(self):
+        with self.lock:
+            return {
+                "pid": os.getpid(),
+                "running": self.is_running(),
+                "server_pid": self.process.pid if self.is_running() else None,
+                "started_at": self.started_at if self.is_running() else None,
+                "exit_code": self.exit_code,
+                "online_players": dict(self.online_players),
+                "recent_output": "".join(self.recent_output),
+            }
+
+    # -- Control server ---------------------------------------------------------------------
+
+    def handle_request(self, request):
+        if not secrets.compare_digest(str(request.get("token", "")), self.token):
+            raise DaemonError("令牌无效")
+        command = request.get("command")
+        args = request.get("args", {})
+        if command == "status":
+            return self.status()
+        if command == "start":
+            self.start_server()
+            return self.status()
+        if command == "stop":
+            return {"exit_code": self.stop_server()}
+        if command == "send":
+            return {"output": self.send(args["command"], args.get("wait", DAEMON_COMMAND_OUTPUT_WAIT))}
+        if command == "hot_copy":
+            return {"files": self.hot_copy(args["world"], args["dest"])}
+        if command == "shutdown":
+            if self.is_running():
+                self.stop_server()
+            threading.Thread(target=self.control_server.shutdown, daemon=True).start()
+            return {}
+        raise DaemonError(f"未知的请求: {command}")
+
+    def write_info(self, port):
+        path = daemon_info_path(self.server_root)
+        temp_path = path + ".tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"pid": os.getpid(), "port": port, "token": self.token}, f)
+        os.replace(temp_path, path)
+
+    def remove_info(self):
+        info = read_daemon_info(self.server_root)
+        if info is not None and info.get("pid") == os.getpid():
+            os.unlink(daemon_info_path(self.server_root))
+
+    def serve(self, start_server=True):
+        """启动 (可选) 服务器并处理请求, 直到服务器退出 (keep_alive 时直到收到 shutdown)"""
+        if daemon_running(self.server_root):
+            raise DaemonError("该服务器根目录已有守护进程在运行")
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    response = {"ok": True, **daemon.handle_request(json.loads(self.rfile.readline()))}
+                except (DaemonError, OSError, ValueError, KeyError) as e:
+                    response = {"ok": False, "error": str(e)}
+                self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+
+        with ControlServer(("127.0.0.1", 0), Handler) as self.control_server:
+            if start_server:
+                self.start_server()
+            self.write_info(self.control_server.server_address[1])
+            try:
+                self.control_server.serve_forever(poll_interval=0.2)
+            finally:
+                self.remove_info()
+                if self.is_running():
+                    self.stop_server()
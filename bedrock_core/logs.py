@@ -0,0 +1,393 @@
+"""服务器日志存储: 按大小/时长轮换的压缩日志段, 时间索引和单词布隆过滤器, 以及历史日志搜索"""
+
+import os
+import json
+import re
+import struct
+import contextlib
+import hashlib
+import zlib
+import gzip
+import base64
+import collections
+import logging
+import threading
+import time
+from datetime import datetime
+
+from .storage import COPY_BUFFER_SIZE, lock_file, unlock_file
+
+SERVER_LOG_DIRNAME = "server_logs" # 服务器根目录下保存控制台输出的目录
+LOG_SEGMENT_MAX_BYTES = 8 * 1024 * 1024 # 日志段达到此大小或时长后轮换并压缩
+LOG_SEGMENT_MAX_AGE = 3600 # 秒
+LOG_INDEX_INTERVAL_BYTES = 64 * 1024 # 稀疏时间索引的间隔
+LOG_BLOOM_BITS = 1 << 18 # 每个日志段的单词布隆过滤器大小 (位)
+LOG_BLOOM_HASHES = 4
+LOG_RETENTION_DAYS = 30 # 更早的日志段在轮换时删除
+LOG_WORD_PATTERN = re.compile(r"\w+")
+LOG_QUEUE_MAX_ITEMS = 10000 # 磁盘跟不上时最多排队的输出块数, 超过后丢弃最旧的
+
+logger = logging.getLogger(__name__)
+
+
+def log_words(text):
+    return set(LOG_WORD_PATTERN.findall(text.lower()))
+
+
+def log_index_words(words):
+    """只有长度 >= 3 且不是纯数字的单词进入布隆过滤器 (时间戳中的数字对搜索没有意义)"""
+    return {word for word in words if len(word) >= 3 and not word.isdigit()}
+
+
+class BloomFilter:
+    """日志段的单词布隆过滤器: 搜索时跳过一定不包含查询单词的日志段"""
+
+    def __init__(self, bits=LOG_BLOOM_BITS, hashes=LOG_BLOOM_HASHES, data=None):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = bytearray(data) if data is not None else bytearray(bits // 8)
+
+    def positions(self, word):
+        digest = hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest()
+        h1, h2 = struct.unpack("<II", digest)
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, word):
+        for position in self.positions(word):
+            self.data[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, word):
+        return all(self.data[position >> 3] & (1 << (position & 7)) for position in self.positions(word))
+
+    def to_text(self):
+        return base64.b64encode(zlib.compress(bytes(self.data))).decode('ascii')
+
+    @classmethod
+    def from_text(cls, text, bits=LOG_BLOOM_BITS, hashes=LOG_BLOOM_HASHES):
+        return cls(bits, hashes, zlib.decompress(base64.b64decode(text)))
+
+
+def log_index_path(log_dir, segment_name):
+    return os.path.join(log_dir, segment_name + ".idx.json")
+
+
+class LogSegmentIndex:
+    """一个日志段的索引: 起止时间、行数、稀疏时间索引 [(时间, 字节偏移, 行号)] 和单词布隆过滤器.
+
+    压缩后 members 保存每个索引项对应的 gzip 成员在压缩文件中的偏移.
+    """
+
+    def __init__(self, name, start):
+        self.name = name
+        self.start = start
+        self.end = start
+        self.lines = 0
+        self.size = 0
+        self.entries = [(start, 0, 0)]
+        self.last_entry_offset = 0
+        self.bloom = BloomFilter()
+        self.members = None
+        self.partial_line = "" # Words are only indexed from complete lines
+
+    def add(self, text, now, encoded_size):
+        if self.size - self.last_entry_offset >= LOG_INDEX_INTERVAL_BYTES and not self.partial_line:
+            self.entries.append((now, self.size, self.lines))
+            self.last_entry_offset = self.size
+        text = self.partial_line + text
+        complete, _, self.partial_line = text.rpartition("\n")
+        for word in log_index_words(log_words(complete)):
+            self.bloom.add(word)
+        self.lines += text.count("\n") - self.partial_line.count("\n")
+        self.size += encoded_size
+        self.end = now
+
+    def finish(self):
+        for word in log_index_words(log_words(self.partial_line)):
+            self.bloom.add(word)
+        if self.partial_line:
+            self.lines += 1
+            self.partial_line = ""
+
+    def save(self, log_dir, file_name):
+        data = {"segment": self.name, "file": file_name, "start": self.start, "end": self.end, "lines": self.lines,
+                "size": self.size, "entries": self.entries, "members": self.members, "bloom": self.bloom.to_text()}
+        path = log_index_path(log_dir, self.name)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+
+def compress_log_segment(log_dir, segment_name, index):
+    """写入索引并用 gzip 压缩已关闭的日志段.
+
+    每个稀疏索引项开始一个独立的 gzip 成员 (整个文件仍是普通的 gzip 文件), 搜索时可以直接从成员的压缩偏移开始解压.
+    """
+    log_path = os.path.join(log_dir, segment_name + ".log")
+    offsets = [entry_offset for _, entry_offset, _ in index.entries]
+    members = []
+    with open(log_path, 'rb') as src, open(log_path + ".gz.tmp", 'wb') as dst:
+        for i, offset in enumerate(offsets):
+            members.append(dst.tell())
+            remaining = offsets[i + 1] - offset if i + 1 < len(offsets) else None # The last member takes the rest
+            with gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=6) as member:
+                while remaining is None or remaining > 0:
+                    chunk = src.read(COPY_BUFFER_SIZE if remaining is None else min(COPY_BUFFER_SIZE, remaining))
+                    if not chunk:
+                        break
+                    member.write(chunk)
+                    if remaining is not None:
+                        remaining -= len(chunk)
+    index.members = members
+    os.replace(log_path + ".gz.tmp", log_path + ".gz")
+    index.save(log_dir, segment_name + ".log.gz")
+    os.unlink(log_path)
+
+
+def log_segment_lock_path(log_dir, segment_name):
+    return os.path.join(log_dir, segment_name + ".log.lock")
+
+
+def open_log_segment_lock(log_dir, segment_name, blocking=True):
+    """打开并独占锁定日志段的锁文件; 写入者在日志段存在期间一直持有它 (进程崩溃时由系统释放).
+    非阻塞时如果锁被占用则返回 None."""
+    f = open(log_segment_lock_path(log_dir, segment_name), 'a+b')
+    try:
+        if lock_file(f, blocking=blocking):
+            return f
+    except OSError:
+        f.close()
+        raise
+    f.close()
+    return None
+
+
+def release_log_segment_lock(log_dir, segment_name, f):
+    unlock_file(f)
+    f.close()
+    with contextlib.suppress(OSError): # Another process may have removed it or be holding it open
+        os.unlink(log_segment_lock_path(log_dir, segment_name))
+
+
+def recover_log_segments(log_dir):
+    """为上次未正常关闭 (例如程序崩溃) 的日志段重建索引并压缩; 时间只能按文件时间估算.
+
+    正在被其他写入者 (另一个实例或进程) 持有锁的日志段会被跳过.
+    """
+    for file_name in os.listdir(log_dir):
+        if not file_name.endswith(".log"):
+            continue
+        segment_name = file_name[:-len(".log")]
+        lock = open_log_segment_lock(log_dir, segment_name, blocking=False)
+        if lock is None:
+            continue # A live writer owns it
+        try:
+            log_path = os.path.join(log_dir, file_name)
+            if not os.path.exists(log_path):
+                continue # Its writer compressed it while we were waiting
+            index = LogSegmentIndex(segment_name, os.path.getmtime(log_path))
+            with open(log_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(LOG_INDEX_INTERVAL_BYTES), b""):
+                    index.add(chunk.decode('utf-8', errors='replace'), index.start, len(chunk))
+            index.finish()
+            compress_log_segment(log_dir, segment_name, index)
+        finally:
+            release_log_segment_lock(log_dir, segment_name, lock)
+
+
+def remove_expired_log_segments(log_dir, now):
+    cutoff = now - LOG_RETENTION_DAYS * 86400
+    for index in load_log_indexes(log_dir):
+        if index["end"] < cutoff:
+            for path in (os.path.join(log_dir, index["file"]), log_index_path(log_dir, index["segment"])):
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(path)
+
+
+class ServerLogStore:
+    """把服务器输出写入磁盘上的日志段 (server_logs/server-<时间>.log).
+
+    写入在后台线程中进行; 日志段按大小或时长轮换, 关闭后 gzip 压缩并保存稀疏时间索引和单词布隆过滤器.
+    排队的输出超过 LOG_QUEUE_MAX_ITEMS 块时丢弃最旧的 (计入 dropped); 写入出错时记录日志并放弃当前日志段, 之后的输出写入新段.
+    """
+
+    def __init__(self, log_dir):
+        self.log_dir = log_dir
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.closing = False
+        self.dropped = 0 # Output chunks discarded because the queue was full
+        self.failed = 0 # Output chunks lost to write errors
+        self.thread = threading.Thread(target=self.run, name="ServerLogStore", daemon=True)
+        self.thread.start()
+
+    def write(self, text):
+        if not text:
+            return
+        with self.condition:
+            if len(self.queue) >= LOG_QUEUE_MAX_ITEMS:
+                self.queue.popleft() # Never block the server's output reader on a slow disk
+                self.dropped += 1
+            self.queue.append((time.time(), text))
+            self.condition.notify()
+
+    def close(self, wait=True):
+        """写完已排队的输出并压缩当前日志段; wait=False 时在后台完成, 不等待"""
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+        if wait:
+            self.thread.join()
+
+    def next_item(self):
+        """取出下一块输出; 关闭后队列已空时返回 None"""
+        with self.condition:
+            while not self.queue and not self.closing:
+                self.condition.wait()
+            return self.queue.popleft() if self.queue else None
+
+    def close_segment(self, segment, index, segment_lock):
+        """关闭并压缩日志段 (segment 为 None 时段文件未能打开, 只释放锁)"""
+        try:
+            if segment is not None:
+                segment.close()
+                index.finish()
+                compress_log_segment(self.log_dir, index.name, index)
+        finally:
+            release_log_segment_lock(self.log_dir, index.name, segment_lock)
+
+    def run(self):
+        segment = None
+        index = None
+        segment_lock = None
+        reported_drops = 0
+        failing = False
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            recover_log_segments(self.log_dir)
+            remove_expired_log_segments(self.log_dir, time.time())
+        except Exception:
+            logger.exception("整理日志目录失败: %s", self.log_dir)
+        while True:
+            item = self.next_item()
+            if item is None:
+                break
+            now, text = item
+            try:
+                dropped = self.dropped
+                if dropped > reported_drops:
+                    text = f"[日志写入跟不上, 丢弃了 {dropped - reported_drops} 块输出]\n" + text
+                    reported_drops = dropped
+                data = text.encode('utf-8')
+                if segment is not None and (index.size + len(data) > LOG_SEGMENT_MAX_BYTES or now - index.start > LOG_SEGMENT_MAX_AGE):
+                    previous, previous_lock = segment, segment_lock
+                    segment = segment_lock = None
+                    self.close_segment(previous, index, previous_lock)
+                    remove_expired_log_segments(self.log_dir, now)
+                if segment is None:
+                    name = "server-" + datetime.fromtimestamp(now).strftime("%Y%m%d_%H%M%S_%f")
+                    index = LogSegmentIndex(name, now)
+                    segment_lock = open_log_segment_lock(self.log_dir, name) # Before the segment exists
+                    segment = open(os.path.join(self.log_dir, name + ".log"), 'ab')
+                segment.write(data)
+                segment.flush() # Keep the active segment readable for searches
+                index.add(text, now, len(data))
+                failing = False
+            except Exception:
+                # Logging to disk must never take the console down: give up on this segment and keep draining
+                self.failed += 1
+                if not failing:
+                    logger.exception("写入服务器日志失败: %s", self.log_dir)
+                failing = True
+                if segment_lock is not None:
+                    with contextlib.suppress(Exception):
+                        self.close_segment(segment, index, segment_lock)
+                segment = None
+                segment_lock = None
+        if segment_lock is not None:
+            try:
+                self.close_segment(segment, index, segment_lock)
+            except Exception:
+                logger.exception("压缩日志段失败: %s", index.name)
+
+
+def load_log_indexes(log_dir):
+    """读取所有已关闭日志段的索引, 按起始时间排序"""
+    indexes = []
+    if not os.path.isdir(log_dir):
+        return indexes
+    for file_name in os.listdir(log_dir):
+        if file_name.endswith(".idx.json"):
+            try:
+                with open(os.path.join(log_dir, file_name), 'r', encoding='utf-8') as f:
+                    indexes.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    indexes.sort(key=lambda index: index["start"])
+    return indexes
+
+
+def search_logs(log_dir, query, start=None, end=None, limit=1000, cancel_event=None):
+    """在日志中搜索同时包含 query 中所有单词 (不区分大小写, 整词匹配) 的行.
+
+    先按时间范围和布隆过滤器筛选日志段, 只解压可能包含结果的段; 在段内用稀疏时间索引和 gzip 成员偏移
+    直接从起始位置附近开始解压.
+    返回 (结果列表 [(日志段名, 行号, 行内容)], 统计信息字典).
+    """
+    terms = log_words(query)
+    indexed_terms = log_index_words(terms)
+    stats = {"segments": 0, "searched": 0, "skipped": 0, "truncated": False}
+    results = []
+    if not terms:
+        return results, stats
+
+    segments = []
+    closed = set()
+    for index in load_log_indexes(log_dir):
+        closed.add(index["segment"])
+        if (start is not None and index["end"] < start) or (end is not None and index["start"] > end):
+            continue
+        stats["segments"] += 1
+        bloom = BloomFilter.from_text(index["bloom"])
+        if any(term not in bloom for term in indexed_terms):
+            stats["skipped"] += 1
+            continue
+        segments.append((index["segment"], os.path.join(log_dir, index["file"]), index["entries"], index.get("members")))
+    if os.path.isdir(log_dir):
+        for file_name in sorted(os.listdir(log_dir)):
+            # The segment being written has no saved index yet: always search it
+            if file_name.endswith(".log") and file_name[:-len(".log")] not in closed:
+                stats["segments"] += 1
+                segments.append((file_name[:-len(".log")], os.path.join(log_dir, file_name), None, None))
+
+    for segment_name, path, entries, members in segments:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        offset, line_no, member_offset, stop_offset = 0, 0, 0, None
+        for i, (entry_time, entry_offset, entry_line) in enumerate(entries or ()):
+            if start is not None and entry_time <= start:
+                offset, line_no = entry_offset, entry_line
+                member_offset = members[i] if members else 0
+            if end is not None and entry_time > end and stop_offset is None:
+                stop_offset = entry_offset
+        stats["searched"] += 1
+        with open(path, 'rb') as raw:
+            f = raw
+            if path.endswith(".gz"):
+                raw.seek(member_offset)
+                f = gzip.GzipFile(fileobj=raw, mode='rb')
+            if not member_offset:
+                f.seek(offset) # Plain segments, and old ones compressed as a single gzip member
+            position = offset
+            for raw_line in f:
+                if stop_offset is not None and position >= stop_offset:
+                    break
+                position += len(raw_line)
+                line_no += 1
+                line = raw_line.decode('utf-8', errors='replace').rstrip("\r\n")
+                lowered = line.lower()
+                if all(term in lowered for term in terms) and terms <= log_words(lowered):
+                    results.append((segment_name, line_no, line))
+                    if len(results) >= limit:
+                        stats["truncated"] = True
+                        return results, stats
+    return results, stats
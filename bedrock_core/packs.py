@@ -0,0 +1,406 @@
+"""行为包/资源包: manifest 解析, 包元数据索引以及 .mcpack/.mcaddon 导入"""
+
+import os
+import json
+import shutil
+import zipfile
+import tempfile
+import io
+import struct
+import contextlib
+
+from .storage import COPY_BUFFER_SIZE, remove_staging_dir, replace_dir, ContentStore
+from .trace import span, traced
+
+PACK_INDEX_FILENAME = ".pack_index.json" # 服务器包元数据索引, 存放于服务器根目录
+PACK_INDEX_VERSION = 1
+LANG_NAME_PREFIXES = ("pack.", "resourcePack.", "behaviorPack.")
+
+
+def stat_signature(path):
+    """返回文件的 [mtime_ns, size] 签名, 文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+@traced("read_pack_manifest", "scan")
+def read_pack_manifest(pack_path):
+    """解析包文件夹中的 manifest.json (必要时查找 texts/en_US.lang 中的名称), 返回包信息字典"""
+    details = {
+        "name": "N/A",
+        "uuid": "N/A",
+        "version_list": [0, 0, 0],
+        "version_display": "N/A",
+        "manifest_mtime": None,
+        "error": None,
+    }
+    manifest_path = os.path.join(pack_path, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return details
+
+    try:
+        with span("parse_manifest_json", "scan"), open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        header = manifest.get("header", {})
+        manifest_name_str = header.get("name", "N/A")
+        # Attempt to decode if it's a pack name string like "pack.name"
+        if manifest_name_str.startswith(LANG_NAME_PREFIXES):
+            lang_path_us = os.path.join(pack_path, "texts", "en_US.lang") # Default to en_US for simplicity
+            details["lang_sig"] = stat_signature(lang_path_us)
+            if details["lang_sig"] is not None:
+                try:
+                    with span("lang_lookup", "scan"), open(lang_path_us, 'r', encoding='utf-8') as lang_f:
+                        for line in lang_f:
+                            if '=' in line:
+                                key, value = line.split('=', 1)
+                                if key.strip() == manifest_name_str:
+                                    manifest_name_str = value.strip()
+                                    break
+                except Exception:
+                    pass # Keep original manifest_name_str if lang file parsing fails
+        details["name"] = manifest_name_str
+
+        details["uuid"] = header.get("uuid", "N/A")
+        version_list = header.get("version", [0, 0, 0])
+        if isinstance(version_list, list) and len(version_list) > 0:
+            details["version_display"] = '.'.join(map(str, version_list))
+        else:
+            version_list = [0, 0, 0] # ensure it's a list for storing
+            details["version_display"] = "0.0.0"
+        details["version_list"] = version_list
+        details["manifest_mtime"] = os.path.getmtime(manifest_path)
+    except Exception as e:
+        details["error"] = str(e)
+    return details
+
+
+IMPORT_STAGING_DIRNAME = ".import_staging" # 服务器根目录下的暂存目录, 与目标目录同一文件系统以便原子重命名
+NESTED_PACK_SPOOL_LIMIT = 64 * 1024 * 1024 # 压缩过的嵌套 .mcpack 超过此大小时缓冲到临时文件而不是内存
+PACK_STORE_DIRNAME = ".pack_store" # 按内容寻址的包文件存储, 存放于服务器根目录
+
+
+class ZipMemberSlice(io.RawIOBase):
+    """以只读、可随机访问的方式打开 ZIP 中未压缩 (STORED) 的成员, 不复制任何数据"""
+
+    def __init__(self, archive_path, info):
+        super().__init__()
+        self._file = open(archive_path, 'rb')
+        self._file.seek(info.header_offset)
+        local_header = self._file.read(zipfile.sizeFileHeader)
+        name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+        self._start = info.header_offset + zipfile.sizeFileHeader + name_length + extra_length
+        self._size = info.file_size
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, buffer):
+        length = min(len(buffer), self._size - self._pos)
+        if length <= 0:
+            return 0
+        self._file.seek(self._start + self._pos)
+        data = self._file.read(length)
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def open_nested_zip(outer_zip, info, stack):
+    """打开 .mcaddon 中嵌套的 .mcpack 而不解压到磁盘; 返回的 ZipFile 由 stack 负责关闭"""
+    if info.compress_type == zipfile.ZIP_STORED and isinstance(outer_zip.filename, str):
+        stream = stack.enter_context(ZipMemberSlice(outer_zip.filename, info))
+    else:
+        # Seeking inside a compressed member means re-inflating it, so buffer it once instead
+        stream = stack.enter_context(tempfile.SpooledTemporaryFile(max_size=NESTED_PACK_SPOOL_LIMIT))
+        with outer_zip.open(info) as src:
+            shutil.copyfileobj(src, stream, COPY_BUFFER_SIZE)
+        stream.seek(0)
+    return stack.enter_context(zipfile.ZipFile(stream))
+
+
+def find_pack_in_zip(zf):
+    """返回包内容在压缩包中的前缀 ('' 表示 manifest.json 在根目录), 未找到时返回 None"""
+    names = zf.namelist()
+    if "manifest.json" in names:
+        return ""
+    for name in names:
+        parts = name.split("/")
+        if len(parts) == 2 and parts[1] == "manifest.json":
+            return parts[0] + "/" # manifest might be in a subfolder; assuming one pack per mcpack file
+    return None
+
+
+def iter_archive_packs(zf, archive_path, stack):
+    """产出压缩包中的每个包: (ZipFile, 前缀, 默认文件夹名)"""
+    archive_stem = os.path.splitext(os.path.basename(archive_path))[0]
+    if os.path.splitext(archive_path)[1].lower() != ".mcaddon":
+        prefix = find_pack_in_zip(zf)
+        if prefix is not None:
+            yield zf, prefix, prefix.rstrip("/") or archive_stem
+        return
+
+    for info in zf.infolist():
+        parts = info.filename.split("/")
+        if len(parts) == 1 and info.filename.lower().endswith(".mcpack"):
+            inner_zip = open_nested_zip(zf, info, stack)
+            prefix = find_pack_in_zip(inner_zip)
+            if prefix is not None:
+                yield inner_zip, prefix, prefix.rstrip("/") or os.path.splitext(info.filename)[0]
+        elif len(parts) == 2 and parts[1] == "manifest.json":
+            yield zf, parts[0] + "/", parts[0]
+
+
+def pack_target_dir(root, module_type, pack_folder_name):
+    """返回包在 root/<类型>_packs 中的目标文件夹; 文件夹名来自压缩包, 必须是单独的一级目录名,
+    拒绝空名、'.'、'..'、路径分隔符和盘符, 防止替换 *_packs 目录本身或其之外的目录"""
+    if pack_folder_name in ("", ".", "..") or any(c in pack_folder_name for c in "/\\:"):
+        raise ValueError(f"压缩包中包含不安全的包文件夹名: {pack_folder_name!r}")
+    packs_dir = os.path.abspath(os.path.join(root, f"{module_type}_packs"))
+    target_dir = os.path.join(packs_dir, pack_folder_name)
+    if os.path.dirname(os.path.abspath(target_dir)) != packs_dir:
+        raise ValueError(f"压缩包中包含不安全的包文件夹名: {pack_folder_name!r}")
+    return target_dir
+
+
+def detect_pack_type(manifest, pack_folder_name):
+    """根据 manifest 的 modules 类型 (或文件夹名) 判断包类型, 无法判断时返回 None"""
+    module_type = None
+    if "modules" in manifest and manifest["modules"]:
+        module_type_from_manifest = manifest["modules"][0].get("type", "unknown").lower()
+        if module_type_from_manifest == "data": 
+            module_type = "behavior"
+        elif module_type_from_manifest == "resources": 
+            module_type = "resource"
+        elif module_type_from_manifest == "script": # Script packs are often behavior packs
+            module_type = "behavior" 
+
+    if module_type is None:
+        folder_name = pack_folder_name.lower()
+        if "behavior" in folder_name or "bp" in folder_name:
+            module_type = "behavior"
+        elif "resource" in folder_name or "rp" in folder_name:
+            module_type = "resource"
+    return module_type
+
+
+def zip_prefix_members(zf, prefix):
+    return [info for info in zf.infolist() if info.filename.startswith(prefix) and info.filename != prefix]
+
+
+def store_zip_prefix(store, zf, prefix, progress=None, cancel_event=None):
+    """把压缩包中 prefix 下的成员流式写入 ContentStore, 返回 [(相对路径, 对象路径或 None 表示目录)]"""
+    entries = []
+    with span("extract_to_store", "import", pack=prefix.rstrip("/")) as trace_span:
+        for info in zip_prefix_members(zf, prefix):
+            rel_path = os.path.normpath(info.filename[len(prefix):])
+            if os.path.isabs(rel_path) or rel_path == ".." or rel_path.startswith(".." + os.sep):
+                raise ValueError(f"压缩包中包含非法路径: {info.filename}")
+            if info.is_dir():
+                entries.append((rel_path, None))
+                continue
+            with zf.open(info) as src:
+                entries.append((rel_path, store.add_stream(src, progress, cancel_event)))
+            trace_span.add(files=1, bytes=info.file_size)
+    return entries
+
+
+def materialize_pack(store, entries, dest_dir, staging_root):
+    """在暂存目录中按 entries 生成包文件夹 (reflink 或复制存储对象), 完成后原子地重命名为 dest_dir.
+
+    包文件经常被用户原地编辑, 因此不使用硬链接: 编辑不能改动存储中的对象或其它包/世界中的副本.
+    """
+    os.makedirs(staging_root, exist_ok=True)
+    os.makedirs(os.path.dirname(dest_dir), exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix="pack-", dir=staging_root)
+    try:
+        with span("materialize_pack", "import", dest=dest_dir, files=len(entries)):
+            for rel_path, object_path in entries:
+                target_path = os.path.join(staging_dir, rel_path)
+                if object_path is None:
+                    os.makedirs(target_path, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                store.materialize(object_path, target_path)
+            with store.target_lock(dest_dir): # The exists-check and renames in replace_dir() are not atomic together
+                replace_dir(staging_dir, dest_dir, staging_root)
+                store.set_refs(dest_dir, [object_path for _, object_path in entries if object_path is not None])
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+
+def import_pack_archive(file_path, server_root, world_path=None, progress=None, cancel_event=None):
+    """导入 .mcpack/.mcaddon: manifest 直接从压缩包读取, 包内容只写入 .pack_store 一次,
+    再生成到服务器级 (以及 world_path 不为空时该世界的) behavior_packs/resource_packs 文件夹.
+
+    progress(done_bytes, total_bytes) 用于报告进度; cancel_event 被设置时中止尚未完成的包.
+    返回 (已导入的 [(包类型, 文件夹名)], 跳过原因列表).
+    """
+    imported = []
+    skipped = []
+    store = ContentStore(os.path.join(server_root, PACK_STORE_DIRNAME))
+    staging_base = os.path.join(server_root, IMPORT_STAGING_DIRNAME)
+    os.makedirs(staging_base, exist_ok=True)
+    with contextlib.ExitStack() as stack:
+        trace_span = stack.enter_context(span("import_pack_archive", "import", file=os.path.basename(file_path)))
+        stack.enter_context(store.lock()) # Keeps collect_garbage() away until the new packs' refs are recorded
+        staging_root = tempfile.mkdtemp(dir=staging_base) # One per import so parallel imports don't collide
+        stack.callback(remove_staging_dir, staging_root, staging_base)
+        zf = stack.enter_context(zipfile.ZipFile(file_path, 'r'))
+
+        plan = []
+        for pack_zip, prefix, pack_folder_name in iter_archive_packs(zf, file_path, stack):
+            manifest = json.loads(pack_zip.read(prefix + "manifest.json").decode('utf-8'))
+            module_type = detect_pack_type(manifest, pack_folder_name)
+            if module_type is None:
+                skipped.append(f"无法确定包类型 (行为包/资源包) 从 manifest.json: {pack_folder_name}")
+                continue
+
+            target_dirs = [pack_target_dir(server_root, module_type, pack_folder_name)]
+            if world_path:
+                target_dirs.append(pack_target_dir(world_path, module_type, pack_folder_name)) # e.g. worlds/MyWorld/behavior_packs
+            plan.append((pack_zip, prefix, module_type, pack_folder_name, target_dirs))
+
+        total_bytes = sum(info.file_size for pack_zip, prefix, _, _, _ in plan
+                          for info in zip_prefix_members(pack_zip, prefix))
+        trace_span.add(packs=len(plan), bytes=total_bytes)
+        done_bytes = 0
+
+        def on_chunk(length):
+            nonlocal done_bytes
+            done_bytes += length
+            progress(done_bytes, total_bytes)
+
+        for pack_zip, prefix, module_type, pack_folder_name, target_dirs in plan:
+            entries = store_zip_prefix(store, pack_zip, prefix, on_chunk if progress is not None else None, cancel_event)
+            for target_dir in target_dirs:
+                materialize_pack(store, entries, target_dir, staging_root)
+            imported.append((module_type, pack_folder_name))
+    return imported, skipped
+
+
+class PackIndex:
+    """服务器包元数据的持久化索引 (JSON 文件, 位于服务器根目录下).
+
+    以包文件夹的相对路径为键, 记录 manifest.json 的 mtime 和大小; 只有签名变化或新增的包才会重新解析.
+    """
+
+    def __init__(self, server_root):
+        self.server_root = server_root
+        self.index_path = os.path.join(server_root, PACK_INDEX_FILENAME)
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get("version") == PACK_INDEX_VERSION:
+                self.entries = data.get("packs", {})
+        except (OSError, ValueError):
+            pass # Missing or corrupt index: start empty, it will be rebuilt on the next scan
+
+    def save(self):
+        if not self.dirty:
+            return
+        temp_path = self.index_path + ".tmp"
+        try:
+            with span("save_pack_index", "scan", packs=len(self.entries)), open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": PACK_INDEX_VERSION, "packs": self.entries}, f, ensure_ascii=False)
+            os.replace(temp_path, self.index_path)
+            self.dirty = False
+        except OSError:
+            pass # The index is only a cache; failing to persist it must not break the scan
+
+    def is_fresh(self, entry, manifest_sig, pack_path):
+        if entry.get("manifest_sig") != manifest_sig:
+            return False
+        if "lang_sig" in entry:
+            return entry["lang_sig"] == stat_signature(os.path.join(pack_path, "texts", "en_US.lang"))
+        return True
+
+    def cached(self, key, pack_path):
+        """返回 (manifest_sig, 缓存条目); 缓存缺失或已过期时条目为 None"""
+        manifest_sig = stat_signature(os.path.join(pack_path, "manifest.json"))
+        entry = self.entries.get(key)
+        if entry is None or not self.is_fresh(entry, manifest_sig, pack_path):
+            return manifest_sig, None
+        return manifest_sig, entry
+
+    def store(self, key, manifest_sig, details):
+        details["manifest_sig"] = manifest_sig
+        self.entries[key] = details
+        self.dirty = True
+        return details
+
+    def forget(self, pack_type, folder_name):
+        if self.entries.pop(f"{pack_type}_packs/{folder_name}", None) is not None:
+            self.dirty = True
+
+    def lookup(self, pack_type, folder_name, pack_path):
+        """返回单个包的元数据, 仅在 manifest.json 签名变化时重新解析"""
+        key = f"{pack_type}_packs/{folder_name}"
+        manifest_sig, entry = self.cached(key, pack_path)
+        if entry is None:
+            entry = self.store(key, manifest_sig, read_pack_manifest(pack_path))
+        return entry
+
+    def iter_pack_dir(self, pack_type, pack_dir_path):
+        """列出包目录下的包文件夹, 产出 (key, folder_name, pack_path, folder_mtime)"""
+        if not os.path.exists(pack_dir_path):
+            return
+        with os.scandir(pack_dir_path) as it:
+            for dir_entry in it:
+                if dir_entry.is_dir():
+                    yield f"{pack_type}_packs/{dir_entry.name}", dir_entry.name, dir_entry.path, dir_entry.stat().st_mtime
+
+    def prune(self, pack_type, seen_keys):
+        """删除本次扫描中未出现的包条目"""
+        prefix = f"{pack_type}_packs/"
+        for key in [k for k in self.entries if k.startswith(prefix) and k not in seen_keys]:
+            del self.entries[key]
+            self.dirty = True
+
+    def scan(self, pack_type, pack_dir_path):
+        """同步扫描一个包目录, 返回 (folder_name, pack_path, folder_mtime, details) 列表并清理已消失的条目"""
+        results = []
+        seen_keys = set()
+        for key, folder_name, pack_path, folder_mtime in self.iter_pack_dir(pack_type, pack_dir_path):
+            seen_keys.add(key)
+            results.append((folder_name, pack_path, folder_mtime, self.lookup(pack_type, folder_name, pack_path)))
+        self.prune(pack_type, seen_keys)
+        return results
+
+
+def scan_server_packs(server_root):
+    """同步扫描服务器级的行为包和资源包 (使用并更新包元数据索引), 返回 {包类型: [(文件夹名, 路径, 文件夹 mtime, 包信息)]}"""
+    index = PackIndex(server_root)
+    results = {pack_type: index.scan(pack_type, os.path.join(server_root, f"{pack_type}_packs"))
+               for pack_type in ("behavior", "resource")}
+    index.save()
+    return results
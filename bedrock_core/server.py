@@ -0,0 +1,311 @@
+"""服务器相关的通用逻辑: server.properties, 在线备份 (save query), 输出事件解析和进程资源采样"""
+
+import os
+import re
+import platform
+import shutil
+import collections
+import time
+
+from .storage import COPY_BUFFER_SIZE
+
+HOT_BACKUP_TIMEOUT = 120 # 秒; 等待 save query 报告数据就绪的最长时间
+HOT_BACKUP_QUERY_INTERVAL_MS = 1000
+HOT_BACKUP_OUTPUT_TAIL = 4096
+SAVE_QUERY_READY_MARKER = "Data saved. Files are now ready to be copied."
+SERVER_LOG_LINE_PATTERN = re.compile(r"^\[(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(?::\d+)? (?P<level>[A-Z]+)\] ?(?P<message>.*)$")
+# (事件类型, 快速筛选用的子串, 预编译的正则) —— 只有包含该子串的行才会执行正则
+SERVER_EVENT_PATTERNS = (
+    ("player_connected", "Player connected", re.compile(r"Player connected: (?P<player>.+?), xuid: (?P<xuid>\d*)")),
+    ("player_disconnected", "Player disconnected", re.compile(r"Player disconnected: (?P<player>.+?), xuid: (?P<xuid>\d*)")),
+    ("player_spawned", "Player Spawned", re.compile(r"Player Spawned: (?P<player>.+?) xuid: (?P<xuid>\d*)")),
+    ("server_started", "Server started", re.compile(r"^Server started\.")),
+    ("server_version", "Version", re.compile(r"^Version:? (?P<version>[\d.]+)")),
+    ("port_open", "port:", re.compile(r"^(?P<protocol>IPv[46]) supported, port: (?P<port>\d+)")),
+    ("script_error", "[Scripting]", re.compile(r"\[Scripting\] ?(?P<error>.*)")),
+)
+SCRIPT_ERROR_HINT = re.compile(r"Error|Exception|rejection") # [Scripting] 行中 console.log 的普通输出不算错误
+SERVER_STOP_TIMEOUT_MS = 5000 # 发送 stop 后等待服务器退出的时间, 超时后 terminate
+SERVER_TERMINATE_TIMEOUT_MS = 2000 # terminate 后等待的时间, 超时后 kill
+DEFAULT_SERVER_PORTS = {"server-port": 19132, "server-portv6": 19133}
+RESOURCE_HISTORY_SIZE = 300 # 环形缓冲区保留的样本数 (默认间隔下为 5 分钟)
+
+
+def server_executable_name():
+    """当前平台上服务器可执行文件的名称 (位于服务器根目录)"""
+    return "bedrock_server.exe" if platform.system() == "Windows" else "bedrock_server"
+
+
+def server_ports(server_root):
+    """返回服务器根目录 server.properties 中配置的 {属性名: 端口}, 未配置时使用默认端口"""
+    properties = read_server_properties(server_root)
+    ports = {}
+    for key, default in DEFAULT_SERVER_PORTS.items():
+        try:
+            ports[key] = int(properties.get(key, default))
+        except ValueError:
+            ports[key] = default
+    return ports
+
+
+def find_port_conflicts(server_roots):
+    """检查多个服务器根目录之间的端口冲突, 返回 {根目录: [(端口, 冲突的根目录)]} (只包含有冲突的目录)"""
+    owners = collections.defaultdict(list)
+    for root in server_roots:
+        for port in set(server_ports(root).values()):
+            owners[port].append(root)
+    conflicts = collections.defaultdict(list)
+    for port, roots in owners.items():
+        for root in roots:
+            conflicts[root].extend((port, other) for other in roots if other != root)
+    return {root: sorted(items) for root, items in conflicts.items() if items}
+
+
+def read_server_properties(server_root):
+    """读取 server.properties 为字典, 文件不存在时返回空字典"""
+    properties = {}
+    try:
+        with open(os.path.join(server_root, "server.properties"), 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#") and "=" in line:
+                    key, value = line.split("=", 1)
+                    properties[key.strip()] = value.strip()
+    except OSError:
+        pass
+    return properties
+
+
+def parse_save_query_files(output):
+    """从服务器输出中解析 save query 的回复, 返回 [(相对 worlds 目录的路径, 需复制的长度)]; 尚未就绪时返回 None"""
+    marker_index = output.rfind(SAVE_QUERY_READY_MARKER)
+    if marker_index < 0:
+        return None
+    lines = output[marker_index + len(SAVE_QUERY_READY_MARKER):].split("\n")
+    # lines[0] is the rest of the marker line; the file list is the next complete line
+    for line in lines[1:-1]:
+        line = line.strip()
+        if not line:
+            continue
+        files = []
+        for item in line.split(", "):
+            path, _, length = item.rpartition(":")
+            if not path or not length.isdigit():
+                return None
+            files.append((path, int(length)))
+        return files
+    return None
+
+
+def copy_hot_backup_files(worlds_dir, world_name, files, dest_path):
+    """按 save query 报告的长度截断复制世界文件到 dest_path (保留 mtime);
+    列表之外的 db/ 以外文件 (例如世界包配置) 原样复制, db/ 中未列出的文件不属于本次保存状态, 不复制."""
+    os.makedirs(dest_path, exist_ok=True)
+    world_path = os.path.join(worlds_dir, world_name)
+    listed = set()
+    for path, length in files:
+        parts = path.replace("\\", "/").split("/")
+        if parts[0] != world_name or len(parts) < 2:
+            continue
+        rel_path = os.path.join(*parts[1:])
+        listed.add(rel_path)
+        src_file = os.path.join(world_path, rel_path)
+        dest_file = os.path.join(dest_path, rel_path)
+        os.makedirs(os.path.dirname(dest_file), exist_ok=True)
+        with open(src_file, 'rb') as src, open(dest_file, 'wb') as dst:
+            remaining = length
+            while remaining > 0:
+                chunk = src.read(min(COPY_BUFFER_SIZE, remaining))
+                if not chunk:
+                    break
+                dst.write(chunk)
+                remaining -= len(chunk)
+        shutil.copystat(src_file, dest_file)
+
+    for root, _, file_names in os.walk(world_path):
+        rel_root = os.path.relpath(root, world_path)
+        if rel_root.split(os.sep)[0] == "db":
+            continue
+        for file_name in file_names:
+            rel_path = os.path.normpath(os.path.join(rel_root, file_name))
+            if rel_path not in listed:
+                os.makedirs(os.path.join(dest_path, rel_root), exist_ok=True)
+                shutil.copy2(os.path.join(root, file_name), os.path.join(dest_path, rel_path))
+
+
+ServerEvent = collections.namedtuple("ServerEvent", ["kind", "timestamp", "level", "data", "line"])
+
+
+class ServerEventParser:
+    """把服务器输出流按行切分并解析为结构化事件, 分发给订阅者.
+
+    跨数据块的不完整行会被缓存到下一次 feed(); 每种事件先用子串快速筛选, 再执行预编译的正则.
+    事件类型: player_connected/player_disconnected/player_spawned (player, xuid)、server_started、server_version (version)、
+    port_open (protocol, port)、script_error (error)、error (message, 日志级别为 ERROR 的其它行).
+    """
+
+    def __init__(self):
+        self.partial_line = ""
+        self.subscribers = collections.defaultdict(list)
+
+    def subscribe(self, kind, callback):
+        """订阅某种事件; kind 为 None 时接收所有事件"""
+        self.subscribers[kind].append(callback)
+
+    def reset(self):
+        self.partial_line = ""
+
+    def feed(self, text):
+        """处理一块输出, 返回其中完整行产生的事件"""
+        text = self.partial_line + text
+        lines = text.split("\n")
+        self.partial_line = lines.pop()
+        events = []
+        for line in lines:
+            event = self.parse_line(line.rstrip("\r"))
+            if event is not None:
+                events.append(event)
+        for event in events:
+            self.dispatch(event)
+        return events
+
+    def finish(self):
+        """进程结束时处理最后一个没有换行的行"""
+        line, self.partial_line = self.partial_line, ""
+        event = self.parse_line(line.rstrip("\r")) if line else None
+        if event is not None:
+            self.dispatch(event)
+        return [event] if event is not None else []
+
+    def parse_line(self, line):
+        timestamp = level = None
+        message = line
+        if line.startswith("["):
+            match = SERVER_LOG_LINE_PATTERN.match(line)
+            if match:
+                timestamp, level, message = match.group("timestamp", "level", "message")
+        for kind, needle, pattern in SERVER_EVENT_PATTERNS:
+            if needle in message:
+                match = pattern.search(message)
+                if match and kind == "script_error" and level != "ERROR" and not SCRIPT_ERROR_HINT.search(message):
+                    match = None
+                if match:
+                    return ServerEvent(kind, timestamp, level, match.groupdict(), line)
+        if level == "ERROR":
+            return ServerEvent("error", timestamp, level, {"message": message}, line)
+        return None
+
+    def dispatch(self, event):
+        for callback in self.subscribers.get(event.kind, []) + self.subscribers.get(None, []):
+            callback(event)
+
+
+ResourceSample = collections.namedtuple(
+    "ResourceSample", "timestamp cpu_percent rss_bytes peak_rss_bytes threads read_bytes_per_s write_bytes_per_s")
+
+
+class ProcessSampler:
+    """从 /proc/<pid>/stat, status 和 io 采样进程的 CPU, 内存, 线程数和磁盘 I/O (仅 Linux)
+
+    三个文件在 attach 时打开, 之后每次采样只做 pread, 样本保存在固定大小的环形缓冲区中.
+    """
+    clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def __init__(self, history_size=RESOURCE_HISTORY_SIZE):
+        self.history = collections.deque(maxlen=history_size)
+        self.pid = None
+        self.fds = {}
+        self.previous = None # (monotonic time, cpu ticks, read bytes, write bytes)
+        self.sample_seconds = 0.0 # Time spent sampling, to report the sampler's own overhead
+        self.attached_at = None
+
+    @staticmethod
+    def supported():
+        return os.path.isdir("/proc/self") and os.path.exists("/proc/self/io")
+
+    def attach(self, pid):
+        """开始采样 pid; 不支持或进程已退出时返回 False"""
+        self.detach()
+        self.history.clear()
+        if not pid or not self.supported():
+            return False
+        try:
+            for name in ("stat", "status", "io"):
+                self.fds[name] = os.open(f"/proc/{pid}/{name}", os.O_RDONLY)
+        except OSError:
+            self.detach()
+            return False
+        self.pid = pid
+        self.attached_at = time.monotonic()
+        self.sample_seconds = 0.0
+        return True
+
+    def detach(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
+        self.pid = None
+        self.previous = None
+
+    def read(self, name):
+        return os.pread(self.fds[name], 4096, 0)
+
+    def sample(self):
+        """读取一次样本并放入环形缓冲区; 进程已退出时返回 None"""
+        if self.pid is None:
+            return None
+        started = time.perf_counter()
+        try:
+            stat = self.read("stat")
+            status = self.read("status")
+            try:
+                io_data = self.read("io")
+            except PermissionError:
+                io_data = b""
+        except OSError: # ESRCH once the process is gone
+            self.detach()
+            return None
+        now = time.monotonic()
+        # comm (field 2) may contain spaces and parentheses; everything after the last ")" is fixed
+        fields = stat[stat.rindex(b")") + 2:].split()
+        cpu_ticks = int(fields[11]) + int(fields[12]) # utime + stime
+        threads = int(fields[17])
+        status_values = {}
+        for line in status.splitlines():
+            key, _, value = line.partition(b":")
+            if key in (b"VmRSS", b"VmHWM"):
+                status_values[key] = int(value.split()[0]) * 1024
+        io_values = {}
+        for line in io_data.splitlines():
+            key, _, value = line.partition(b":")
+            io_values[key] = int(value)
+        read_bytes = io_values.get(b"read_bytes")
+        write_bytes = io_values.get(b"write_bytes")
+
+        cpu_percent = read_rate = write_rate = None
+        if self.previous is not None:
+            last_time, last_ticks, last_read, last_write = self.previous
+            elapsed = max(now - last_time, 1e-6)
+            cpu_percent = (cpu_ticks - last_ticks) / self.clock_ticks / elapsed * 100
+            if read_bytes is not None and last_read is not None:
+                read_rate = (read_bytes - last_read) / elapsed
+                write_rate = (write_bytes - last_write) / elapsed
+        self.previous = (now, cpu_ticks, read_bytes, write_bytes)
+        sample = ResourceSample(time.time(), cpu_percent, status_values.get(b"VmRSS", 0),
+                                status_values.get(b"VmHWM", 0), threads, read_rate, write_rate)
+        self.history.append(sample)
+        self.sample_seconds += time.perf_counter() - started
+        return sample
+
+    def samples(self):
+        """按时间顺序返回环形缓冲区中的样本"""
+        return list(self.history)
+
+    def latest(self):
+        return self.history[-1] if self.history else None
+
+    def overhead(self):
+        """采样本身占用的 CPU 时间比例 (相对于一个核心)"""
+        if self.attached_at is None:
+            return 0.0
+        return self.sample_seconds / max(time.monotonic() - self.attached_at, 1e-6)
@@ -0,0 +1,245 @@
+"""文件存储工具: 按内容寻址的对象存储 (reflink/硬链接/复制) 和目录的原子替换"""
+
+import os
+import json
+import shutil
+import tempfile
+import hashlib
+import errno
+import platform
+import contextlib
+import time
+try:
+    import fcntl # Used for reflinks and store locks; not available on Windows
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt # Store locks on Windows
+except ImportError:
+    msvcrt = None
+
+COPY_BUFFER_SIZE = 1024 * 1024
+FICLONE = 0x40049409 # Linux ioctl: reflink a whole file (btrfs, XFS, ...)
+STORE_LOCK_POLL_INTERVAL = 0.05 # 秒; Windows 上等待文件锁 (存储锁、日志段锁) 时的重试间隔
+
+
+def lock_file(f, exclusive=True, blocking=True):
+    """对打开的文件加跨进程锁 (Windows 上没有共享锁, 总是独占); 非阻塞时返回是否拿到了锁"""
+    if fcntl is not None:
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(f.fileno(), flags if blocking else flags | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+    elif msvcrt is not None:
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(STORE_LOCK_POLL_INTERVAL)
+    return True
+
+
+def unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ImportCancelled(Exception):
+    """导入在完成前被取消"""
+
+
+def remove_staging_dir(staging_dir, staging_base):
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    try:
+        os.rmdir(staging_base) # Only succeeds once no other import is using it
+    except OSError:
+        pass
+
+
+def replace_dir(src_dir, dest_dir, staging_root, keep_old_path=None):
+    """用 src_dir 替换 dest_dir: 旧目录先被重命名移开, 新目录就位后再删除 (指定 keep_old_path 时改名保留)"""
+    old_dir = None
+    if os.path.exists(dest_dir):
+        if keep_old_path:
+            old_dir = keep_old_path
+        else:
+            old_dir = tempfile.mkdtemp(prefix=".old-", dir=staging_root)
+            os.rmdir(old_dir)
+        os.rename(dest_dir, old_dir)
+    try:
+        os.rename(src_dir, dest_dir)
+    except OSError:
+        if old_dir:
+            os.rename(old_dir, dest_dir)
+        raise
+    if old_dir and not keep_old_path:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+class ContentStore:
+    """按内容寻址的文件存储 (<root>/objects/<sha256 前两位>/<sha256>), 相同内容只保存一份.
+
+    包导入使用服务器根目录下的 .pack_store: 服务器级和世界级的包文件夹从存储中以 reflink (文件系统支持时)
+    或复制的方式生成, 支持 reflink 时相同内容的文件在所有包和世界之间共享磁盘空间.
+    注意: 硬链接的文件被原地修改时, 存储中的对象和所有共享该内容的副本都会一起改变, 因此用户可能编辑的文件不要用硬链接生成.
+
+    每个生成的目标文件夹在 refs 中登记它引用的对象 (set_refs); collect_garbage() 只删除没有任何登记引用的对象.
+    写入对象并登记引用期间应持有共享锁 (lock()), 回收时持有独占锁, 多个进程 (图形界面和命令行) 可以安全地同时使用.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        self.refs_dir = os.path.join(self.root, "refs")
+        self.lock_path = os.path.join(self.root, "lock")
+        self.locks_dir = os.path.join(self.root, "locks") # One lock file per generated target folder
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.reflink_supported = fcntl is not None and platform.system() == "Linux"
+        self.hardlink_supported = True
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def add_stream(self, src, progress=None, cancel_event=None):
+        """把数据流写入存储 (边写边计算 SHA-256), 内容已存在时丢弃新写入的数据; 返回对象路径"""
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as dst:
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ImportCancelled()
+                    chunk = src.read(COPY_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    dst.write(chunk)
+                    if progress is not None:
+                        progress(len(chunk))
+            object_path = self.object_path(hasher.hexdigest())
+            if os.path.exists(object_path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                os.replace(tmp_path, object_path)
+            return object_path
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def add_file(self, path, progress=None, cancel_event=None):
+        with open(path, 'rb') as src:
+            return self.add_stream(src, progress, cancel_event)
+
+    def materialize(self, object_path, dest_path, allow_hardlink=False):
+        """在 dest_path 生成对象的副本: 依次尝试 reflink、硬链接 (仅 allow_hardlink 为 True 时), 最后回退为复制.
+
+        reflink 和复制得到的文件被修改时不影响存储; 只有确定不会被原地修改的目标才应允许硬链接.
+        """
+        if self.reflink_supported:
+            try:
+                with open(object_path, 'rb') as src, open(dest_path, 'wb') as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    self.reflink_supported = False # e.g. ext4/tmpfs; don't retry for every file
+                if os.path.exists(dest_path):
+                    os.unlink(dest_path)
+        if allow_hardlink and self.hardlink_supported:
+            try:
+                os.link(object_path, dest_path)
+                return
+            except OSError as e:
+                if e.errno != errno.EXDEV: # EXDEV: only this target (e.g. a world on another drive) can't link
+                    self.hardlink_supported = False # e.g. FAT/exFAT
+        shutil.copyfile(object_path, dest_path)
+
+    @contextlib.contextmanager
+    def lock(self, exclusive=False):
+        """跨进程的存储锁: 写入对象和登记引用时用共享锁, 回收对象时用独占锁 (Windows 上没有共享锁, 总是独占)"""
+        with open(self.lock_path, "a+b") as f:
+            lock_file(f, exclusive)
+            try:
+                yield
+            finally:
+                unlock_file(f)
+
+    @contextlib.contextmanager
+    def target_lock(self, target_path):
+        """生成目标文件夹的独占锁: 并行导入 (同一批次或命令行) 中同名的包文件夹依次替换, 不会互相打断"""
+        os.makedirs(self.locks_dir, exist_ok=True)
+        with open(os.path.join(self.locks_dir, self.target_key(target_path) + ".lock"), "a+b") as f:
+            lock_file(f)
+            try:
+                yield
+            finally:
+                unlock_file(f)
+
+    def target_key(self, target_path):
+        return hashlib.sha256(os.path.normcase(os.path.abspath(target_path)).encode("utf-8")).hexdigest()
+
+    def ref_path(self, target_path):
+        return os.path.join(self.refs_dir, self.target_key(target_path) + ".json")
+
+    def set_refs(self, target_path, object_paths):
+        """登记 target_path (生成的文件夹) 引用的对象, 替换该目标之前的登记"""
+        os.makedirs(self.refs_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"target": os.path.abspath(target_path),
+                       "objects": sorted({os.path.basename(path) for path in object_paths})}, f)
+        os.replace(tmp_path, self.ref_path(target_path))
+
+    def referenced_objects(self):
+        """返回仍被引用的对象名集合; 目标文件夹已不存在的登记会被删除"""
+        referenced = set()
+        try:
+            ref_names = os.listdir(self.refs_dir)
+        except FileNotFoundError:
+            return referenced
+        for ref_name in ref_names:
+            ref_path = os.path.join(self.refs_dir, ref_name)
+            try:
+                with open(ref_path, "r", encoding="utf-8") as f:
+                    ref = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if os.path.isdir(ref["target"]):
+                referenced.update(ref["objects"])
+            else:
+                os.unlink(ref_path)
+        return referenced
+
+    def collect_garbage(self):
+        """在独占锁下删除没有登记引用的对象 (例如被替换或删除的包文件), 返回释放的字节数.
+
+        没有登记但仍有其它硬链接的对象 (旧版本导入的包) 同样保留.
+        """
+        freed = 0
+        with self.lock(exclusive=True):
+            referenced = self.referenced_objects()
+            for dirpath, _, filenames in os.walk(self.objects_dir):
+                for filename in filenames:
+                    if filename in referenced:
+                        continue
+                    object_path = os.path.join(dirpath, filename)
+                    try:
+                        st = os.stat(object_path)
+                        if st.st_nlink <= 1:
+                            os.unlink(object_path)
+                            freed += st.st_size
+                    except OSError:
+                        pass
+        return freed
@@ -0,0 +1,152 @@
+"""轻量的操作追踪: 记录嵌套的耗时区间 (span) 及其字节数/文件数, 导出为 Chrome trace-event JSON.
+
+导出的文件可以在 chrome://tracing 或 https://ui.perfetto.dev 中打开. 默认关闭; 关闭时 span() 只做一次全局
+变量检查并返回共享的空对象, 几乎没有开销. 用法:
+
+    with span("import_pack_archive", file=path) as s:
+        ...
+        s.add(bytes=length, files=1)
+"""
+
+import collections
+import functools
+import json
+import os
+import threading
+import time
+
+TRACE_MAX_EVENTS = 200000 # 内存中最多保留的事件数, 超出时丢弃最早的事件
+TRACE_ENV_VAR = "BEDROCK_TRACE" # 设置为文件路径时, 程序启动即开始记录并在退出时导出到该文件
+
+_enabled = False
+_events = collections.deque(maxlen=TRACE_MAX_EVENTS)
+_thread_names = {} # tid -> thread name, for the trace's metadata events
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+
+class Span:
+    """一个正在记录的区间; 退出时生成一个 Chrome trace 的 "X" (complete) 事件"""
+
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+
+    def add(self, **counters):
+        """累加计数 (例如 bytes=..., files=...)"""
+        for key, value in counters.items():
+            self.args[key] = self.args.get(key, 0) + value
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        thread = threading.current_thread()
+        event = {"name": self.name, "cat": self.category, "ph": "X", "pid": os.getpid(), "tid": thread.ident,
+                 "ts": round((self.start - _origin) * 1e6, 3), "dur": round((end - self.start) * 1e6, 3), "args": self.args}
+        with _lock:
+            _events.append(event)
+            _thread_names.setdefault(thread.ident, thread.name)
+        return False
+
+
+class _NullSpan:
+    """追踪关闭时 span() 返回的空对象"""
+
+    __slots__ = ()
+
+    def add(self, **counters):
+        pass
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+def span(name, category="op", /, **args):
+    """返回记录 name 区间的上下文管理器; 追踪关闭时返回 NULL_SPAN"""
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, category, args)
+
+
+def traced(name=None, category="op"):
+    """装饰器: 把整个函数调用记录为一个区间"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(span_name, category, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable_from_env():
+    """环境变量 BEDROCK_TRACE 设置了导出路径时开启追踪; 返回该路径或 None"""
+    path = os.environ.get(TRACE_ENV_VAR) or None
+    if path:
+        set_enabled(True)
+    return path
+
+
+def clear():
+    with _lock:
+        _events.clear()
+        _thread_names.clear()
+
+
+def event_count():
+    return len(_events)
+
+
+def chrome_trace():
+    """返回 Chrome trace-event 格式的字典 (JSON Object Format)"""
+    pid = os.getpid()
+    with _lock:
+        events = list(_events)
+        thread_names = dict(_thread_names)
+    metadata = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "bedrock manager"}}]
+    metadata += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                 for tid, name in thread_names.items()]
+    return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(path):
+    """把已记录的事件写入 path; 返回事件数"""
+    trace = chrome_trace()
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(trace, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return len(trace["traceEvents"])
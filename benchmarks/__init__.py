@@ -0,0 +1,6 @@
+"""性能基准: 生成合成服务器目录, 在无界面 (offscreen) 的 Qt 平台上测量 PackManagerApp 的主要操作.
+
+用法 (在仓库根目录下):
+    python -m benchmarks.synthetic <目录> [--packs N --worlds M ...]   # 只生成合成服务器目录
+    python -m benchmarks.gui_bench --output results.json [--compare old.json]
+"""
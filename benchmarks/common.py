@@ -0,0 +1,191 @@
+"""基准测试的公共部分: 计时统计, 结果 JSON, 版本比较, 以及无人值守时自动应答对话框."""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # Must be set before the first PyQt import
+
+from PyQt6.QtCore import QSettings, QT_VERSION_STR, PYQT_VERSION_STR
+from PyQt6.QtWidgets import QApplication, QInputDialog, QMessageBox
+
+from bedrock_core import trace
+
+REGRESSION_THRESHOLD = 1.25 # 中位数比旧结果慢超过此倍数时视为回归
+WAIT_POLL_INTERVAL = 0.0005 # 秒; 等待后台操作完成时处理事件的间隔
+RESULTS_FORMAT_VERSION = 1
+
+
+class Results:
+    """按操作名收集每次运行的耗时 (毫秒) 和附加数据"""
+
+    def __init__(self, suite):
+        self.suite = suite
+        self.operations = {}
+
+    def add(self, name, elapsed, **extra):
+        entry = self.operations.setdefault(name, {"runs_ms": []})
+        entry["runs_ms"].append(round(elapsed * 1000, 3))
+        entry.update(extra)
+
+    def time(self, name, func, *args, **extra):
+        """计时调用 func(*args), 返回其结果"""
+        start = time.perf_counter()
+        result = func(*args)
+        self.add(name, time.perf_counter() - start, **extra)
+        return result
+
+    def summary(self):
+        operations = {}
+        for name, entry in self.operations.items():
+            runs = entry["runs_ms"]
+            operations[name] = dict(entry, runs=len(runs), min_ms=min(runs), median_ms=round(statistics.median(runs), 3),
+                                    mean_ms=round(statistics.fmean(runs), 3), max_ms=max(runs))
+        return operations
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment_info():
+    return {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "qt": QT_VERSION_STR,
+        "pyqt": PYQT_VERSION_STR,
+        "platform": platform.platform(),
+        "qpa": os.environ.get("QT_QPA_PLATFORM"),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_results(path, results, parameters, errors):
+    document = {"format": RESULTS_FORMAT_VERSION, "suite": results.suite, "environment": environment_info(),
+                "parameters": parameters, "operations": results.summary(), "errors": errors}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    return document
+
+
+def compare_results(old_path, document, threshold=REGRESSION_THRESHOLD):
+    """打印与旧结果的中位数对比, 返回回归的操作名列表"""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    old_commit = old.get("environment", {}).get("commit")
+    print(f"\n与 {os.path.basename(old_path)} ({old_commit or '未知版本'}) 比较 (中位数):")
+    regressions = []
+    for name, entry in document["operations"].items():
+        old_entry = old.get("operations", {}).get(name)
+        if old_entry is None:
+            print(f"  {name:<40} {entry['median_ms']:>10.1f} ms  (新)")
+            continue
+        ratio = entry["median_ms"] / old_entry["median_ms"] if old_entry["median_ms"] else 1.0
+        flag = ""
+        if ratio > threshold:
+            flag = "  <- 回归"
+            regressions.append(name)
+        print(f"  {name:<40} {old_entry['median_ms']:>10.1f} -> {entry['median_ms']:>10.1f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def print_summary(document):
+    print(f"{document['suite']} ({document['environment']['commit'] or '未知版本'}):")
+    for name, entry in document["operations"].items():
+        print(f"  {name:<40} 中位数 {entry['median_ms']:>10.1f} ms  (最小 {entry['min_ms']:.1f}, 最大 {entry['max_ms']:.1f}, {entry['runs']} 次)")
+    for error in document["errors"]:
+        print(f"  错误: {error}", file=sys.stderr)
+
+
+def add_output_arguments(parser, default_output):
+    parser.add_argument("--output", default=default_output, help=f"结果 JSON 文件 (默认: {default_output})")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="与之前的结果文件比较, 有回归时退出码为 2")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help=f"判定回归的倍数 (默认: {REGRESSION_THRESHOLD})")
+    parser.add_argument("--trace", metavar="FILE", help="同时记录各操作内部的耗时, 导出为 Chrome trace JSON")
+
+
+def start_trace(args):
+    """--trace 指定了文件时开启追踪 (计时会包含少量追踪开销)"""
+    trace.set_enabled(bool(args.trace))
+
+
+def finish(args, results, parameters, errors):
+    """写入并打印结果; 返回进程退出码 (1: 操作报错, 2: 有回归)"""
+    document = write_results(args.output, results, parameters, errors)
+    print_summary(document)
+    print(f"结果已写入: {args.output}")
+    if args.trace:
+        print(f"已导出 {trace.export_chrome_trace(args.trace)} 个追踪事件到 {args.trace}")
+    if errors:
+        return 1
+    if args.compare and compare_results(args.compare, document, args.threshold):
+        return 2
+    return 0
+
+
+def create_application(settings_dir):
+    """创建 QApplication; QSettings 写入 settings_dir, 不影响用户自己的设置"""
+    for settings_format in (QSettings.Format.NativeFormat, QSettings.Format.IniFormat):
+        QSettings.setPath(settings_format, QSettings.Scope.UserScope, settings_dir)
+    return QApplication.instance() or QApplication([sys.argv[0]])
+
+
+def wait_until(predicate, timeout):
+    """处理事件直到 predicate() 为真; 超时返回 False"""
+    app = QApplication.instance()
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        app.processEvents()
+        time.sleep(WAIT_POLL_INTERVAL)
+    return True
+
+
+class DialogResponder:
+    """替换模态对话框, 使基准测试无人值守地运行.
+
+    information/warning/question 等消息被记录下来; critical 视为错误. QInputDialog.getItem 依次返回 answers 中的选项,
+    QMessageBox.exec() 点击角色为 button_role 的按钮.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.errors = []
+        self.answers = []
+        self.button_role = QMessageBox.ButtonRole.AcceptRole
+        QMessageBox.information = staticmethod(lambda parent, title, text, *args, **kwargs: self.record(title, text))
+        QMessageBox.warning = staticmethod(lambda parent, title, text, *args, **kwargs: self.record(title, text))
+        QMessageBox.critical = staticmethod(lambda parent, title, text, *args, **kwargs: self.record(title, text, error=True))
+        QMessageBox.question = staticmethod(lambda *args, **kwargs: QMessageBox.StandardButton.Yes)
+        QMessageBox.exec = lambda box: self.press(box)
+        QInputDialog.getItem = staticmethod(lambda *args, **kwargs: self.answer())
+
+    def record(self, title, text, error=False):
+        self.messages.append(f"{title}: {text}")
+        if error:
+            self.errors.append(f"{title}: {text}")
+        return QMessageBox.StandardButton.Ok
+
+    def answer(self):
+        if not self.answers:
+            return "", False
+        return self.answers.pop(0), True
+
+    def press(self, box):
+        for button in box.buttons():
+            if box.buttonRole(button) == self.button_role:
+                button.click()
+                break
+        return 0
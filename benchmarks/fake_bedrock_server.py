@@ -0,0 +1,220 @@
+"""模拟 bedrock_server 的替身程序, 用于在没有真实服务器的环境 (CI) 中测试控制台和启动/停止流程.
+
+输出与真实服务器相同格式的日志行, 可以按指定速率持续输出; 响应 list, save hold/query/resume 和 stop,
+并可以配置为忽略 stop、挂起 (连 SIGTERM 也忽略) 或在若干秒后崩溃.
+
+install_fake_server() 在服务器根目录中写入名为 bedrock_server 的启动脚本 (仅限 Linux/macOS), 管理器像启动
+真实服务器一样启动它. 也可以直接运行: python -m benchmarks.fake_bedrock_server --rate 1000
+"""
+
+import argparse
+import os
+import random
+import signal
+import stat
+import sys
+import threading
+import time
+from datetime import datetime
+
+SERVER_VERSION = "1.21.70.03"
+EMIT_INTERVAL = 0.01 # 秒; 按速率输出日志时每批的间隔
+FLOOD_DONE_MARKER = "Flood finished" # flood 命令输出结束后的最后一行
+STOP_MODES = ("exit", "ignore", "hang")
+MAX_PLAYERS = 10
+# 持续输出的普通日志行 (玩家连接/断开由 --players 控制, 以便在线人数保持一致)
+ROUTINE_MESSAGES = (
+    "Running AutoCompaction...",
+    "[Scripting] console.log: tick {n}",
+    "Saving chunk data at {x}, {z}",
+    "Content logging: entity synthetic:e{n} failed to load texture",
+)
+
+
+class FakeServer:
+    def __init__(self, options):
+        self.options = options
+        self.output_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.players = []
+        self.save_queries = 0
+        self.rng = random.Random(options.seed)
+        self.level_name = self.read_level_name()
+
+    def read_level_name(self):
+        try:
+            with open("server.properties", "r", encoding="utf-8") as f:
+                for line in f:
+                    key, _, value = line.strip().partition("=")
+                    if key == "level-name":
+                        return value
+        except OSError:
+            pass
+        return "Bedrock level"
+
+    def log_line(self, message, level="INFO"):
+        now = datetime.now()
+        return f"[{now.strftime('%Y-%m-%d %H:%M:%S')}:{now.microsecond // 1000:03d} {level}] {message}\n"
+
+    def write(self, text):
+        with self.output_lock:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+    def log(self, message, level="INFO"):
+        self.write(self.log_line(message, level))
+
+    def routine_line(self, n):
+        return self.log_line(ROUTINE_MESSAGES[n % len(ROUTINE_MESSAGES)].format(
+            n=n, x=self.rng.randint(-1000, 1000), z=self.rng.randint(-1000, 1000)))
+
+    def player_line(self):
+        """连接或断开一个模拟玩家, 保持在线人数在 --players 附近"""
+        if len(self.players) < self.options.players and (not self.players or self.rng.random() < 0.6):
+            name = f"Player{self.rng.randint(0, 9999)}"
+            if name in self.players:
+                return None
+            self.players.append(name)
+            return self.log_line(f"Player connected: {name}, xuid: {2535400000000000 + self.rng.randint(0, 99999999)}")
+        if self.players:
+            name = self.players.pop(self.rng.randrange(len(self.players)))
+            return self.log_line(f"Player disconnected: {name}, xuid: {2535400000000000 + self.rng.randint(0, 99999999)}, pfid: 0")
+        return None
+
+    def startup(self):
+        time.sleep(self.options.startup_delay)
+        lines = [
+            "Starting Server",
+            f"Version: {SERVER_VERSION}",
+            "OS: Linux",
+            f"Level Name: {self.level_name}",
+            "Game mode: 0 Survival",
+            "Difficulty: 1 EASY",
+            "Opening level 'worlds/{0}/db'".format(self.level_name),
+            "IPv4 supported, port: 19132: Used for gameplay and LAN discovery",
+            "IPv6 supported, port: 19133: Used for gameplay",
+            "Server started.",
+        ]
+        self.write("".join(self.log_line(line) for line in lines))
+
+    def emit_logs(self):
+        """按 --rate 持续输出日志, 直到 --duration 到期或服务器停止"""
+        rate = self.options.rate
+        started = time.monotonic()
+        emitted = 0
+        while not self.stopping.is_set():
+            elapsed = time.monotonic() - started
+            if self.options.duration and elapsed >= self.options.duration:
+                return
+            due = int(elapsed * rate) - emitted
+            if due > 0:
+                lines = []
+                for i in range(due):
+                    line = self.player_line() if self.options.players and self.rng.random() < 0.01 else None
+                    lines.append(line or self.routine_line(emitted + i))
+                self.write("".join(lines))
+                emitted += due
+            time.sleep(EMIT_INTERVAL)
+
+    def crash_later(self):
+        if not self.stopping.wait(self.options.crash_after):
+            self.log("Crash requested by --crash-after", "ERROR")
+            os.abort() # Dies from SIGABRT, like a real crash (QProcess reports CrashExit)
+
+    def save_query_reply(self):
+        self.save_queries += 1
+        if self.save_queries <= self.options.save_delay:
+            return "A previous save has not been completed.\n"
+        world_path = os.path.join("worlds", self.level_name)
+        files = []
+        for dir_path, _, file_names in os.walk(world_path):
+            for file_name in sorted(file_names):
+                path = os.path.join(dir_path, file_name)
+                relative = os.path.relpath(path, "worlds").replace(os.sep, "/")
+                files.append(f"{relative}:{os.path.getsize(path)}")
+        return "Data saved. Files are now ready to be copied.\n" + ", ".join(files) + "\n"
+
+    def handle_command(self, command):
+        """处理一条命令; 返回 False 表示应当退出"""
+        name, _, argument = command.partition(" ")
+        if name == "stop":
+            if self.options.on_stop == "ignore":
+                self.log("Stop ignored (--on-stop ignore)", "WARN")
+                return True
+            if self.options.on_stop == "hang":
+                signal.signal(signal.SIGTERM, signal.SIG_IGN)
+                self.stopping.set() # Stop logging, never exit: only SIGKILL ends the process
+                while True:
+                    time.sleep(3600)
+            self.stopping.set()
+            self.write(self.log_line("Server stop requested.") + "Stopping server...\nQuit correctly\n")
+            return False
+        if name == "list":
+            reply = f"There are {len(self.players)}/{MAX_PLAYERS} players online:\n{', '.join(self.players)}\n"
+        elif command == "save hold":
+            self.save_queries = 0
+            reply = "Saving...\n"
+        elif command == "save query":
+            reply = self.save_query_reply()
+        elif command == "save resume":
+            reply = "Changes to the level are resumed.\n"
+        elif name == "say":
+            reply = self.log_line(f"[Server] {argument}")
+        elif name == "flood":
+            count = int(argument or 10000)
+            reply = "".join(self.routine_line(n) for n in range(count)) + self.log_line(FLOOD_DONE_MARKER)
+        else:
+            reply = f"Unknown command: {name}. Please check that the command exists and that you have permission to use it.\n"
+        self.write(reply)
+        return True
+
+    def run(self):
+        self.startup()
+        if self.options.rate > 0:
+            threading.Thread(target=self.emit_logs, daemon=True).start()
+        if self.options.crash_after is not None:
+            threading.Thread(target=self.crash_later, daemon=True).start()
+        for line in sys.stdin:
+            command = line.strip()
+            if command and not self.handle_command(command):
+                return 0
+        self.stopping.set()
+        return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="fake_bedrock_server", description="模拟 bedrock_server 的替身程序")
+    parser.add_argument("--rate", type=float, default=0, help="每秒持续输出的日志行数 (默认: 0, 只输出启动日志)")
+    parser.add_argument("--duration", type=float, default=0, help="持续输出的秒数 (默认: 0, 一直输出到停止)")
+    parser.add_argument("--players", type=int, default=0, help="持续输出时模拟的在线玩家数上限")
+    parser.add_argument("--startup-delay", type=float, default=0, help="输出 Server started 之前等待的秒数")
+    parser.add_argument("--on-stop", choices=STOP_MODES, default="exit",
+                        help="收到 stop 时: exit 正常退出, ignore 忽略, hang 挂起并忽略 SIGTERM (默认: exit)")
+    parser.add_argument("--crash-after", type=float, help="启动若干秒后崩溃 (SIGABRT)")
+    parser.add_argument("--save-delay", type=int, default=1, help="save query 回复未完成的次数 (默认: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    return parser
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    return FakeServer(options).run()
+
+
+def install_fake_server(server_root, *args):
+    """在 server_root 中写入启动脚本 bedrock_server, 以 args 为参数运行本模块; 返回脚本路径"""
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script_path = os.path.join(server_root, "bedrock_server")
+    with open(script_path, "w", encoding="utf-8") as f:
+        f.write(f"#!{sys.executable}\n"
+                "import sys\n"
+                f"sys.path.insert(0, {package_parent!r})\n"
+                "from benchmarks.fake_bedrock_server import main\n"
+                f"sys.exit(main({list(args)!r}))\n")
+    os.chmod(script_path, os.stat(script_path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return script_path
+
+
+if __name__ == "__main__":
+    sys.exit(main())
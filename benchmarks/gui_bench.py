@@ -0,0 +1,170 @@
+"""PackManagerApp 的操作基准: 包扫描、过滤、排序、导入、备份和恢复.
+
+在无界面 (offscreen) 的 Qt 平台上运行, 结果写入 JSON 文件:
+    python -m benchmarks.gui_bench --output gui_bench.json [--compare old.json] [--packs 1000 ...]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from .common import Results, DialogResponder, create_application, wait_until, add_output_arguments, start_trace, finish
+from .synthetic import generate_server_root, add_generator_arguments, generator_options
+
+import main_qt # Imported after .common, which selects the offscreen platform
+
+DEFAULT_REPEAT = 5
+SCAN_TIMEOUT = 300 # 秒; 单次包扫描的最长等待时间
+FILTER_QUERIES = ("pack 1", "1.5.", "no-such-pack", "") # 最后一个清空过滤
+BENCH_WORLD = "World_0" # 备份/恢复使用的世界
+
+
+def settle(window):
+    """等待后台扫描/清理和文件系统事件的合并处理结束, 使下一次计时不受其影响"""
+    return wait_until(lambda: window.pack_scan_thread is None and window.retention_thread is None
+                      and window.backup_thread is None and window.restore_thread is None and window.hot_backup is None
+                      and not window.fs_watch_timer.isActive() and not window.fs_pending_paths, SCAN_TIMEOUT)
+
+
+def pack_count(window):
+    return window.server_bp_tree.topLevelItemCount() + window.server_rp_tree.topLevelItemCount()
+
+
+def bench_scan(window, results, repeat, errors):
+    index_path = os.path.join(window.server_root_path, ".pack_index.json")
+    for name, cold in (("refresh_server_packs_list (无索引)", True), ("refresh_server_packs_list (有索引)", False)):
+        for _ in range(repeat):
+            settle(window)
+            if cold and os.path.exists(index_path):
+                os.remove(index_path)
+                window.pack_index = None
+            def scan():
+                window.refresh_server_packs_list()
+                if not wait_until(lambda: window.pack_scan_thread is None, SCAN_TIMEOUT):
+                    errors.append(f"{name}: 扫描超时")
+            results.time(name, scan)
+        results.operations[name]["packs"] = pack_count(window)
+
+
+def bench_filter_sort(window, results, repeat):
+    for _ in range(repeat):
+        for query in FILTER_QUERIES:
+            window.server_pack_search.blockSignals(True)
+            window.server_pack_search.setText(query)
+            window.server_pack_search.blockSignals(False)
+            results.time(f"filter_server_packs ({query or '清空'})", window.filter_server_packs)
+        for index in range(window.server_pack_sort.count()):
+            window.server_pack_sort.blockSignals(True)
+            window.server_pack_sort.setCurrentIndex(index)
+            window.server_pack_sort.blockSignals(False)
+            results.time(f"sort_server_packs ({window.server_pack_sort.currentText()})", window.sort_server_packs)
+
+
+def bench_import(window, results, addons, errors):
+    """逐个文件分别计时同步的 import_pack 和批量导入的路径 (BatchImportWorker, 计时到 batch_finished)"""
+    for addon_path in addons:
+        settle(window)
+        if not results.time("import_pack (.mcaddon)", window.import_pack, addon_path):
+            errors.append(f"导入失败: {os.path.basename(addon_path)}")
+        settle(window)
+        def import_one():
+            window.start_batch_import([addon_path])
+            if not wait_until(lambda: window.import_thread is None, SCAN_TIMEOUT):
+                errors.append(f"start_batch_import: 导入超时: {os.path.basename(addon_path)}")
+        results.time("start_batch_import (.mcaddon)", import_one)
+        dialog = window.import_dialog
+        if dialog.state_counts["failed"] or dialog.state_counts["cancelled"]:
+            errors.append(f"导入失败: {os.path.basename(addon_path)}")
+        dialog.close()
+
+
+def select_world(window, world_name):
+    items = window.worlds_list.findItems(world_name, main_qt.Qt.MatchFlag.MatchExactly, 0)
+    if not items:
+        raise RuntimeError(f"世界列表中没有 {world_name}")
+    window.worlds_list.setCurrentItem(items[0])
+
+
+def bench_backup_restore(window, results, repeat, responder, world_bytes, errors):
+    backup_dir = os.path.join(window.server_root_path, "world_backups")
+    for label, backup_type in main_qt.BACKUP_TYPE_CHOICES.items():
+        previous_name = None
+        for _ in range(repeat):
+            settle(window)
+            while main_qt.new_backup_name(BENCH_WORLD) == previous_name:
+                time.sleep(0.01) # Backup names have one-second resolution
+            previous_name = main_qt.new_backup_name(BENCH_WORLD)
+            select_world(window, BENCH_WORLD)
+            responder.answers = [label]
+            if backup_type == "zip":
+                responder.answers.append(window.zip_backup_level_name)
+            def backup():
+                window.backup_selected_world()
+                if not wait_until(lambda: window.backup_thread is None, SCAN_TIMEOUT):
+                    errors.append(f"backup_selected_world ({backup_type}): 备份超时")
+            results.time(f"backup_selected_world ({backup_type})", backup, world_bytes=world_bytes)
+
+        catalog = main_qt.BackupCatalog(backup_dir)
+        catalog.sync()
+        backup_name = next(name for name, entry in catalog.backups_for(BENCH_WORLD) if entry["type"] == backup_type)
+        responder.button_role = main_qt.QMessageBox.ButtonRole.DestructiveRole # "恢复并删除旧世界"
+        for _ in range(repeat):
+            settle(window)
+            def restore():
+                window.restore_world(BENCH_WORLD, backup_name, backup_dir)
+                if not wait_until(lambda: window.restore_thread is None, SCAN_TIMEOUT):
+                    errors.append(f"restore_world ({backup_type}): 恢复超时")
+            results.time(f"restore_world ({backup_type})", restore, world_bytes=world_bytes)
+
+
+def run(args, server_root, errors):
+    app = create_application(server_root + "_settings")
+    responder = DialogResponder()
+
+    results = Results("gui")
+    window = main_qt.PackManagerApp()
+    window.show()
+    results.add("PackManagerApp() 创建界面", window.startup_timings["build"])
+    window.load_server_root(server_root)
+    settle(window)
+    try:
+        bench_scan(window, results, args.repeat, errors)
+        bench_filter_sort(window, results, args.repeat)
+        bench_import(window, results, args.addon_paths, errors)
+        bench_backup_restore(window, results, args.repeat, responder, int(args.world_mb * 1024 * 1024), errors)
+        settle(window)
+    finally:
+        errors.extend(responder.errors)
+        window.close()
+        app.processEvents()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.gui_bench", description="PackManagerApp 操作基准 (offscreen)")
+    add_generator_arguments(parser)
+    add_output_arguments(parser, "gui_bench.json")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"每个操作重复的次数 (默认: {DEFAULT_REPEAT})")
+    parser.add_argument("--workdir", help="生成合成服务器目录的位置 (默认: 临时目录, 结束后删除)")
+    args = parser.parse_args(argv)
+    start_trace(args)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bedrock_bench_")
+    server_root = os.path.join(workdir, "server")
+    errors = []
+    try:
+        generated = generate_server_root(server_root, **generator_options(args))
+        args.addon_paths = generated["addons"]
+        results = run(args, server_root, errors)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    parameters = dict(generator_options(args), repeat=args.repeat)
+    return finish(args, results, parameters, errors)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
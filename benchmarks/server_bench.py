@@ -0,0 +1,242 @@
+"""服务器控制台和启动/停止流程的基准, 使用 fake_bedrock_server 替身程序, 不需要真实的 bedrock_server.
+
+测量启动到 "Server started" 的时间、命令往返延迟 (list)、控制台吞吐量 (flood)、在线备份、各种停止方式的耗时、
+崩溃检测, 以及这些过程中界面事件循环的停顿:
+    python -m benchmarks.server_bench --output server_bench.json [--compare old.json] [--skip-escalation]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from .common import Results, DialogResponder, create_application, wait_until, add_output_arguments, start_trace, finish
+from .fake_bedrock_server import FLOOD_DONE_MARKER, install_fake_server
+from .gui_bench import settle, select_world
+from .synthetic import generate_server_root
+
+import main_qt # Imported after .common, which selects the offscreen platform
+from PyQt6.QtCore import Qt, QTimer
+
+DEFAULT_REPEAT = 5
+DEFAULT_FLOOD_LINES = 20000
+DEFAULT_STEADY_RATE = 2000 # 行/秒
+DEFAULT_STEADY_SECONDS = 3.0
+COMMAND_ROUND_TRIPS = 10 # 每次启动后测量的 list 往返次数
+STALL_TIMER_INTERVAL_MS = 5 # 检测事件循环停顿的定时器间隔
+WAIT_TIMEOUT = 60 # 秒; 等待服务器输出或退出的最长时间
+BENCH_WORLD = "World_0"
+
+
+class OutputWatcher:
+    """监视实例的原始输出, 记录期待的标记第一次出现的时间"""
+
+    def __init__(self, instance):
+        self.marker = None
+        self.found_at = None
+        self.tail = ""
+        instance.server_output.connect(self.feed)
+
+    def expect(self, marker):
+        self.marker = marker
+        self.found_at = None
+        self.tail = ""
+
+    def feed(self, data):
+        if self.marker is None or self.found_at is not None:
+            return
+        if self.marker in self.tail + data:
+            self.found_at = time.perf_counter()
+        self.tail = (self.tail + data)[-len(self.marker):]
+
+    def wait(self, timeout=WAIT_TIMEOUT):
+        if not wait_until(lambda: self.found_at is not None, timeout):
+            raise TimeoutError(f"等待服务器输出 '{self.marker}' 超时")
+        return self.found_at
+
+
+class StallMonitor:
+    """用高精度定时器测量事件循环的停顿: 相邻两次 timeout 的间隔超出定时器间隔的部分"""
+
+    def __init__(self):
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.setInterval(STALL_TIMER_INTERVAL_MS)
+        self.timer.timeout.connect(self.on_timeout)
+        self.stalls = []
+        self.last = None
+
+    def start(self):
+        self.stalls = []
+        self.last = time.perf_counter()
+        self.timer.start()
+
+    def on_timeout(self):
+        now = time.perf_counter()
+        self.stalls.append(max(now - self.last - STALL_TIMER_INTERVAL_MS / 1000, 0))
+        self.last = now
+
+    def stop(self):
+        self.timer.stop()
+        self.on_timeout() # Count a stall that is still in progress
+        stalls = sorted(self.stalls)
+        p99 = stalls[min(int(len(stalls) * 0.99), len(stalls) - 1)]
+        return stalls[-1], {"p99_stall_ms": round(p99 * 1000, 3), "mean_stall_ms": round(statistics.fmean(stalls) * 1000, 3)}
+
+
+class ServerBench:
+    def __init__(self, args, server_root, results, responder):
+        self.args = args
+        self.server_root = server_root
+        self.results = results
+        self.responder = responder
+        self.window = main_qt.PackManagerApp()
+        self.window.show()
+        self.window.left_tab_widget.setCurrentWidget(self.window.server_control_group) # Console rendering is part of the cost
+        self.window.load_server_root(server_root)
+        settle(self.window)
+        self.instance = self.window.server_instance
+        self.watcher = OutputWatcher(self.instance)
+        self.stalls = StallMonitor()
+        self.finished = None # (exit_code, crashed) of the last process
+        self.instance.process_finished.connect(lambda exit_code, crashed: setattr(self, "finished", (exit_code, crashed)))
+
+    def start(self, *fake_args):
+        install_fake_server(self.server_root, *fake_args)
+        self.finished = None
+        self.watcher.expect("Server started.")
+        start = time.perf_counter()
+        self.window.start_server()
+        self.results.add("start_server -> Server started", self.watcher.wait() - start)
+
+    def wait_stopped(self):
+        if not wait_until(lambda: not self.instance.is_running() and self.finished is not None, WAIT_TIMEOUT):
+            raise TimeoutError("等待服务器退出超时")
+
+    def stop(self, name):
+        start = time.perf_counter()
+        self.window.stop_server()
+        self.wait_stopped()
+        self.results.add(name, time.perf_counter() - start)
+
+    def command_round_trips(self):
+        for _ in range(COMMAND_ROUND_TRIPS):
+            self.watcher.expect("players online:")
+            self.window.server_command_input.setText("list")
+            start = time.perf_counter()
+            self.window.send_server_command()
+            self.results.add("send_server_command (list) 往返", self.watcher.wait() - start)
+
+    def console_flushed(self):
+        console = self.window.server_log_display
+        return not console.pending and not console.flush_timer.isActive()
+
+    def flood(self):
+        lines = self.args.flood_lines
+        self.watcher.expect(FLOOD_DONE_MARKER)
+        self.stalls.start()
+        start = time.perf_counter()
+        self.instance.write_command(f"flood {lines}")
+        self.watcher.wait()
+        wait_until(self.console_flushed, WAIT_TIMEOUT)
+        elapsed = time.perf_counter() - start
+        max_stall, stall_stats = self.stalls.stop()
+        self.results.add(f"控制台吞吐 (flood {lines} 行)", elapsed, lines_per_s=round(lines / elapsed))
+        self.results.add("事件循环最大停顿 (flood)", max_stall, **stall_stats)
+
+    def hot_backup(self):
+        select_world(self.window, BENCH_WORLD)
+        self.responder.answers = ["增量快照"]
+        start = time.perf_counter()
+        self.window.backup_selected_world()
+        if not wait_until(lambda: self.window.hot_backup is None and self.window.backup_thread is None, WAIT_TIMEOUT):
+            raise TimeoutError("在线备份超时")
+        self.results.add("在线备份 (save hold/query/resume, 增量快照)", time.perf_counter() - start)
+        settle(self.window)
+
+    def steady_output(self):
+        self.start("--rate", str(self.args.steady_rate), "--players", "5")
+        self.stalls.start()
+        wait_until(lambda: False, self.args.steady_seconds)
+        max_stall, stall_stats = self.stalls.stop()
+        self.results.add(f"事件循环最大停顿 (持续输出 {self.args.steady_rate:g} 行/秒)", max_stall, **stall_stats)
+        self.stop("stop_server (正常退出)")
+
+    def crash(self):
+        self.start("--crash-after", "0.3")
+        self.watcher.expect("Crash requested")
+        crashed_at = self.watcher.wait()
+        self.wait_stopped()
+        self.results.add("崩溃 -> process_finished", time.perf_counter() - crashed_at, crashed=self.finished[1])
+        if not self.finished[1]:
+            raise RuntimeError("服务器崩溃未被报告为 CrashExit")
+
+    def run(self):
+        for _ in range(self.args.repeat):
+            self.start()
+            self.command_round_trips()
+            self.flood()
+            self.hot_backup()
+            self.stop("stop_server (正常退出)")
+        self.steady_output()
+        self.crash()
+        if not self.args.skip_escalation:
+            # Dominated by SERVER_STOP_TIMEOUT_MS / SERVER_TERMINATE_TIMEOUT_MS, so measured once
+            self.start("--on-stop", "ignore")
+            self.stop("stop_server (忽略 stop -> terminate)")
+            self.start("--on-stop", "hang")
+            self.stop("stop_server (挂起 -> kill)")
+
+    def close(self):
+        for instance in self.window.server_instances.values():
+            if instance.is_running():
+                instance.process.kill()
+                instance.process.waitForFinished(5000)
+        self.window.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.server_bench",
+                                     description="服务器控制台和启动/停止流程基准 (使用 fake_bedrock_server, offscreen)")
+    add_output_arguments(parser, "server_bench.json")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"启动/停止循环的次数 (默认: {DEFAULT_REPEAT})")
+    parser.add_argument("--flood-lines", type=int, default=DEFAULT_FLOOD_LINES, help=f"吞吐测试的行数 (默认: {DEFAULT_FLOOD_LINES})")
+    parser.add_argument("--steady-rate", type=float, default=DEFAULT_STEADY_RATE, help=f"持续输出的速率, 行/秒 (默认: {DEFAULT_STEADY_RATE})")
+    parser.add_argument("--steady-seconds", type=float, default=DEFAULT_STEADY_SECONDS,
+                        help=f"持续输出测试的秒数 (默认: {DEFAULT_STEADY_SECONDS:g})")
+    parser.add_argument("--skip-escalation", action="store_true", help="跳过忽略 stop / 挂起的停止测试 (各需数秒)")
+    args = parser.parse_args(argv)
+    if main_qt.server_executable_name() != "bedrock_server":
+        print("错误: fake_bedrock_server 只能代替 Linux/macOS 上的 bedrock_server", file=sys.stderr)
+        return 1
+    start_trace(args)
+
+    workdir = tempfile.mkdtemp(prefix="bedrock_server_bench_")
+    server_root = os.path.join(workdir, "server")
+    errors = []
+    results = Results("server")
+    try:
+        generate_server_root(server_root, packs=10, worlds=1, world_files=50, world_bytes=4 * 1024 * 1024, addons=0)
+        app = create_application(server_root + "_settings")
+        responder = DialogResponder()
+        bench = ServerBench(args, server_root, results, responder)
+        try:
+            bench.run()
+        except (TimeoutError, RuntimeError) as e:
+            errors.append(str(e))
+        finally:
+            errors.extend(responder.errors)
+            bench.close()
+            app.processEvents()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    parameters = {"repeat": args.repeat, "flood_lines": args.flood_lines, "steady_rate": args.steady_rate,
+                  "steady_seconds": args.steady_seconds, "skip_escalation": args.skip_escalation}
+    return finish(args, results, parameters, errors)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""生成合成的基岩版服务器目录, 供基准测试使用 (不依赖 Qt).
+
+生成的内容是确定的 (同样的参数和 seed 得到同样的文件), 便于在不同版本之间比较结果.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import uuid
+import zipfile
+
+DEFAULT_PACKS = 200 # 行为包和资源包各自的数量
+DEFAULT_PACK_FILES = 8 # 每个包除 manifest/lang 之外的文件数
+DEFAULT_WORLDS = 3
+DEFAULT_WORLD_FILES = 200 # 每个世界 db 目录下的文件数
+DEFAULT_WORLD_BYTES = 32 * 1024 * 1024 # 每个世界的总大小
+DEFAULT_ADDONS = 10 # .mcaddon 数量, 每个包含一个行为包和一个资源包
+LANG_NAME_RATIO = 2 # 每隔几个包使用 "pack.name" 形式的名称 (需要查找 en_US.lang)
+
+
+def pack_uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def pack_files(rng, display_name, pack_type, version, extra_files, lang_name):
+    """返回一个包的 {相对路径: 内容} (manifest.json, lang 文件和 extra_files 个内容文件)"""
+    manifest = {
+        "format_version": 2,
+        "header": {
+            "name": "pack.name" if lang_name else display_name,
+            "description": "pack.description" if lang_name else f"Synthetic {pack_type} pack",
+            "uuid": pack_uuid(rng),
+            "version": version,
+            "min_engine_version": [1, 20, 0],
+        },
+        "modules": [{"type": "data" if pack_type == "behavior" else "resources", "uuid": pack_uuid(rng), "version": version}],
+    }
+    files = {"manifest.json": json.dumps(manifest, indent=4).encode("utf-8")}
+    lang_lines = [f"## {display_name}"] + [f"item.synthetic_{i}.name=Synthetic Item {i}" for i in range(50)]
+    for lang, name in (("en_US", display_name), ("zh_CN", f"{display_name} (中文)")):
+        lines = lang_lines + [f"pack.name={name}", "pack.description=Synthetic pack"]
+        files[f"texts/{lang}.lang"] = "\n".join(lines).encode("utf-8")
+    files["texts/languages.json"] = b'["en_US", "zh_CN"]'
+    folder = "entities" if pack_type == "behavior" else "textures"
+    for i in range(extra_files):
+        if pack_type == "behavior":
+            content = json.dumps({"format_version": "1.20.0", "minecraft:entity": {"description": {"identifier": f"synthetic:e{i}"},
+                                  "components": {f"minecraft:c{j}": {"value": rng.random()} for j in range(20)}}}).encode("utf-8")
+            files[f"{folder}/entity_{i}.json"] = content
+        else:
+            files[f"{folder}/texture_{i}.png"] = rng.randbytes(rng.randint(512, 4096))
+    return files
+
+
+def write_files(base_path, files):
+    for relative_path, content in files.items():
+        path = os.path.join(base_path, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+
+
+def zip_bytes(files, prefix=""):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for relative_path, content in files.items():
+            zf.writestr(prefix + relative_path, content)
+    return buffer.getvalue()
+
+
+def world_file_content(rng, size):
+    """大约一半可压缩的数据, 接近 LevelDB .ldb 文件的压缩率"""
+    random_part = rng.randbytes(size // 2)
+    return random_part + bytes(size - len(random_part))
+
+
+def generate_world(rng, world_path, world_name, file_count, total_bytes, behavior_packs):
+    files = {
+        "levelname.txt": world_name.encode("utf-8"),
+        "level.dat": rng.randbytes(2048),
+        "level.dat_old": rng.randbytes(2048),
+        "db/CURRENT": b"MANIFEST-000001\n",
+        "db/MANIFEST-000001": rng.randbytes(1024),
+        "world_behavior_packs.json": json.dumps([{"pack_id": pack_id, "version": version}
+                                                 for pack_id, version in behavior_packs], indent=4).encode("utf-8"),
+        "world_resource_packs.json": b"[]",
+    }
+    write_files(world_path, files)
+    file_size = max(total_bytes // max(file_count, 1), 1)
+    for i in range(file_count):
+        with open(os.path.join(world_path, "db", f"{i:06d}.ldb"), "wb") as f:
+            f.write(world_file_content(rng, file_size))
+
+
+def generate_server_root(server_root, packs=DEFAULT_PACKS, pack_files_count=DEFAULT_PACK_FILES, worlds=DEFAULT_WORLDS,
+                         world_files=DEFAULT_WORLD_FILES, world_bytes=DEFAULT_WORLD_BYTES, addons=DEFAULT_ADDONS, seed=0):
+    """在 server_root 下生成合成服务器目录, 返回 {"worlds": [世界名], "addons": [.mcaddon 路径], "packs": 包总数}.
+
+    .mcaddon 文件放在 server_root 之外的同级目录 "<server_root>_addons" 中, 以免被当作服务器内容扫描.
+    """
+    rng = random.Random(seed)
+    os.makedirs(server_root, exist_ok=True)
+    with open(os.path.join(server_root, "server.properties"), "w", encoding="utf-8") as f:
+        f.write("server-name=Synthetic\nlevel-name=World_0\nserver-port=19132\nserver-portv6=19133\n")
+
+    world_packs = []
+    for pack_type in ("behavior", "resource"):
+        for i in range(packs):
+            display_name = f"Synthetic {pack_type.title()} Pack {i}"
+            version = [1, rng.randint(0, 20), rng.randint(0, 99)]
+            files = pack_files(rng, display_name, pack_type, version, pack_files_count, lang_name=i % LANG_NAME_RATIO == 0)
+            write_files(os.path.join(server_root, f"{pack_type}_packs", f"{pack_type}_{i:05d}"), files)
+            if pack_type == "behavior" and i < 20:
+                world_packs.append((json.loads(files["manifest.json"])["header"]["uuid"], version))
+
+    world_names = []
+    for i in range(worlds):
+        world_name = f"World_{i}"
+        generate_world(rng, os.path.join(server_root, "worlds", world_name), world_name, world_files, world_bytes, world_packs)
+        world_names.append(world_name)
+
+    addon_dir = os.path.normpath(server_root) + "_addons"
+    os.makedirs(addon_dir, exist_ok=True)
+    addon_paths = []
+    for i in range(addons):
+        with zipfile.ZipFile(os.path.join(addon_dir, f"addon_{i:03d}.mcaddon"), "w", zipfile.ZIP_STORED) as addon:
+            for pack_type, suffix in (("behavior", "bp"), ("resource", "rp")):
+                files = pack_files(rng, f"Synthetic Addon {i} {suffix.upper()}", pack_type, [1, 0, i], pack_files_count, lang_name=False)
+                addon.writestr(f"addon_{i:03d}_{suffix}.mcpack", zip_bytes(files, f"addon_{i:03d}_{suffix}/"))
+        addon_paths.append(os.path.join(addon_dir, f"addon_{i:03d}.mcaddon"))
+    return {"worlds": world_names, "addons": addon_paths, "packs": packs * 2}
+
+
+def add_generator_arguments(parser):
+    parser.add_argument("--packs", type=int, default=DEFAULT_PACKS, help=f"行为包和资源包各自的数量 (默认: {DEFAULT_PACKS})")
+    parser.add_argument("--pack-files", type=int, default=DEFAULT_PACK_FILES, help=f"每个包的内容文件数 (默认: {DEFAULT_PACK_FILES})")
+    parser.add_argument("--worlds", type=int, default=DEFAULT_WORLDS, help=f"世界数量 (默认: {DEFAULT_WORLDS})")
+    parser.add_argument("--world-files", type=int, default=DEFAULT_WORLD_FILES, help=f"每个世界的文件数 (默认: {DEFAULT_WORLD_FILES})")
+    parser.add_argument("--world-mb", type=float, default=DEFAULT_WORLD_BYTES / (1024 * 1024),
+                        help=f"每个世界的大小, MB (默认: {DEFAULT_WORLD_BYTES // (1024 * 1024)})")
+    parser.add_argument("--addons", type=int, default=DEFAULT_ADDONS, help=f".mcaddon 数量 (默认: {DEFAULT_ADDONS})")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子 (默认: 0)")
+
+
+def generator_options(args):
+    """把命令行参数转换为 generate_server_root 的关键字参数"""
+    return {"packs": args.packs, "pack_files_count": args.pack_files, "worlds": args.worlds, "world_files": args.world_files,
+            "world_bytes": int(args.world_mb * 1024 * 1024), "addons": args.addons, "seed": args.seed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.synthetic", description="生成合成的基岩版服务器目录")
+    parser.add_argument("server_root", help="要生成的服务器根目录 (应为空或不存在)")
+    add_generator_arguments(parser)
+    args = parser.parse_args(argv)
+    if os.path.isdir(args.server_root) and os.listdir(args.server_root):
+        print(f"错误: 目录不为空: {args.server_root}", file=sys.stderr)
+        return 1
+    result = generate_server_root(args.server_root, **generator_options(args))
+    print(f"已生成: {result['packs']} 个包, {len(result['worlds'])} 个世界, {len(result['addons'])} 个 .mcaddon")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,20 +4,873 @@ import json
 import uuid
 import shutil
 import zipfile
-import tempfile
-from datetime import datetime
+import zlib
+import collections
+import codecs
+from datetime import datetime, timedelta
 import platform # Added for OS detection
+import threading
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+STARTUP_TIME = time.perf_counter() # 开始导入 Qt 的时间, 启动耗时从这里算起
 
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                             QPushButton, QLabel, QFileDialog, QMessageBox, QTreeWidget,
                             QTreeWidgetItem, QLineEdit, QFrame, QSplitter, QRadioButton,
                             QCheckBox, QGroupBox, QInputDialog, QStatusBar, QComboBox, QDialog,
-                            QTextEdit, QStyle, QTabWidget) # Added QStyle and QTabWidget
-from PyQt6.QtCore import Qt, QSize, QProcess, QUrl # Added QProcess, QUrl
-from PyQt6.QtGui import QFont, QIcon, QPalette, QColor, QDesktopServices, QTextCursor # 添加 QTextCursor
+                            QTextEdit, QStyle, QTabWidget, QTableWidget, QTableWidgetItem,
+                            QHeaderView, QProgressBar, QProgressDialog, QSpinBox, QFormLayout, QPlainTextEdit) # Added QStyle and QTabWidget
+from PyQt6.QtCore import Qt, QSize, QProcess, QUrl, QObject, QThread, QTimer, QFileSystemWatcher, QSettings, QPointF, pyqtSignal # Added QProcess, QUrl
+from PyQt6.QtGui import QFont, QIcon, QPalette, QColor, QDesktopServices, QTextCursor, QPainter, QPolygonF # 添加 QTextCursor
+
+from bedrock_core.storage import ImportCancelled, ContentStore
+from bedrock_core.packs import read_pack_manifest, PACK_STORE_DIRNAME, import_pack_archive, PackIndex
+from bedrock_core.backups import (ZIP_BACKUP_DEFAULT_LEVEL, is_world_dir, new_backup_name, create_backup, record_backup,
+                                  restore_world_backup, RestoreCancelled, BackupCatalog, load_retention_policies, save_retention_policies,
+                                  retention_policy_for, apply_retention, verify_backups)
+from bedrock_core import trace
+from bedrock_core.trace import span
+from bedrock_core.logs import SERVER_LOG_DIRNAME, ServerLogStore, search_logs
+from bedrock_core.server import (HOT_BACKUP_TIMEOUT, HOT_BACKUP_QUERY_INTERVAL_MS, HOT_BACKUP_OUTPUT_TAIL, SERVER_STOP_TIMEOUT_MS,
+                                 SERVER_TERMINATE_TIMEOUT_MS, server_ports, find_port_conflicts, read_server_properties,
+                                 parse_save_query_files, copy_hot_backup_files, server_executable_name, ServerEventParser, ProcessSampler)
+
+PACK_SCAN_BATCH_SIZE = 200 # 后台扫描每批发送到界面的最大行数
+PACK_SCAN_BATCH_INTERVAL = 0.05 # 秒; 未满一批时也至少按此间隔发送
+FS_WATCH_DEBOUNCE_MS = 250 # 合并文件系统事件的等待时间
+WATCHED_SERVER_FOLDERS = ("behavior_packs", "resource_packs", "worlds", "world_backups")
+ZIP_BACKUP_LEVELS = {"快速 (级别 1)": 1, "标准 (级别 6)": 6, "最高 (级别 9)": 9, "不压缩 (仅存储)": 0}
+CONSOLE_MAX_LINES = 5000 # 控制台最多保留的行数, 更早的行会被丢弃
+CONSOLE_FLUSH_INTERVAL_MS = 50 # 服务器输出合并后再刷新到控制台的间隔
+CONSOLE_PENDING_LIMIT = 4 * 1024 * 1024 # 等待刷新的输出超过此字符数时只保留末尾部分
+LOG_SEARCH_RANGES = {"最近 1 小时": 3600, "最近 24 小时": 86400, "最近 7 天": 7 * 86400, "全部": None}
+SETTINGS_ORGANIZATION = "MCBedrockManager" # QSettings 名称, 用于保存服务器实例列表
+SETTINGS_APPLICATION = "PackManager"
+INSTANCE_RECENT_OUTPUT_LIMIT = 512 * 1024 # 每个实例保留的最近输出 (字符), 用于稍后打开的控制台
+RESOURCE_SAMPLE_INTERVAL_MS = 1000 # 默认的进程资源采样间隔
+RESOURCE_SAMPLE_INTERVALS_MS = (250, 500, 1000, 2000, 5000)
+BACKUP_SCRUB_INTERVAL_HOURS = 24 # 定期校验所有备份的间隔
+BACKUP_SCRUB_CHECK_MS = 10 * 60 * 1000 # 检查是否到期的定时器间隔
+BACKUP_TYPE_NAMES = {"folder": "文件夹", "zip": "ZIP", "snapshot": "增量快照"}
+BACKUP_TYPE_CHOICES = {"文件夹复制": "folder", "ZIP压缩包": "zip", "增量快照": "snapshot"} # 备份类型对话框的选项
+STARTUP_TARGET_MS = 300 # 启动到可交互的目标耗时 (磁盘缓存已预热时)
+
+
+class PackScanWorker(QObject):
+    """在后台线程中扫描服务器包目录, 使用线程池并行解析 manifest, 分批发送结果.
+
+    每批结果为 (pack_type, folder_name, folder_mtime, details) 列表; 索引命中的包会先于需要重新解析的包到达.
+    """
+    batch_ready = pyqtSignal(int, list)
+    scan_finished = pyqtSignal(int, bool) # generation, cancelled
+
+    def __init__(self, generation, pack_index, pack_dirs, max_workers=None):
+        super().__init__()
+        self.generation = generation
+        self.pack_index = pack_index
+        self.pack_dirs = pack_dirs
+        self.max_workers = max_workers
+        self._cancel_event = threading.Event()
+        self._batch = []
+        self._last_emit = 0.0 # time.monotonic() of the last emitted batch
+        self._row_count = 0
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _add_row(self, row):
+        self._batch.append(row)
+        self._row_count += 1
+        now = time.monotonic()
+        if len(self._batch) >= PACK_SCAN_BATCH_SIZE or now - self._last_emit >= PACK_SCAN_BATCH_INTERVAL:
+            self._flush(now)
+
+    def _flush(self, now=None):
+        if self._batch and not self.is_cancelled():
+            self.batch_ready.emit(self.generation, self._batch)
+        self._batch = []
+        self._last_emit = now if now is not None else time.monotonic()
+
+    def _store_completed(self, completed, futures, block):
+        """把已完成的解析结果写入索引并加入当前批次; block 为 True 时等待下一个结果"""
+        while futures:
+            try:
+                future = completed.get(block=block, timeout=0.1 if block else None)
+            except queue.Empty:
+                if block and not self.is_cancelled():
+                    continue
+                return
+            pack_type, folder_name, folder_mtime, key, manifest_sig = futures.pop(future)
+            if future.cancelled():
+                continue
+            details = self.pack_index.store(key, manifest_sig, future.result())
+            self._add_row((pack_type, folder_name, folder_mtime, details))
+
+    def run(self):
+        self._last_emit = time.monotonic()
+        futures = {}
+        completed = queue.Queue()
+        with span("pack_scan", "scan") as trace_span:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for pack_type, pack_dir_path in self.pack_dirs.items():
+                    seen_keys = set()
+                    try:
+                        for key, folder_name, pack_path, folder_mtime in self.pack_index.iter_pack_dir(pack_type, pack_dir_path):
+                            if self.is_cancelled():
+                                break
+                            seen_keys.add(key)
+                            manifest_sig, entry = self.pack_index.cached(key, pack_path)
+                            if entry is not None:
+                                self._add_row((pack_type, folder_name, folder_mtime, entry))
+                            else:
+                                future = executor.submit(read_pack_manifest, pack_path)
+                                futures[future] = (pack_type, folder_name, folder_mtime, key, manifest_sig)
+                                future.add_done_callback(completed.put)
+                            # Stream parsed results while still listing so the first rows show up early
+                            self._store_completed(completed, futures, block=False)
+                    except OSError:
+                        pass # Folder vanished mid-scan; whatever was listed is still reported
+                    if not self.is_cancelled():
+                        self.pack_index.prune(pack_type, seen_keys)
+
+                self._store_completed(completed, futures, block=True)
+                if self.is_cancelled():
+                    for future in futures:
+                        future.cancel()
+                self._flush()
+
+            if not self.is_cancelled():
+                self.pack_index.save()
+            trace_span.add(packs=self._row_count)
+            trace_span.set(cancelled=self.is_cancelled())
+        self.scan_finished.emit(self.generation, self.is_cancelled())
+
+
+class BatchImportWorker(QObject):
+    """在线程池中并行导入多个 .mcaddon/.mcpack 文件, 逐个文件报告进度和结果"""
+    file_started = pyqtSignal(int)
+    file_progress = pyqtSignal(int, int) # row, percent
+    file_finished = pyqtSignal(int, str, str) # row, state ("success"/"warning"/"failed"/"cancelled"), message
+    batch_finished = pyqtSignal(bool) # cancelled
+
+    def __init__(self, file_paths, server_root, world_path=None, max_workers=None):
+        super().__init__()
+        self.file_paths = file_paths
+        self.server_root = server_root
+        self.world_path = world_path
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _import_one(self, row, file_path):
+        if self.is_cancelled():
+            self.file_finished.emit(row, "cancelled", "已取消")
+            return
+        self.file_started.emit(row)
+        last_percent = -1
+
+        def on_progress(done_bytes, total_bytes):
+            nonlocal last_percent
+            percent = int(done_bytes * 100 / total_bytes) if total_bytes else 100
+            if percent != last_percent: # At most ~100 signals per file
+                last_percent = percent
+                self.file_progress.emit(row, percent)
+
+        try:
+            imported, skipped = import_pack_archive(file_path, self.server_root, self.world_path,
+                                                    on_progress, self._cancel_event)
+        except ImportCancelled:
+            self.file_finished.emit(row, "cancelled", "已取消")
+            return
+        except zipfile.BadZipFile:
+            self.file_finished.emit(row, "failed", "不是有效的ZIP/包文件")
+            return
+        except Exception as e:
+            self.file_finished.emit(row, "failed", str(e))
+            return
+
+        messages = []
+        if imported:
+            messages.append("已导入: " + ", ".join(folder_name for _, folder_name in imported))
+        messages.extend(skipped)
+        if not imported:
+            self.file_finished.emit(row, "failed", "; ".join(messages) or "未找到有效的包内容")
+        else:
+            self.file_finished.emit(row, "warning" if skipped else "success", "; ".join(messages))
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for row, file_path in enumerate(self.file_paths):
+                executor.submit(self._import_one, row, file_path)
+        # Packs replaced by this batch may have left store objects nothing references any more
+        ContentStore(os.path.join(self.server_root, PACK_STORE_DIRNAME)).collect_garbage()
+        self.batch_finished.emit(self.is_cancelled())
+
+
+class BackupWorker(QObject):
+    """在后台线程中创建世界备份并写入备份索引; 指定 cleanup_path 时完成后删除该目录 (在线备份的暂存副本)"""
+    backup_finished = pyqtSignal(str, object) # backup name, stats
+    backup_failed = pyqtSignal(str)
+
+    def __init__(self, world_name, world_path, backup_dir, backup_name_base, backup_type, zip_level, cleanup_path=None):
+        super().__init__()
+        self.world_name = world_name
+        self.world_path = world_path
+        self.backup_dir = backup_dir
+        self.backup_name_base = backup_name_base
+        self.backup_type = backup_type
+        self.zip_level = zip_level
+        self.cleanup_path = cleanup_path
+        self.catalog_error = None
+
+    def run(self):
+        try:
+            name, stats = create_backup(self.world_path, self.backup_dir, self.world_name, self.backup_type,
+                                        self.backup_name_base, self.zip_level)
+        except Exception as e:
+            self.backup_failed.emit(str(e))
+            return
+        finally:
+            if self.cleanup_path:
+                shutil.rmtree(self.cleanup_path, ignore_errors=True)
+        try:
+            record_backup(self.backup_dir, name, self.world_name, self.backup_type, stats)
+        except OSError as e:
+            # The backup itself is complete; the catalog entry is rebuilt from the name on the next sync
+            self.catalog_error = str(e)
+        self.backup_finished.emit(name, stats)
+
+
+class RestoreWorker(QObject):
+    """在后台线程中把备份恢复到暂存目录并替换目标世界; 取消只在替换之前生效, 目标世界不会处于半恢复状态"""
+    restore_progress = pyqtSignal(object, object) # restored bytes, total bytes (may exceed int32)
+    restore_finished = pyqtSignal(object, object) # stats, kept old world path or None
+    restore_failed = pyqtSignal(str, bool) # error message, cancelled
+
+    def __init__(self, world_name, backup_name, source_backup_path, target_world_path, keep_old):
+        super().__init__()
+        self.world_name = world_name
+        self.backup_name = backup_name
+        self.source_backup_path = source_backup_path
+        self.target_world_path = target_world_path
+        self.keep_old = keep_old
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        last_emit = 0.0
+
+        def on_progress(done, total):
+            nonlocal last_emit
+            now = time.monotonic()
+            if done == total or now - last_emit >= PACK_SCAN_BATCH_INTERVAL:
+                last_emit = now
+                self.restore_progress.emit(done, total)
+
+        try:
+            stats, kept_path = restore_world_backup(self.source_backup_path, self.target_world_path, keep_old=self.keep_old,
+                                                    progress=on_progress, cancel_event=self._cancel_event)
+        except RestoreCancelled:
+            self.restore_failed.emit("", True)
+            return
+        except Exception as e:
+            self.restore_failed.emit(str(e), False)
+            return
+        self.restore_finished.emit(stats, kept_path)
+
+
+class HotBackupCopyWorker(QObject):
+    """在后台线程中按 save query 报告的文件列表复制世界; 服务器在复制期间暂停保存, 复制结束后才能 save resume"""
+    copy_finished = pyqtSignal(str) # error message, empty on success
+
+    def __init__(self, worlds_dir, world_name, files, staging_path):
+        super().__init__()
+        self.worlds_dir = worlds_dir
+        self.world_name = world_name
+        self.files = files
+        self.staging_path = staging_path
+
+    def run(self):
+        try:
+            copy_hot_backup_files(self.worlds_dir, self.world_name, self.files, self.staging_path)
+        except Exception as e:
+            shutil.rmtree(self.staging_path, ignore_errors=True)
+            self.copy_finished.emit(str(e) or type(e).__name__)
+            return
+        self.copy_finished.emit("")
+
+
+class RetentionWorker(QObject):
+    """在后台线程中按保留策略清理过期备份"""
+    retention_finished = pyqtSignal(list, object) # deleted backup names, bytes freed (may exceed int32)
+    retention_failed = pyqtSignal(str)
+
+    def __init__(self, backup_dir, world_names=None):
+        super().__init__()
+        self.backup_dir = backup_dir
+        self.world_names = world_names
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        try:
+            deleted, freed = apply_retention(self.backup_dir, self.world_names, self._cancel_event)
+        except Exception as e:
+            self.retention_failed.emit(str(e))
+            return
+        self.retention_finished.emit(deleted, freed)
+
+
+class BackupVerifyWorker(QObject):
+    """在后台线程中并行校验备份"""
+    verify_progress = pyqtSignal(int, int) # done tasks, total tasks
+    verify_finished = pyqtSignal(dict, bool) # {name: (state, problems)}, cancelled
+
+    def __init__(self, backup_dir, names, catalog_entries):
+        super().__init__()
+        self.backup_dir = backup_dir
+        self.names = names
+        self.catalog_entries = catalog_entries
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        last_emit = 0.0
+
+        def on_progress(done, total):
+            nonlocal last_emit
+            now = time.monotonic()
+            if done == total or now - last_emit >= PACK_SCAN_BATCH_INTERVAL:
+                last_emit = now
+                self.verify_progress.emit(done, total)
+
+        try:
+            results = verify_backups(self.backup_dir, self.names, self.catalog_entries,
+                                     progress=on_progress, cancel_event=self._cancel_event)
+        except Exception as e:
+            results = {name: ("corrupt", [f"校验出错: {e}"]) for name in self.names}
+        self.verify_finished.emit(results, self._cancel_event.is_set())
+
+
+class LogSearchWorker(QObject):
+    """在后台线程中搜索服务器日志"""
+    search_finished = pyqtSignal(list, dict)
+
+    def __init__(self, log_dir, query, start=None):
+        super().__init__()
+        self.log_dir = log_dir
+        self.query = query
+        self.start = start
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        try:
+            results, stats = search_logs(self.log_dir, self.query, self.start, cancel_event=self._cancel_event)
+        except (OSError, EOFError, ValueError, zlib.error) as e:
+            results, stats = [], {"error": str(e)}
+        self.search_finished.emit(results, stats)
+
+
+class RetentionPolicyDialog(QDialog):
+    """编辑单个世界的备份保留策略"""
+
+    def __init__(self, parent, world_name, policy):
+        super().__init__(parent)
+        self.setWindowTitle(f"备份保留策略 - {world_name}")
+        layout = QVBoxLayout(self)
+
+        self.enabled_check = QCheckBox("启用自动清理 (每次备份后在后台执行)")
+        self.enabled_check.setChecked(policy["enabled"])
+        layout.addWidget(self.enabled_check)
+
+        form = QFormLayout()
+        self.spin_boxes = {}
+        for key, label in (("keep_last", "保留最近的备份数:"), ("hourly", "按小时保留 (小时数):"),
+                           ("daily", "按天保留 (天数):"), ("weekly", "按周保留 (周数):")):
+            spin_box = QSpinBox()
+            spin_box.setRange(1 if key == "keep_last" else 0, 9999)
+            spin_box.setValue(policy[key])
+            form.addRow(label, spin_box)
+            self.spin_boxes[key] = spin_box
+        layout.addLayout(form)
+        layout.addWidget(QLabel("每个时间段只保留其中最新的一个备份; 同时满足任一规则的备份都会被保留."))
+
+        buttons = QHBoxLayout()
+        buttons.addStretch(1)
+        save_btn = QPushButton("保存")
+        save_btn.clicked.connect(self.accept)
+        buttons.addWidget(save_btn)
+        cancel_btn = QPushButton("取消")
+        cancel_btn.clicked.connect(self.reject)
+        buttons.addWidget(cancel_btn)
+        layout.addLayout(buttons)
+
+    def policy(self):
+        policy = {key: spin_box.value() for key, spin_box in self.spin_boxes.items()}
+        policy["enabled"] = self.enabled_check.isChecked()
+        return policy
+
+
+class LogConsole(QPlainTextEdit):
+    """只读的服务器控制台: 输出先缓存, 每 CONSOLE_FLUSH_INTERVAL_MS 合并写入一次, 最多保留 CONSOLE_MAX_LINES 行"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
+        self.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap) # Wrapping long lines is the costliest part of layout
+        self.setMaximumBlockCount(CONSOLE_MAX_LINES)
+        self.pending = []
+        self.pending_size = 0
+        self.at_line_start = True
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(CONSOLE_FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def append_output(self, text):
+        """追加原始输出 (可以不以换行结尾)"""
+        if not text:
+            return
+        self.pending.append(text)
+        self.pending_size += len(text)
+        self.at_line_start = text.endswith("\n")
+        if self.pending_size > CONSOLE_PENDING_LIMIT:
+            # The view only keeps the tail anyway; don't let a stalled GUI buffer unbounded output
+            tail = "".join(self.pending)[-CONSOLE_PENDING_LIMIT // 2:]
+            self.pending = [tail]
+            self.pending_size = len(tail)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def append_line(self, text):
+        """追加一行消息 (总是从新的一行开始)"""
+        self.append_output(("" if self.at_line_start else "\n") + text + "\n")
+
+    def flush(self):
+        if not self.pending:
+            return
+        text = "".join(self.pending)
+        self.pending = []
+        self.pending_size = 0
+        scroll_bar = self.verticalScrollBar()
+        follow = scroll_bar.value() >= scroll_bar.maximum() # Only autoscroll when already at the bottom
+        with span("console_flush", "ui", chars=len(text)):
+            cursor = QTextCursor(self.document())
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.insertText(text)
+        if follow:
+            scroll_bar.setValue(scroll_bar.maximum())
+
+    def clear_console(self):
+        self.flush_timer.stop()
+        self.pending = []
+        self.pending_size = 0
+        self.at_line_start = True
+        self.clear()
+
+
+class SparklineWidget(QWidget):
+    """一个指标的迷你折线图, 标题和当前值显示在左上角"""
+
+    def __init__(self, title, formatter, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.formatter = formatter
+        self.values = []
+        self.setMinimumSize(120, 48)
+
+    def set_values(self, values):
+        self.values = values
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        rect = self.rect().adjusted(1, 1, -1, -1)
+        painter.setPen(self.palette().color(QPalette.ColorRole.Mid))
+        painter.drawRect(rect)
+        values = [value for value in self.values if value is not None]
+        current = self.formatter(values[-1]) if values else "-"
+        painter.setPen(self.palette().color(QPalette.ColorRole.WindowText))
+        painter.drawText(rect.adjusted(4, 2, -4, -2), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop, f"{self.title}: {current}")
+        if len(values) < 2:
+            return
+        top = max(max(values), 1e-9)
+        plot = rect.adjusted(2, 18, -2, -2)
+        step = plot.width() / (len(values) - 1)
+        points = [QPointF(plot.left() + i * step, plot.bottom() - value / top * plot.height()) for i, value in enumerate(values)]
+        painter.setPen(QColor("#3a8ee6"))
+        painter.drawPolyline(QPolygonF(points))
+
+
+def format_bytes(value):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(value) < 1024 or unit == "GB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+class ServerInstance(QObject):
+    """一个服务器根目录对应的服务器实例: 进程、控制台输出缓冲、磁盘日志、事件解析和异步停止状态机.
+
+    不依赖任何窗口部件; 控制台标签页通过 console_output 信号显示输出, 并可用 recent_output 补上打开之前的内容.
+    """
+    console_output = pyqtSignal(str) # Everything shown in a console (server output and manager messages)
+    server_output = pyqtSignal(str) # Raw decoded server output only
+    server_event = pyqtSignal(object) # ServerEvent
+    state_changed = pyqtSignal()
+    process_finished = pyqtSignal(int, bool) # exit code, crashed
+    process_error = pyqtSignal(str)
+    resources_sampled = pyqtSignal(object) # ResourceSample
+
+    def __init__(self, root_path, executable_name, parent=None):
+        super().__init__(parent)
+        self.root_path = root_path
+        self.executable_name = executable_name
+        self.process = None
+        self.stop_phase = None # None, "stopping", "terminating" or "killed" while an asynchronous stop runs
+        self.stop_timer = QTimer(self)
+        self.stop_timer.setSingleShot(True)
+        self.stop_timer.timeout.connect(self.on_stop_timeout)
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.log_store = None
+        self.closing_log_stores = [] # Stores finishing their last segment in the background
+        self.events = ServerEventParser()
+        self.events.subscribe(None, self.on_event)
+        self.online_players = {} # player name -> xuid
+        self.recent_output = collections.deque()
+        self.recent_size = 0
+        self.at_line_start = True
+        self.resources = ProcessSampler()
+        self.resource_timer = QTimer(self)
+        self.resource_timer.timeout.connect(self.sample_resources)
+
+    @property
+    def name(self):
+        return os.path.basename(os.path.normpath(self.root_path)) or self.root_path
+
+    def is_running(self):
+        return self.process is not None and self.process.state() != QProcess.ProcessState.NotRunning
+
+    def state_text(self):
+        if self.stop_phase is not None:
+            return "正在停止"
+        if self.process is None:
+            return "已停止"
+        if self.process.state() == QProcess.ProcessState.Starting:
+            return "正在启动"
+        return "运行中"
+
+    def emit_console(self, text):
+        self.recent_output.append(text)
+        self.recent_size += len(text)
+        while self.recent_size > INSTANCE_RECENT_OUTPUT_LIMIT and len(self.recent_output) > 1:
+            self.recent_size -= len(self.recent_output.popleft())
+        self.at_line_start = text.endswith("\n")
+        self.console_output.emit(text)
+
+    def message(self, text):
+        """向控制台追加一行管理器自己的消息"""
+        self.emit_console(("" if self.at_line_start else "\n") + text + "\n")
+
+    def start(self):
+        """启动服务器进程; 失败时返回错误信息"""
+        if self.is_running():
+            return "服务器已在运行中."
+        server_exe_path = os.path.join(self.root_path, self.executable_name)
+        if not os.path.exists(server_exe_path):
+            return f"服务器可执行文件未找到: {server_exe_path}\n请确保 '{self.executable_name}' 在服务器根目录中."
+
+        self.process = QProcess(self)
+        self.process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+        self.process.readyReadStandardOutput.connect(self.on_ready_read)
+        self.process.started.connect(self.on_started)
+        self.process.finished.connect(self.on_finished)
+        self.process.errorOccurred.connect(self.on_error)
+        self.process.setWorkingDirectory(self.root_path)
+
+        self.recent_output.clear()
+        self.recent_size = 0
+        self.at_line_start = True
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.close_log_store()
+        self.events.reset()
+        self.online_players = {}
+        self.log_store = ServerLogStore(os.path.join(self.root_path, SERVER_LOG_DIRNAME))
+        self.message(f"正在启动服务器: {server_exe_path}...")
+        if platform.system() == "Linux" and not os.access(server_exe_path, os.X_OK):
+            self.message(f"警告: {self.executable_name} 可能没有执行权限.请尝试 'chmod +x {self.executable_name}'.")
+        self.process.start(server_exe_path, [])
+        self.state_changed.emit()
+        return None
+
+    def stop(self):
+        """异步停止: 发送 stop 后由定时器依次升级为 terminate 和 kill, 进程结束时发出 process_finished"""
+        if not self.is_running():
+            self.message("服务器未运行或已停止.")
+            return
+        if self.stop_phase is not None:
+            return # Already stopping; the timer escalates if needed
+        self.message("正在发送 'stop' 命令到服务器...")
+        self.write_command("stop")
+        self.stop_phase = "stopping"
+        self.stop_timer.start(SERVER_STOP_TIMEOUT_MS)
+        self.state_changed.emit()
+
+    def on_stop_timeout(self):
+        if not self.is_running():
+            return
+        if self.stop_phase == "stopping":
+            self.message("服务器未能优雅停止,正在强制终止...")
+            self.stop_phase = "terminating"
+            self.process.terminate()
+            self.stop_timer.start(SERVER_TERMINATE_TIMEOUT_MS)
+        elif self.stop_phase == "terminating":
+            self.message("服务器未能终止,正在强制杀死进程...")
+            self.stop_phase = "killed"
+            self.process.kill()
+
+    def write_command(self, command):
+        """发送命令 (不等待写入完成, QProcess 在事件循环中写出); 服务器未运行时返回 False"""
+        if not self.is_running():
+            return False
+        self.process.write((command + "\n").encode('utf-8'))
+        return True
+
+    def on_ready_read(self):
+        if self.process is None:
+            return
+        # Incremental decoding keeps multi-byte characters split across reads intact
+        data = self.decoder.decode(self.process.readAllStandardOutput().data())
+        if not data:
+            return
+        self.emit_console(data)
+        if self.log_store is not None:
+            self.log_store.write(data)
+        self.server_output.emit(data)
+        self.events.feed(data) # After the console append, so parsing never delays the view
+
+    def on_event(self, event):
+        if event.kind == "player_connected":
+            self.online_players[event.data["player"]] = event.data["xuid"]
+        elif event.kind == "player_disconnected":
+            self.online_players.pop(event.data["player"], None)
+        self.server_event.emit(event)
+        if event.kind in ("player_connected", "player_disconnected", "server_started"):
+            self.state_changed.emit()
+
+    def on_started(self):
+        self.message("服务器已启动.\n")
+        if self.resources.attach(self.process.processId()):
+            self.sample_resources()
+            self.resource_timer.start(self.resource_interval_ms())
+        self.state_changed.emit()
+
+    def resource_interval_ms(self):
+        return QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION).value(
+            "resource_sample_interval_ms", RESOURCE_SAMPLE_INTERVAL_MS, type=int)
+
+    def set_resource_interval(self, interval_ms):
+        if self.resource_timer.isActive():
+            self.resource_timer.start(interval_ms)
+
+    def sample_resources(self):
+        sample = self.resources.sample()
+        if sample is None:
+            self.resource_timer.stop()
+            return
+        self.resources_sampled.emit(sample)
+
+    def on_finished(self, exit_code, exit_status):
+        self.events.finish()
+        self.online_players = {}
+        crashed = exit_status != QProcess.ExitStatus.NormalExit
+        self.message(f"\n服务器进程 {'意外终止' if crashed else '已停止'} (退出码: {exit_code}).")
+        self.process_gone()
+        self.process_finished.emit(exit_code, crashed)
+
+    def on_error(self, error):
+        error_map = {
+            QProcess.ProcessError.FailedToStart: "启动失败", QProcess.ProcessError.Crashed: "崩溃",
+            QProcess.ProcessError.Timedout: "超时", QProcess.ProcessError.ReadError: "读取错误",
+            QProcess.ProcessError.WriteError: "写入错误", QProcess.ProcessError.UnknownError: "未知错误"
+        }
+        error_string = error_map.get(error, "未知错误")
+        self.message(f"服务器进程错误: {error_string}")
+        if error == QProcess.ProcessError.FailedToStart:
+            self.process_gone() # No finished() follows a failed start
+        # Crashes also emit finished(); other errors (e.g. a failed write) leave the process running
+        self.process_error.emit(error_string)
+
+    def process_gone(self):
+        self.stop_timer.stop()
+        self.resource_timer.stop()
+        self.resources.detach()
+        self.stop_phase = None
+        self.process = None
+        self.close_log_store()
+        self.state_changed.emit()
+
+    def close_log_store(self):
+        """关闭日志存储; 写完剩余输出和压缩日志段在其后台线程中进行, 不阻塞界面"""
+        self.closing_log_stores = [store for store in self.closing_log_stores if store.thread.is_alive()]
+        if self.log_store is not None:
+            self.log_store.close(wait=False)
+            self.closing_log_stores.append(self.log_store)
+            self.log_store = None
+
+    def wait_for_log_stores(self):
+        """退出前等待所有日志存储写完"""
+        self.close_log_store()
+        for store in self.closing_log_stores:
+            store.thread.join()
+        self.closing_log_stores = []
+
+
+class ServerConsoleTab(QWidget):
+    """服务器实例的控制台标签页 (只在用户打开时创建)"""
+
+    def __init__(self, instance, parent=None):
+        super().__init__(parent)
+        self.instance = instance
+        layout = QVBoxLayout(self)
+        self.console = LogConsole()
+        self.console.setFont(QFont("Consolas", 9))
+        layout.addWidget(self.console)
+        command_layout = QHBoxLayout()
+        self.command_input = QLineEdit()
+        self.command_input.setPlaceholderText(f"向 {instance.name} 发送命令...")
+        self.command_input.returnPressed.connect(self.send_command)
+        command_layout.addWidget(self.command_input)
+        send_btn = QPushButton("发送")
+        send_btn.clicked.connect(self.send_command)
+        command_layout.addWidget(send_btn)
+        layout.addLayout(command_layout)
+
+        self.console.append_output("".join(instance.recent_output))
+        instance.console_output.connect(self.console.append_output)
+
+    def send_command(self):
+        command = self.command_input.text().strip()
+        if command and self.instance.write_command(command):
+            self.instance.message(f"> {command}")
+            self.command_input.clear()
+
+    def detach(self):
+        self.instance.console_output.disconnect(self.console.append_output)
+
+
+class BatchImportDialog(QDialog):
+    """批量导入进度窗口: 每个文件一行, 失败原因在表格中汇总显示"""
+    cancel_requested = pyqtSignal()
+
+    STATE_LABELS = {"success": "成功", "warning": "部分成功", "failed": "失败", "cancelled": "已取消"}
+    STATE_COLORS = {"success": "green", "warning": "darkorange", "failed": "red", "cancelled": "gray"}
+
+    def __init__(self, parent, file_paths):
+        super().__init__(parent)
+        self.setWindowTitle(f"批量导入 ({len(file_paths)} 个文件)")
+        self.setMinimumSize(800, 450)
+        self.finished_count = 0
+        self.state_counts = {state: 0 for state in self.STATE_LABELS}
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(len(file_paths), 3)
+        self.table.setHorizontalHeaderLabels(["文件", "状态", "结果"])
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.table.setColumnWidth(0, 250)
+        self.table.setColumnWidth(1, 90)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        for row, file_path in enumerate(file_paths):
+            self.table.setItem(row, 0, QTableWidgetItem(os.path.basename(file_path)))
+            self.table.setItem(row, 1, QTableWidgetItem("等待中"))
+            self.table.setItem(row, 2, QTableWidgetItem(""))
+        layout.addWidget(self.table)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, len(file_paths))
+        self.progress_bar.setValue(0)
+        layout.addWidget(self.progress_bar)
+
+        buttons = QHBoxLayout()
+        self.summary_label = QLabel("正在导入...")
+        buttons.addWidget(self.summary_label, 1)
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_DialogCancelButton))
+        self.cancel_btn.clicked.connect(self.on_cancel_clicked)
+        buttons.addWidget(self.cancel_btn)
+        self.close_btn = QPushButton("关闭")
+        self.close_btn.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_DialogCloseButton))
+        self.close_btn.clicked.connect(self.accept)
+        self.close_btn.setEnabled(False)
+        buttons.addWidget(self.close_btn)
+        layout.addLayout(buttons)
+
+    def on_cancel_clicked(self):
+        self.cancel_btn.setEnabled(False)
+        self.summary_label.setText("正在取消...")
+        self.cancel_requested.emit()
+
+    def on_file_started(self, row):
+        self.table.item(row, 1).setText("导入中")
+
+    def on_file_progress(self, row, percent):
+        self.table.item(row, 1).setText(f"导入中 {percent}%")
+
+    def on_file_finished(self, row, state, message):
+        status_item = self.table.item(row, 1)
+        status_item.setText(self.STATE_LABELS[state])
+        status_item.setForeground(QColor(self.STATE_COLORS[state]))
+        self.table.item(row, 2).setText(message)
+        self.table.item(row, 2).setToolTip(message)
+        self.state_counts[state] += 1
+        self.finished_count += 1
+        self.progress_bar.setValue(self.finished_count)
+
+    def summary_text(self):
+        parts = [f"{self.state_counts['success'] + self.state_counts['warning']} 个成功"]
+        if self.state_counts["failed"]:
+            parts.append(f"{self.state_counts['failed']} 个失败")
+        if self.state_counts["cancelled"]:
+            parts.append(f"{self.state_counts['cancelled']} 个已取消")
+        return "导入完成: " + ", ".join(parts) + "."
+
+    def on_batch_finished(self, cancelled):
+        self.summary_label.setText(self.summary_text())
+        self.cancel_btn.setEnabled(False)
+        self.close_btn.setEnabled(True)
+
+    def reject(self):
+        # Closing the window while importing only cancels; it can be closed once the batch stops
+        if self.close_btn.isEnabled():
+            super().reject()
+        elif self.cancel_btn.isEnabled():
+            self.on_cancel_clicked()
+
 
 class PackManagerApp(QMainWindow):
     def __init__(self):
+        build_start = time.perf_counter()
         super().__init__()
         self.setWindowTitle("Minecraft Bedrock 服务器与存档管理器 v8.3 (PyQt6版)") # 版本更新
         self.setMinimumSize(1200, 800)
@@ -31,15 +884,24 @@ class PackManagerApp(QMainWindow):
         self.world_behavior_json_path = ""
         self.world_resource_json_path = ""
         self.server_pack_uuid_to_manifest_details = {} # New: To map UUID to manifest name & other details
+        self.pack_index = None # PackIndex for the loaded server root
+        self.pack_scan_thread = None # Background server pack scan (PackScanWorker)
+        self.pack_scan_worker = None
+        self.pack_scan_generation = 0
+        self.pack_scan_count = 0
+        self.pack_scan_failures = 0
+        self.server_pack_items = {"behavior": {}, "resource": {}} # folder name -> QTreeWidgetItem
+        self.import_thread = None # Batch import (BatchImportWorker)
+        self.import_worker = None
+        self.import_dialog = None
 
         # Server Process
-        self.server_process = None
-        if platform.system() == "Windows":
-            self.server_executable_name = "bedrock_server.exe"
-        elif platform.system() == "Linux":
-            self.server_executable_name = "bedrock_server" # May need chmod +x
-        else: # macOS or other
-            self.server_executable_name = "bedrock_server" # Adjust as needed
+        self.server_instances = {} # server root -> ServerInstance (everything the supervisor manages)
+        self.server_instance = None # Instance of the loaded server root, shown in the 服务器控制台 tab
+        self.instance_console_tabs = {} # server root -> ServerConsoleTab, created only when opened
+        self.close_after_server_stop = False
+        self.server_executable_name = server_executable_name() # On Linux it may need chmod +x
+        if platform.system() not in ("Windows", "Linux"): # macOS or other
             QMessageBox.information(self, "提示", f"服务器可执行文件名默认为 '{self.server_executable_name}'. 如果不同,请在代码中修改.")
 
 
@@ -63,14 +925,17 @@ class PackManagerApp(QMainWindow):
         main_splitter.addWidget(self.left_tab_widget) # 将 QTabWidget 添加到分割器
 
         # 创建各个部分,并将它们添加为标签页
-        world_management_group = self.create_world_management_section()
-        self.left_tab_widget.addTab(world_management_group, "世界管理")
+        self.world_management_group = self.create_world_management_section()
+        self.left_tab_widget.addTab(self.world_management_group, "世界管理")
 
         server_pack_management_group = self.create_server_pack_management_section()
         self.left_tab_widget.addTab(server_pack_management_group, "服务器包管理")
         
-        server_control_group = self.create_server_control_section()
-        self.left_tab_widget.addTab(server_control_group, "服务器控制台")
+        # 控制台和实例页在第一次切换到时才创建 (见 ensure_tab_built)
+        self.server_console_built = False
+        self.server_control_group = self.add_lazy_tab("服务器控制台", self.create_server_control_section)
+        self.add_lazy_tab("服务器实例", self.create_server_supervisor_section)
+        self.left_tab_widget.currentChanged.connect(self.ensure_tab_built)
         # --- 左侧面板修改结束 ---
         
         # 右侧面板 (保持不变)
@@ -82,6 +947,41 @@ class PackManagerApp(QMainWindow):
         self.create_pack_import_section(right_layout)
         self.create_world_pack_management_section(right_layout)
 
+        # Filesystem watcher for live pack/world updates; bursts of events are coalesced by fs_watch_timer
+        self.fs_watcher = QFileSystemWatcher(self)
+        self.fs_watcher.directoryChanged.connect(self.on_watched_path_changed)
+        self.fs_watcher.fileChanged.connect(self.on_watched_path_changed) # manifest.json / en_US.lang of listed packs
+        self.fs_watch_timer = QTimer(self)
+        self.fs_watch_timer.setSingleShot(True)
+        self.fs_watch_timer.setInterval(FS_WATCH_DEBOUNCE_MS)
+        self.fs_watch_timer.timeout.connect(self.apply_pending_fs_changes)
+        self.fs_pending_paths = set()
+        self.known_world_backups = set()
+        self.hot_backup = None # State of a running save hold/query/resume backup
+        self.hot_backup_copy_thread = None
+        self.hot_backup_copy_worker = None
+        self.backup_thread = None
+        self.backup_worker = None
+        self.restore_thread = None # World restore (RestoreWorker); the world management tab is disabled meanwhile
+        self.restore_worker = None
+        self.restore_progress_dialog = None
+        self.log_search_thread = None
+        self.log_search_worker = None
+        self.retention_thread = None
+        self.retention_worker = None
+        self.retention_pending = set() # Worlds whose backups changed while a cleanup was running
+        self.verify_thread = None
+        self.verify_worker = None
+        self.verify_scheduled = False # True for the periodic scrub, False when started from the button
+        self.scrub_timer = QTimer(self)
+        self.scrub_timer.setInterval(BACKUP_SCRUB_CHECK_MS)
+        self.scrub_timer.timeout.connect(self.on_scrub_timer)
+        self.scrub_timer.start()
+        self.hot_backup_timer = QTimer(self)
+        self.hot_backup_timer.setInterval(HOT_BACKUP_QUERY_INTERVAL_MS)
+        self.hot_backup_timer.timeout.connect(self.on_hot_backup_timer)
+        self.zip_backup_level_name = next(name for name, level in ZIP_BACKUP_LEVELS.items() if level == ZIP_BACKUP_DEFAULT_LEVEL)
+
         # Create status bar
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
@@ -94,11 +994,72 @@ class PackManagerApp(QMainWindow):
         self.disable_all_world_specific_controls()
         self.disable_server_specific_controls() # New: disable server controls initially
 
+        # Startup timing; the remaining work (instance list, last server root scans) runs after the first paint
+        self.startup_timings = {"import": build_start - STARTUP_TIME}
+        self.startup_pending_root = None
+        self.first_paint_done = False
+        self.startup_time_label = QLabel()
+        self.status_bar.addPermanentWidget(self.startup_time_label)
+        self.show_cached_server_root()
+        self.startup_timings["build"] = time.perf_counter() - build_start
+
+    def add_lazy_tab(self, title, builder):
+        """添加一个占位标签页, 第一次显示时才调用 builder 创建内容"""
+        page = QWidget()
+        page_layout = QVBoxLayout(page)
+        page_layout.setContentsMargins(0, 0, 0, 0)
+        page.builder = builder
+        self.left_tab_widget.addTab(page, title)
+        return page
+
+    def ensure_tab_built(self, index):
+        page = self.left_tab_widget.widget(index)
+        builder = getattr(page, "builder", None)
+        if builder is None:
+            return
+        page.builder = None
+        page.layout().addWidget(builder())
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_paint_done:
+            self.first_paint_done = True
+            QTimer.singleShot(0, self.on_first_paint) # Runs once the first frame has been handed to the window system
+
+    def on_first_paint(self):
+        """首次绘制完成: 报告启动耗时, 然后执行推迟的启动任务"""
+        timings = self.startup_timings
+        timings["first_paint"] = time.perf_counter() - STARTUP_TIME - timings["import"] - timings["build"]
+        timings["total"] = time.perf_counter() - STARTUP_TIME
+        total_ms = timings["total"] * 1000
+        self.startup_time_label.setText(f"启动耗时: {total_ms:.0f} ms")
+        self.startup_time_label.setToolTip(f"导入 {timings['import'] * 1000:.0f} ms, 创建界面 {timings['build'] * 1000:.0f} ms, "
+                                           f"首次绘制 {timings['first_paint'] * 1000:.0f} ms (目标 {STARTUP_TARGET_MS} ms)")
+        if total_ms > STARTUP_TARGET_MS:
+            self.startup_time_label.setStyleSheet("color: darkorange;")
+
+        self.restore_server_instances()
+        if self.startup_pending_root:
+            root_path, self.startup_pending_root = self.startup_pending_root, None
+            self.worlds_list.setEnabled(True)
+            self.load_server_root(root_path)
+
     def setup_styles(self):
         """设置应用程序样式"""
         app_font = QFont("Microsoft YaHei", 10)
         QApplication.setFont(app_font)
 
+        self.dark_palette = None # Built on first use (toggle_dark_mode)
+
+        self.light_palette = QPalette() # Using default Qt light palette by not setting it fully
+
+        self.setPalette(self.light_palette) # Default to light mode
+
+        self.dark_mode_btn = QPushButton("切换深色模式")
+        self.dark_mode_btn.clicked.connect(self.toggle_dark_mode)
+        self.dark_mode_btn.setCheckable(True)
+
+    def build_dark_palette(self):
         self.dark_palette = QPalette()
         self.dark_palette.setColor(QPalette.ColorRole.Window, QColor(53, 53, 53))
         self.dark_palette.setColor(QPalette.ColorRole.WindowText, QColor(255, 255, 255))
@@ -113,14 +1074,6 @@ class PackManagerApp(QMainWindow):
         self.dark_palette.setColor(QPalette.ColorRole.Highlight, QColor(42, 130, 218))
         self.dark_palette.setColor(QPalette.ColorRole.HighlightedText, QColor(255, 255, 255))
 
-        self.light_palette = QPalette() # Using default Qt light palette by not setting it fully
-
-        self.setPalette(self.light_palette) # Default to light mode
-
-        self.dark_mode_btn = QPushButton("切换深色模式")
-        self.dark_mode_btn.clicked.connect(self.toggle_dark_mode)
-        self.dark_mode_btn.setCheckable(True)
-
     def create_top_controls(self, parent_layout):
         """创建顶部控制栏"""
         top_frame = QFrame()
@@ -155,6 +1108,24 @@ class PackManagerApp(QMainWindow):
         
         top_controls_layout.addWidget(quick_access_group)
 
+        self.restore_last_root_checkbox = QCheckBox("启动时恢复上次的目录")
+        self.restore_last_root_checkbox.setToolTip("启动时先显示上次的世界列表缓存, 窗口显示后再在后台重新扫描")
+        self.restore_last_root_checkbox.setChecked(
+            QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION).value("restore_last_server_root", True, type=bool))
+        self.restore_last_root_checkbox.toggled.connect(
+            lambda checked: QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION).setValue("restore_last_server_root", checked))
+        top_controls_layout.addWidget(self.restore_last_root_checkbox)
+
+        self.trace_checkbox = QCheckBox("性能追踪")
+        self.trace_checkbox.setToolTip("记录扫描、导入、备份和恢复等操作的耗时, 可导出为 Chrome trace JSON\n"
+                                       "(在 chrome://tracing 或 ui.perfetto.dev 中查看)")
+        self.trace_checkbox.setChecked(trace.is_enabled())
+        self.trace_checkbox.toggled.connect(self.toggle_tracing)
+        top_controls_layout.addWidget(self.trace_checkbox)
+        self.export_trace_btn = QPushButton("导出追踪...")
+        self.export_trace_btn.clicked.connect(self.export_trace)
+        top_controls_layout.addWidget(self.export_trace_btn)
+
         top_controls_layout.addWidget(self.dark_mode_btn)
 
         parent_layout.addWidget(top_frame)
@@ -199,6 +1170,16 @@ class PackManagerApp(QMainWindow):
         self.restore_world_btn.clicked.connect(self.restore_world_dialog)
         buttons_layout.addWidget(self.restore_world_btn)
 
+        self.retention_policy_btn = QPushButton("保留策略")
+        self.retention_policy_btn.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_TrashIcon))
+        self.retention_policy_btn.clicked.connect(self.edit_retention_policy)
+        buttons_layout.addWidget(self.retention_policy_btn)
+
+        self.verify_backups_btn = QPushButton("校验备份")
+        self.verify_backups_btn.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_DialogApplyButton))
+        self.verify_backups_btn.clicked.connect(self.verify_all_backups)
+        buttons_layout.addWidget(self.verify_backups_btn)
+
         self.edit_world_settings_btn = QPushButton("编辑世界设置")
         self.edit_world_settings_btn.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_FileIcon))
         self.edit_world_settings_btn.clicked.connect(self.edit_world_settings)
@@ -209,6 +1190,8 @@ class PackManagerApp(QMainWindow):
         self.load_world_btn.setEnabled(False)
         self.backup_world_btn.setEnabled(False)
         self.restore_world_btn.setEnabled(False)
+        self.retention_policy_btn.setEnabled(False)
+        self.verify_backups_btn.setEnabled(False)
         self.edit_world_settings_btn.setEnabled(False)
         
         return group
@@ -259,6 +1242,12 @@ class PackManagerApp(QMainWindow):
         self.refresh_server_packs_btn.clicked.connect(self.refresh_server_packs_list)
         buttons_layout.addWidget(self.refresh_server_packs_btn)
 
+        self.cancel_server_pack_scan_btn = QPushButton("取消扫描")
+        self.cancel_server_pack_scan_btn.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_BrowserStop))
+        self.cancel_server_pack_scan_btn.clicked.connect(self.on_cancel_server_pack_scan_clicked)
+        self.cancel_server_pack_scan_btn.setEnabled(False)
+        buttons_layout.addWidget(self.cancel_server_pack_scan_btn)
+
         self.quick_add_server_pack_btn = QPushButton("快速添加选中包到世界")
         self.quick_add_server_pack_btn.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_DialogApplyButton))
         self.quick_add_server_pack_btn.clicked.connect(self.quick_add_selected_server_pack_to_world)
@@ -290,13 +1279,53 @@ class PackManagerApp(QMainWindow):
         self.edit_server_properties_btn.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_FileIcon)) 
         self.edit_server_properties_btn.clicked.connect(self.edit_server_properties)
         actions_layout.addWidget(self.edit_server_properties_btn)
+        actions_layout.addStretch(1)
+        self.online_players_label = QLabel("在线玩家: 0")
+        actions_layout.addWidget(self.online_players_label)
         layout.addLayout(actions_layout)
 
-        self.server_log_display = QTextEdit()
-        self.server_log_display.setReadOnly(True)
+        self.server_log_display = LogConsole()
         self.server_log_display.setFont(QFont("Consolas", 9)) 
         layout.addWidget(self.server_log_display)
 
+        resources_layout = QHBoxLayout()
+        self.resource_sparklines = {
+            "cpu_percent": SparklineWidget("CPU", lambda value: f"{value:.1f}%"),
+            "rss_bytes": SparklineWidget("内存", format_bytes),
+            "threads": SparklineWidget("线程", lambda value: str(int(value))),
+            "read_bytes_per_s": SparklineWidget("读", lambda value: format_bytes(value) + "/s"),
+            "write_bytes_per_s": SparklineWidget("写", lambda value: format_bytes(value) + "/s"),
+        }
+        for sparkline in self.resource_sparklines.values():
+            resources_layout.addWidget(sparkline, 1)
+        self.resource_interval_combo = QComboBox()
+        self.resource_interval_combo.setToolTip("资源采样间隔")
+        for interval_ms in RESOURCE_SAMPLE_INTERVALS_MS:
+            self.resource_interval_combo.addItem(f"{interval_ms / 1000:g} 秒", interval_ms)
+        saved_interval = QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION).value(
+            "resource_sample_interval_ms", RESOURCE_SAMPLE_INTERVAL_MS, type=int)
+        self.resource_interval_combo.setCurrentIndex(max(self.resource_interval_combo.findData(saved_interval), 0))
+        self.resource_interval_combo.currentIndexChanged.connect(self.change_resource_interval)
+        resources_layout.addWidget(self.resource_interval_combo)
+        layout.addLayout(resources_layout)
+        if not ProcessSampler.supported():
+            for sparkline in self.resource_sparklines.values():
+                sparkline.setToolTip("资源监控需要 /proc (仅支持 Linux)")
+
+        log_search_layout = QHBoxLayout()
+        self.log_search_input = QLineEdit()
+        self.log_search_input.setPlaceholderText("搜索历史日志 (玩家名、错误信息等, 整词匹配)...")
+        self.log_search_input.returnPressed.connect(self.search_server_logs)
+        log_search_layout.addWidget(self.log_search_input)
+        self.log_search_range_combo = QComboBox()
+        self.log_search_range_combo.addItems(list(LOG_SEARCH_RANGES))
+        log_search_layout.addWidget(self.log_search_range_combo)
+        self.log_search_btn = QPushButton("搜索日志")
+        self.log_search_btn.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_FileDialogContentsView))
+        self.log_search_btn.clicked.connect(self.search_server_logs)
+        log_search_layout.addWidget(self.log_search_btn)
+        layout.addLayout(log_search_layout)
+
         command_layout = QHBoxLayout()
         self.server_command_input = QLineEdit()
         self.server_command_input.setPlaceholderText("输入服务器命令 (例如: list, say Hello)...")
@@ -308,7 +1337,11 @@ class PackManagerApp(QMainWindow):
         self.send_command_btn.clicked.connect(self.send_server_command)
         command_layout.addWidget(self.send_command_btn)
         layout.addLayout(command_layout)
-        
+
+        self.server_console_built = True
+        if self.server_instance is not None:
+            self.attach_console(self.server_instance)
+        self.update_online_players_label()
         self.update_server_controls_state() 
         return group
 
@@ -492,25 +1525,80 @@ class PackManagerApp(QMainWindow):
         self.status_bar.showMessage(message)
         self.status_bar.setStyleSheet(f"color: {color};")
 
+    def toggle_tracing(self, enabled):
+        trace.set_enabled(enabled)
+        if enabled:
+            self.update_status("性能追踪已开启", "info")
+        else:
+            self.update_status(f"性能追踪已关闭, 已记录 {trace.event_count()} 个事件", "info")
+
+    def export_trace(self):
+        if not trace.event_count():
+            QMessageBox.information(self, "导出追踪", "还没有记录任何事件. 请先勾选 \"性能追踪\" 并执行一些操作.")
+            return
+        default_name = f"bedrock_trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出性能追踪", default_name, "Chrome trace (*.json)")
+        if not file_path:
+            return
+        try:
+            count = trace.export_chrome_trace(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "错误", f"导出追踪失败: {str(e)}")
+            return
+        self.update_status(f"已导出 {count} 个追踪事件到 {file_path}", "success")
+
     def select_server_root_directory(self):
         dir_path = QFileDialog.getExistingDirectory(self, "选择服务器根目录", "", QFileDialog.Option.ShowDirsOnly)
         if dir_path:
-            self.server_root_path = dir_path
-            self.server_root_display_edit.setText(dir_path) 
-            self.server_root_label.setText(f"服务器根目录: {dir_path}")
-            self.update_status(f"已加载服务器根目录: {dir_path}", "success")
-
-            self.refresh_worlds_list()
-            self.refresh_server_packs_list() # This will also populate server_pack_uuid_to_manifest_details
-            self.enable_server_specific_controls()
-            
-            self.reset_world_specific_ui()
-            self.disable_all_world_specific_controls()
+            self.load_server_root(dir_path)
+
+    def load_server_root(self, dir_path):
+        self.server_root_path = dir_path
+        self.bind_primary_instance(self.get_server_instance(dir_path))
+        self.server_root_display_edit.setText(dir_path) 
+        self.server_root_label.setText(f"服务器根目录: {dir_path}")
+        self.update_status(f"已加载服务器根目录: {dir_path}", "success")
+        QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION).setValue("last_server_root", dir_path)
+
+        self.reset_server_watcher()
+        self.refresh_worlds_list()
+        self.refresh_server_packs_list() # This will also populate server_pack_uuid_to_manifest_details
+        self.enable_server_specific_controls()
+        
+        self.reset_world_specific_ui()
+        self.disable_all_world_specific_controls()
 
-            are_quick_access_buttons_enabled = bool(self.server_root_path)
-            self.quick_access_worlds_btn.setEnabled(are_quick_access_buttons_enabled)
-            self.quick_access_bp_btn.setEnabled(are_quick_access_buttons_enabled)
-            self.quick_access_rp_btn.setEnabled(are_quick_access_buttons_enabled)
+        are_quick_access_buttons_enabled = bool(self.server_root_path)
+        self.quick_access_worlds_btn.setEnabled(are_quick_access_buttons_enabled)
+        self.quick_access_bp_btn.setEnabled(are_quick_access_buttons_enabled)
+        self.quick_access_rp_btn.setEnabled(are_quick_access_buttons_enabled)
+
+    def show_cached_server_root(self):
+        """启动时显示上次服务器目录的世界列表缓存; 真正的加载和扫描推迟到首次绘制之后"""
+        settings = QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION)
+        root_path = settings.value("last_server_root", "", type=str)
+        if not self.restore_last_root_checkbox.isChecked() or not root_path or not os.path.isdir(root_path):
+            return
+        self.startup_pending_root = root_path
+        self.server_root_label.setText(f"服务器根目录: {root_path} (正在加载...)")
+        try:
+            snapshot = json.loads(settings.value("worlds_snapshot", "", type=str) or "{}")
+        except ValueError:
+            snapshot = {}
+        if snapshot.get("root") == root_path:
+            self.worlds_list.addTopLevelItems([QTreeWidgetItem(row) for row in snapshot["worlds"]])
+        self.worlds_list.setEnabled(False) # Cached rows only; enabled again by the real scan
+        self.update_status(f"正在加载上次的服务器根目录: {root_path}", "info")
+
+    def save_worlds_snapshot(self):
+        if not self.server_root_path:
+            return
+        rows = []
+        for index in range(self.worlds_list.topLevelItemCount()):
+            item = self.worlds_list.topLevelItem(index)
+            rows.append([item.text(0), item.text(1)])
+        snapshot = {"root": self.server_root_path, "worlds": rows}
+        QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION).setValue("worlds_snapshot", json.dumps(snapshot, ensure_ascii=False))
 
 
     def reset_world_specific_ui(self):
@@ -547,28 +1635,33 @@ class PackManagerApp(QMainWindow):
         
         self.restore_world_btn.setEnabled(True)
 
-        world_count = 0
-        for world_name in os.listdir(worlds_dir):
-            world_path = os.path.join(worlds_dir, world_name)
-            if os.path.isdir(world_path):
-                if not (os.path.exists(os.path.join(world_path, "levelname.txt")) or \
-                        os.path.exists(os.path.join(world_path, "level.dat"))):
-                    continue 
-
-                mtime = os.path.getmtime(world_path)
-                mtime_str = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
-                item = QTreeWidgetItem([world_name, mtime_str])
-                self.worlds_list.addTopLevelItem(item)
-                world_count += 1
+        with span("refresh_worlds_list", "ui") as trace_span:
+            world_count = 0
+            for world_name in os.listdir(worlds_dir):
+                world_path = os.path.join(worlds_dir, world_name)
+                if os.path.isdir(world_path) and not world_name.startswith("."): # Skip restore staging folders
+                    if not is_world_dir(world_path):
+                        continue 
+
+                    self.worlds_list.addTopLevelItem(self.create_world_item(world_name, world_path))
+                    world_count += 1
+            trace_span.add(worlds=world_count)
         self.update_status(f"已刷新世界列表, 共 {world_count} 个世界", "info")
 
 
+    def create_world_item(self, world_name, world_path):
+        mtime = os.path.getmtime(world_path)
+        mtime_str = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
+        return QTreeWidgetItem([world_name, mtime_str])
+
+
     def on_world_select(self):
         selected_items = self.worlds_list.selectedItems()
         has_selection = len(selected_items) > 0
 
         self.load_world_btn.setEnabled(has_selection)
         self.backup_world_btn.setEnabled(has_selection)
+        self.retention_policy_btn.setEnabled(has_selection)
         self.edit_world_settings_btn.setEnabled(has_selection and bool(self.loaded_world_name) and self.loaded_world_name == selected_items[0].text(0) if has_selection else False)
 
 
@@ -654,34 +1747,363 @@ class PackManagerApp(QMainWindow):
             QMessageBox.critical(self, "错误", f"创建备份目录失败: {str(e)}")
             return
 
-        backup_name_base = f"{world_name}_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        if self.retention_thread is not None:
+            QMessageBox.information(self, "提示", "正在后台清理过期备份, 请稍后再试.")
+            return
+        if self.backup_thread is not None or self.hot_backup is not None:
+            QMessageBox.information(self, "提示", "正在后台创建备份, 请稍后再试.")
+            return
+        if self.restore_thread is not None:
+            QMessageBox.information(self, "提示", "正在恢复世界, 请稍后再试.")
+            return
 
-        backup_type, ok = QInputDialog.getItem(self, "选择备份类型", "请选择备份方式:", ["文件夹复制", "ZIP压缩包"], 0, False)
+        backup_name_base = new_backup_name(world_name)
+
+        backup_type, ok = QInputDialog.getItem(self, "选择备份类型", "请选择备份方式:", list(BACKUP_TYPE_CHOICES), 0, False)
         if not ok:
             return
 
-        if backup_type == "文件夹复制":
-            backup_path = os.path.join(backup_dir, backup_name_base)
-            try:
-                shutil.copytree(world_path, backup_path)
-                self.update_status(f"已创建世界备份 (文件夹): {backup_name_base}", "success")
-                QMessageBox.information(self, "成功", f"文件夹备份 '{backup_name_base}' 创建成功!")
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"备份世界 (文件夹) 失败: {str(e)}")
-        
-        elif backup_type == "ZIP压缩包":
-            backup_zip_path = os.path.join(backup_dir, f"{backup_name_base}.zip")
-            try:
-                with zipfile.ZipFile(backup_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for root, _, files in os.walk(world_path):
-                        for file in files:
-                            file_full_path = os.path.join(root, file)
-                            archive_name = os.path.relpath(file_full_path, world_path)
-                            zipf.write(file_full_path, archive_name)
-                self.update_status(f"已创建世界备份 (ZIP): {backup_name_base}.zip", "success")
-                QMessageBox.information(self, "成功", f"ZIP备份 '{backup_name_base}.zip' 创建成功!")
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"备份世界 (ZIP) 失败: {str(e)}")
+        if backup_type == "ZIP压缩包":
+            level_names = list(ZIP_BACKUP_LEVELS)
+            level_name, ok = QInputDialog.getItem(self, "选择压缩级别", "压缩级别 (越高越慢, 文件越小):", level_names,
+                                                  level_names.index(self.zip_backup_level_name), False)
+            if not ok:
+                return
+            self.zip_backup_level_name = level_name
+
+        if self.server_instance is not None and self.server_instance.is_running() and \
+           world_name == read_server_properties(self.server_root_path).get("level-name"):
+            # The running server has this world open: take a consistent copy with save hold/query/resume
+            self.start_hot_backup(world_name, backup_dir, backup_name_base, backup_type)
+            return
+        self.create_world_backup(world_name, world_path, backup_dir, backup_name_base, backup_type)
+
+    def create_world_backup(self, world_name, world_path, backup_dir, backup_name_base, backup_type, cleanup_path=None):
+        """在后台线程中创建备份, 完成后由 on_backup_finished 记录索引并报告结果"""
+        backup_type = BACKUP_TYPE_CHOICES.get(backup_type, backup_type)
+        self.backup_worker = BackupWorker(world_name, world_path, backup_dir, backup_name_base, backup_type,
+                                          ZIP_BACKUP_LEVELS[self.zip_backup_level_name], cleanup_path)
+        self.backup_thread = QThread()
+        self.backup_worker.moveToThread(self.backup_thread)
+        self.backup_thread.started.connect(self.backup_worker.run)
+        self.backup_worker.backup_finished.connect(self.on_backup_finished)
+        self.backup_worker.backup_failed.connect(self.on_backup_failed)
+        self.update_status(f"正在创建世界备份 ({BACKUP_TYPE_NAMES[backup_type]}): {world_name}...", "info")
+        self.backup_thread.start()
+
+    def stop_backup_thread(self):
+        """等待备份线程结束 (备份不能中途取消, 否则会留下不完整的备份)"""
+        worker = self.backup_worker
+        self.backup_thread.quit()
+        self.backup_thread.wait()
+        self.backup_thread = None
+        self.backup_worker = None
+        return worker
+
+    def on_backup_failed(self, message):
+        if self.backup_thread is None:
+            return
+        worker = self.stop_backup_thread()
+        self.update_status(f"备份世界失败: {message}", "error")
+        QMessageBox.critical(self, "错误", f"备份世界 ({BACKUP_TYPE_NAMES[worker.backup_type]}) 失败: {message}")
+
+    def on_backup_finished(self, name, stats):
+        if self.backup_thread is None:
+            return # Window closing; the queued result is no longer shown
+        worker = self.stop_backup_thread()
+        world_name, backup_type = worker.world_name, worker.backup_type
+        self.known_world_backups.add(name)
+        if worker.catalog_error:
+            self.update_status(f"写入备份索引失败: {worker.catalog_error}", "warning")
+        else:
+            self.update_status(f"已创建世界备份 ({BACKUP_TYPE_NAMES[backup_type]}): {name}", "success")
+        if backup_type == "folder":
+            copied_mb = stats["copied_bytes"] / (1024 * 1024)
+            QMessageBox.information(self, "成功", f"文件夹备份 '{name}' 创建成功!\n"
+                                                f"共 {stats['files']} 个文件, 硬链接 {stats['linked']} 个未变化的文件, "
+                                                f"复制 {stats['copied']} 个 ({copied_mb:.1f} MB).")
+        elif backup_type == "zip":
+            ratio = stats["compressed_bytes"] / stats["bytes"] * 100 if stats["bytes"] else 100
+            QMessageBox.information(self, "成功", f"ZIP备份 '{name}' 创建成功!\n"
+                                                f"共 {stats['files']} 个文件 ({stats['stored']} 个未压缩直接存储), "
+                                                f"压缩后为原大小的 {ratio:.0f}%.")
+        else:
+            stored_mb = stats["stored_bytes"] / (1024 * 1024)
+            QMessageBox.information(self, "成功", f"增量快照 '{name}' 创建成功!\n"
+                                                f"共 {stats['files']} 个文件, 复用 {stats['reused']} 个未变化的文件, "
+                                                f"新写入 {stats['stored_files']} 个 ({stored_mb:.1f} MB).")
+        self.start_retention([world_name])
+
+    def verify_all_backups(self):
+        if not self.server_root_path:
+            return
+        if self.retention_thread is not None:
+            QMessageBox.information(self, "提示", "正在后台清理过期备份, 请稍后再试.")
+            return
+        if not self.start_backup_verification(scheduled=False):
+            QMessageBox.information(self, "提示", "没有找到可校验的备份.")
+
+    def on_scrub_timer(self):
+        if not self.server_root_path or self.verify_thread is not None or self.retention_thread is not None:
+            return
+        backup_dir = os.path.join(self.server_root_path, "world_backups")
+        if not os.path.isdir(backup_dir):
+            return
+        last_scrub = BackupCatalog(backup_dir).last_scrub
+        if last_scrub and datetime.now() - datetime.fromisoformat(last_scrub) < timedelta(hours=BACKUP_SCRUB_INTERVAL_HOURS):
+            return
+        self.start_backup_verification(scheduled=True)
+
+    def start_backup_verification(self, scheduled):
+        """在后台校验 world_backups 中的所有备份; 没有备份时返回 False"""
+        if self.verify_thread is not None:
+            return True
+        backup_dir = os.path.join(self.server_root_path, "world_backups")
+        if not os.path.isdir(backup_dir):
+            return False
+        catalog = BackupCatalog(backup_dir)
+        try:
+            with catalog.update():
+                catalog.sync()
+        except OSError as e:
+            self.update_status(f"更新备份索引失败: {str(e)}", "warning")
+        if not catalog.entries:
+            return False
+
+        self.verify_scheduled = scheduled
+        self.verify_worker = BackupVerifyWorker(backup_dir, sorted(catalog.entries), dict(catalog.entries))
+        self.verify_thread = QThread()
+        self.verify_worker.moveToThread(self.verify_thread)
+        self.verify_thread.started.connect(self.verify_worker.run)
+        self.verify_worker.verify_progress.connect(self.on_verify_progress)
+        self.verify_worker.verify_finished.connect(self.on_verify_finished)
+        self.verify_backups_btn.setEnabled(False)
+        self.update_status(f"正在校验 {len(catalog.entries)} 个备份...", "info")
+        self.verify_thread.start()
+        return True
+
+    def on_verify_progress(self, done, total):
+        percent = int(done * 100 / total) if total else 100
+        self.update_status(f"正在校验备份... {percent}%", "info")
+
+    def on_verify_finished(self, results, cancelled):
+        if self.verify_thread is None:
+            return
+        backup_dir = self.verify_worker.backup_dir
+        self.verify_thread.quit()
+        self.verify_thread.wait()
+        self.verify_thread = None
+        self.verify_worker = None
+        self.verify_backups_btn.setEnabled(bool(self.server_root_path))
+
+        try:
+            with BackupCatalog(backup_dir).update() as catalog: # Re-read under the lock: backups may have been added meanwhile
+                for name, (state, _) in results.items():
+                    catalog.record_verification(name, state)
+                if not cancelled:
+                    catalog.last_scrub = datetime.now().isoformat(timespec="seconds")
+                    catalog.dirty = True
+        except OSError as e:
+            self.update_status(f"写入备份索引失败: {str(e)}", "warning")
+
+        corrupt = {name: problems for name, (state, problems) in results.items() if state == "corrupt"}
+        unverifiable = [name for name, (state, _) in results.items() if state == "unverifiable"]
+        summary = f"已校验 {len(results)} 个备份: {len(results) - len(corrupt) - len(unverifiable)} 个完好"
+        if corrupt:
+            summary += f", {len(corrupt)} 个损坏"
+        if unverifiable:
+            summary += f", {len(unverifiable)} 个无法校验 (没有清单)"
+        self.update_status(summary, "error" if corrupt else "success")
+
+        if corrupt or not self.verify_scheduled:
+            box = QMessageBox(QMessageBox.Icon.Warning if corrupt else QMessageBox.Icon.Information,
+                              "备份校验结果", summary + ".", parent=self)
+            if corrupt or unverifiable:
+                details = []
+                for name, problems in sorted(corrupt.items()):
+                    details.append(f"[损坏] {name}")
+                    details.extend(f"    {problem}" for problem in problems[:20])
+                    if len(problems) > 20:
+                        details.append(f"    ... 另有 {len(problems) - 20} 个问题")
+                details.extend(f"[无法校验] {name}" for name in sorted(unverifiable))
+                box.setDetailedText("\n".join(details))
+            box.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+            box.show() # Non-modal: a scheduled scrub must not block whatever the user is doing
+        self.run_pending_retention()
+
+    def cancel_backup_verification(self):
+        if self.verify_thread is None:
+            return
+        self.verify_worker.cancel()
+        self.verify_thread.quit()
+        self.verify_thread.wait()
+        self.verify_thread = None
+        self.verify_worker = None
+
+    def edit_retention_policy(self):
+        selected_items = self.worlds_list.selectedItems()
+        if not selected_items or not self.server_root_path:
+            return
+        world_name = selected_items[0].text(0)
+        backup_dir = os.path.join(self.server_root_path, "world_backups")
+        policies = load_retention_policies(backup_dir)
+        dialog = RetentionPolicyDialog(self, world_name, retention_policy_for(policies, world_name))
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        policies[world_name] = dialog.policy()
+        try:
+            save_retention_policies(backup_dir, policies)
+        except OSError as e:
+            QMessageBox.critical(self, "错误", f"保存保留策略失败: {str(e)}")
+            return
+        self.update_status(f"已保存世界 '{world_name}' 的备份保留策略", "success")
+        if policies[world_name]["enabled"]:
+            self.start_retention([world_name])
+
+    def start_retention(self, world_names):
+        """在后台线程中按保留策略清理这些世界的过期备份; 已有清理在进行时排队到其结束后"""
+        if self.retention_thread is not None or self.verify_thread is not None:
+            self.retention_pending.update(world_names) # Don't delete backups that are being verified
+            return
+        backup_dir = os.path.join(self.server_root_path, "world_backups")
+        if not any(retention_policy_for(load_retention_policies(backup_dir), name)["enabled"] for name in world_names):
+            return
+        self.retention_worker = RetentionWorker(backup_dir, set(world_names))
+        self.retention_thread = QThread()
+        self.retention_worker.moveToThread(self.retention_thread)
+        self.retention_thread.started.connect(self.retention_worker.run)
+        self.retention_worker.retention_finished.connect(self.on_retention_finished)
+        self.retention_worker.retention_failed.connect(self.on_retention_failed)
+        self.retention_thread.start()
+
+    def stop_retention_thread(self):
+        self.retention_thread.quit()
+        self.retention_thread.wait()
+        self.retention_thread = None
+        self.retention_worker = None
+
+    def on_retention_finished(self, deleted, freed):
+        if self.retention_thread is None:
+            return # Cancelled while the result was queued
+        self.stop_retention_thread()
+        self.known_world_backups.difference_update(deleted)
+        if deleted:
+            self.update_status(f"已按保留策略删除 {len(deleted)} 个过期备份, 释放 {freed / (1024 * 1024):.1f} MB", "success")
+        self.run_pending_retention()
+
+    def on_retention_failed(self, message):
+        if self.retention_thread is None:
+            return
+        self.stop_retention_thread()
+        self.update_status(f"清理过期备份失败: {message}", "error")
+        self.run_pending_retention()
+
+    def run_pending_retention(self):
+        if self.retention_pending and self.server_root_path:
+            world_names, self.retention_pending = self.retention_pending, set()
+            self.start_retention(world_names)
+
+    def cancel_retention(self):
+        if self.retention_thread is None:
+            return
+        self.retention_pending.clear()
+        self.retention_worker.cancel() # Stops between deletions; a backup is never left half-deleted
+        self.stop_retention_thread()
+
+    def start_hot_backup(self, world_name, backup_dir, backup_name_base, backup_type):
+        """在线备份: save hold 后每秒发送 save query, 直到服务器报告可复制的文件列表 (由 feed_hot_backup_output 解析)"""
+        if self.hot_backup is not None:
+            QMessageBox.information(self, "提示", "在线备份正在进行中.")
+            return
+        self.hot_backup = {
+            "world_name": world_name,
+            "backup_dir": backup_dir,
+            "backup_name_base": backup_name_base,
+            "backup_type": backup_type,
+            "output": "",
+            "deadline": time.monotonic() + HOT_BACKUP_TIMEOUT,
+            "copying": False,
+        }
+        self.backup_world_btn.setEnabled(False)
+        self.server_instance.message("正在执行在线备份: save hold...")
+        self.update_status(f"正在等待服务器保存世界 '{world_name}'...", "info")
+        self.write_server_command("save hold")
+        self.hot_backup_timer.start()
+
+    def on_hot_backup_timer(self):
+        if self.hot_backup is None:
+            self.hot_backup_timer.stop()
+            return
+        if time.monotonic() > self.hot_backup["deadline"]:
+            self.abort_hot_backup("等待服务器保存数据超时")
+            return
+        self.write_server_command("save query")
+
+    def feed_hot_backup_output(self, data):
+        if self.hot_backup["copying"]:
+            return
+        self.hot_backup["output"] += data
+        files = parse_save_query_files(self.hot_backup["output"])
+        if files is None:
+            # Keep only the tail so a marker split across chunks is still found
+            self.hot_backup["output"] = self.hot_backup["output"][-HOT_BACKUP_OUTPUT_TAIL:]
+            return
+        self.hot_backup_timer.stop()
+        self.finish_hot_backup(files)
+
+    def finish_hot_backup(self, files):
+        """在后台线程中复制服务器报告的文件; 复制完成后 (on_hot_backup_copied) 才发送 save resume"""
+        hot_backup = self.hot_backup
+        hot_backup["copying"] = True
+        staging_path = os.path.join(hot_backup["backup_dir"], f".{hot_backup['backup_name_base']}.hot")
+        worlds_dir = os.path.join(self.server_root_path, "worlds")
+        self.hot_backup_copy_worker = HotBackupCopyWorker(worlds_dir, hot_backup["world_name"], files, staging_path)
+        self.hot_backup_copy_thread = QThread()
+        self.hot_backup_copy_worker.moveToThread(self.hot_backup_copy_thread)
+        self.hot_backup_copy_thread.started.connect(self.hot_backup_copy_worker.run)
+        self.hot_backup_copy_worker.copy_finished.connect(self.on_hot_backup_copied)
+        self.server_instance.message(f"在线备份: 正在复制 {len(files)} 个文件...")
+        self.hot_backup_copy_thread.start()
+
+    def stop_hot_backup_copy_thread(self):
+        worker = self.hot_backup_copy_worker
+        self.hot_backup_copy_thread.quit()
+        self.hot_backup_copy_thread.wait()
+        self.hot_backup_copy_thread = None
+        self.hot_backup_copy_worker = None
+        return worker
+
+    def on_hot_backup_copied(self, error):
+        if self.hot_backup_copy_thread is None:
+            return
+        worker = self.stop_hot_backup_copy_thread()
+        hot_backup = self.hot_backup
+        if hot_backup is None or error:
+            shutil.rmtree(worker.staging_path, ignore_errors=True)
+            if hot_backup is not None:
+                self.abort_hot_backup(f"复制世界文件失败: {error}")
+            return # Otherwise aborted while copying (e.g. the server stopped); abort_hot_backup already reported it
+        self.write_server_command("save resume") # The server only waits for the copy, not the backup format
+        self.server_instance.message(f"在线备份: 已复制 {len(worker.files)} 个文件, save resume.")
+        self.hot_backup = None
+        self.backup_world_btn.setEnabled(bool(self.worlds_list.selectedItems()))
+        self.create_world_backup(hot_backup["world_name"], worker.staging_path, hot_backup["backup_dir"],
+                                 hot_backup["backup_name_base"], hot_backup["backup_type"], cleanup_path=worker.staging_path)
+
+    def abort_hot_backup(self, reason):
+        self.hot_backup_timer.stop()
+        if self.hot_backup is None:
+            return
+        self.hot_backup = None
+        self.backup_world_btn.setEnabled(bool(self.worlds_list.selectedItems()))
+        if self.server_instance is not None and self.server_instance.is_running():
+            self.write_server_command("save resume")
+        self.update_status(f"在线备份失败: {reason}", "error")
+        QMessageBox.critical(self, "错误", f"在线备份失败: {reason}")
+
+    def write_server_command(self, command):
+        if self.server_instance is not None:
+            self.server_instance.write_command(command)
 
 
     def restore_world_dialog(self):
@@ -696,62 +2118,139 @@ class PackManagerApp(QMainWindow):
         target_world_name = selected_items[0].text(0)
 
         backup_dir = os.path.join(self.server_root_path, "world_backups")
-        if not os.path.exists(backup_dir) or not os.listdir(backup_dir):
+        if not os.path.exists(backup_dir):
             QMessageBox.information(self, "提示", "没有找到 'world_backups' 目录或备份为空.")
             return
 
-        backups = []
-        for f_name in os.listdir(backup_dir):
-            if f_name.startswith(target_world_name + "_backup_") and \
-               (os.path.isdir(os.path.join(backup_dir, f_name)) or f_name.endswith(".zip")):
-                backups.append(f_name)
+        if self.retention_thread is not None:
+            QMessageBox.information(self, "提示", "正在后台清理过期备份, 请稍后再试.")
+            return
+
+        catalog = BackupCatalog(backup_dir)
+        try:
+            with catalog.update():
+                catalog.sync()
+        except OSError as e:
+            self.update_status(f"更新备份索引失败: {str(e)}", "warning")
+        backups = catalog.backups_for(target_world_name)
         
         if not backups:
             QMessageBox.information(self, "提示", f"没有找到 '{target_world_name}' 的可用备份.")
             return
 
-        backups.sort(reverse=True) 
-        backup_to_restore, ok = QInputDialog.getItem(self, "选择要恢复的备份", f"恢复到世界 '{target_world_name}':", backups, 0, False)
+        labels = []
+        for name, entry in backups:
+            size_mb = entry["bytes"] / (1024 * 1024)
+            created = entry["created"].replace("T", " ")
+            labels.append(f"{name}  |  {BACKUP_TYPE_NAMES.get(entry['type'], entry['type'])}  |  {created}  |  "
+                          f"{size_mb:.1f} MB  |  {entry['files']} 个文件")
+        label, ok = QInputDialog.getItem(self, "选择要恢复的备份", f"恢复到世界 '{target_world_name}':", labels, 0, False)
 
-        if ok and backup_to_restore:
-            self.restore_world(target_world_name, backup_to_restore, backup_dir)
+        if ok and label:
+            self.restore_world(target_world_name, backups[labels.index(label)][0], backup_dir)
 
     def restore_world(self, world_name, backup_name, backup_dir_path):
         target_world_path = os.path.join(self.server_root_path, "worlds", world_name)
         source_backup_path = os.path.join(backup_dir_path, backup_name)
 
+        if self.restore_thread is not None:
+            QMessageBox.information(self, "提示", "正在恢复世界, 请稍后再试.")
+            return
+
         if not os.path.exists(source_backup_path):
             QMessageBox.critical(self, "错误", f"备份源不存在: {source_backup_path}")
             return
 
-        reply = QMessageBox.warning(self, "确认恢复",
-                                   f"确定要用备份 '{backup_name}' 覆盖世界 '{world_name}' 吗?\n当前世界 '{world_name}' 的内容将被删除!",
-                                   QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-                                   QMessageBox.StandardButton.No)
-        if reply == QMessageBox.StandardButton.No:
+        if self.server_instance is not None and self.server_instance.is_running() and \
+           world_name == read_server_properties(self.server_root_path).get("level-name"):
+            QMessageBox.warning(self, "警告", f"服务器正在使用世界 '{world_name}', 请先停止服务器再恢复.")
             return
 
-        try:
-            if os.path.exists(target_world_path):
-                shutil.rmtree(target_world_path)
-            
-            if os.path.isdir(source_backup_path): 
-                shutil.copytree(source_backup_path, target_world_path)
-                self.update_status(f"已从文件夹备份恢复世界: {world_name}", "success")
-            elif backup_name.endswith(".zip"): 
-                os.makedirs(target_world_path, exist_ok=True)
-                with zipfile.ZipFile(source_backup_path, 'r') as zip_ref:
-                    zip_ref.extractall(target_world_path)
-                self.update_status(f"已从ZIP备份恢复世界: {world_name}", "success")
-            else:
-                QMessageBox.critical(self, "错误", f"未知的备份格式: {backup_name}")
-                return
+        confirm_box = QMessageBox(QMessageBox.Icon.Warning, "确认恢复",
+                                  f"确定要用备份 '{backup_name}' 覆盖世界 '{world_name}' 吗?\n"
+                                  f"备份会先恢复到临时目录并校验, 成功后才替换当前世界.", parent=self)
+        keep_btn = confirm_box.addButton("恢复并保留旧世界", QMessageBox.ButtonRole.AcceptRole)
+        discard_btn = confirm_box.addButton("恢复并删除旧世界", QMessageBox.ButtonRole.DestructiveRole)
+        confirm_box.addButton(QMessageBox.StandardButton.Cancel)
+        confirm_box.setDefaultButton(QMessageBox.StandardButton.Cancel)
+        confirm_box.exec()
+        if confirm_box.clickedButton() not in (keep_btn, discard_btn):
+            return
 
-            self.refresh_worlds_list()
-            if self.loaded_world_name == world_name: 
-                self.load_selected_world() 
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"恢复世界失败: {str(e)}")
+        self.start_world_restore(world_name, backup_name, source_backup_path, target_world_path,
+                                 keep_old=confirm_box.clickedButton() is keep_btn)
+
+    def start_world_restore(self, world_name, backup_name, source_backup_path, target_world_path, keep_old):
+        """在后台线程中恢复世界; 期间禁用世界管理页, 进度窗口中可以取消"""
+        self.restore_worker = RestoreWorker(world_name, backup_name, source_backup_path, target_world_path, keep_old)
+        self.restore_thread = QThread()
+        self.restore_worker.moveToThread(self.restore_thread)
+        self.restore_thread.started.connect(self.restore_worker.run)
+        self.restore_worker.restore_progress.connect(self.on_restore_progress)
+        self.restore_worker.restore_finished.connect(self.on_restore_finished)
+        self.restore_worker.restore_failed.connect(self.on_restore_failed)
+
+        self.restore_progress_dialog = QProgressDialog(f"正在从备份 '{backup_name}' 恢复世界 '{world_name}'...", "取消", 0, 100, self)
+        self.restore_progress_dialog.setWindowTitle("恢复世界")
+        self.restore_progress_dialog.setAutoClose(False)
+        self.restore_progress_dialog.setAutoReset(False)
+        self.restore_progress_dialog.setMinimumDuration(0)
+        self.restore_progress_dialog.canceled.connect(self.cancel_world_restore)
+
+        self.world_management_group.setEnabled(False) # Backups, restores and world edits all touch the world being replaced
+        self.update_status(f"正在恢复世界: {world_name}...", "info")
+        self.restore_progress_dialog.show()
+        self.restore_thread.start()
+
+    def stop_restore_thread(self):
+        worker = self.restore_worker
+        self.restore_thread.quit()
+        self.restore_thread.wait()
+        self.restore_thread = None
+        self.restore_worker = None
+        self.restore_progress_dialog.close()
+        self.restore_progress_dialog = None
+        self.world_management_group.setEnabled(True)
+        return worker
+
+    def on_restore_progress(self, done, total):
+        if self.restore_progress_dialog is None:
+            return
+        percent = int(done * 100 / total) if total else 100
+        self.restore_progress_dialog.setValue(percent)
+        self.update_status(f"正在恢复世界 {self.restore_worker.world_name}... {percent}%", "info")
+
+    def cancel_world_restore(self):
+        """请求取消恢复; 已开始替换目标世界时恢复仍会完成"""
+        if self.restore_worker is None:
+            return
+        self.restore_worker.cancel()
+        self.restore_progress_dialog.setLabelText("正在取消恢复...")
+        self.update_status("正在取消恢复...", "info")
+
+    def on_restore_failed(self, message, cancelled):
+        if self.restore_thread is None:
+            return
+        worker = self.stop_restore_thread()
+        if cancelled:
+            self.update_status(f"已取消恢复世界 '{worker.world_name}', 当前世界未被修改.", "warning")
+            return
+        self.update_status(f"恢复世界失败: {message}", "error")
+        QMessageBox.critical(self, "错误", f"恢复世界失败: {message}\n当前世界未被修改.")
+
+    def on_restore_finished(self, stats, kept_path):
+        if self.restore_thread is None:
+            return
+        worker = self.stop_restore_thread()
+        world_name = worker.world_name
+        size_mb = stats["bytes"] / (1024 * 1024)
+        msg = f"已从备份 '{worker.backup_name}' 恢复世界: {world_name} ({stats['files']} 个文件, {size_mb:.1f} MB)"
+        if kept_path:
+            msg += f", 旧世界已保留为 '{os.path.basename(kept_path)}'"
+        self.update_status(msg, "success")
+        self.refresh_worlds_list()
+        if self.loaded_world_name == world_name: 
+            self.load_selected_world() 
 
 
     def enable_server_specific_controls(self):
@@ -760,8 +2259,8 @@ class PackManagerApp(QMainWindow):
         self.import_target_server_radio.setEnabled(is_root_loaded)
         self.refresh_server_packs_btn.setEnabled(is_root_loaded)
         self.restore_world_btn.setEnabled(is_root_loaded and os.path.exists(os.path.join(self.server_root_path, "worlds")))
+        self.verify_backups_btn.setEnabled(is_root_loaded and self.verify_thread is None)
 
-        self.edit_server_properties_btn.setEnabled(is_root_loaded)
         self.update_server_controls_state()
 
         self.quick_access_worlds_btn.setEnabled(is_root_loaded)
@@ -773,8 +2272,8 @@ class PackManagerApp(QMainWindow):
         self.import_target_server_radio.setEnabled(False)
         self.refresh_server_packs_btn.setEnabled(False)
         self.restore_world_btn.setEnabled(False)
+        self.verify_backups_btn.setEnabled(False)
         
-        self.edit_server_properties_btn.setEnabled(False)
         self.update_server_controls_state() 
 
         self.quick_access_worlds_btn.setEnabled(False)
@@ -827,10 +2326,206 @@ class PackManagerApp(QMainWindow):
             getattr(self, f"world_{pack_type}_import_btn").setEnabled(False)
 
 
+    def reset_server_watcher(self):
+        self.fs_watch_timer.stop()
+        self.fs_pending_paths.clear()
+        watched = self.fs_watcher.directories() + self.fs_watcher.files()
+        if watched:
+            self.fs_watcher.removePaths(watched)
+        if self.server_root_path:
+            self.fs_watcher.addPath(self.server_root_path) # Notices watched folders being created later
+            self.update_server_watch_paths()
+            self.known_world_backups = self.list_world_backup_names()
+
+    def update_server_watch_paths(self):
+        """监视已存在的包/世界/备份文件夹, 返回新加入监视的文件夹名"""
+        watched = set(self.fs_watcher.directories())
+        added = []
+        for folder_name in WATCHED_SERVER_FOLDERS:
+            folder_path = os.path.join(self.server_root_path, folder_name)
+            if folder_path not in watched and os.path.isdir(folder_path):
+                self.fs_watcher.addPath(folder_path)
+                added.append(folder_name)
+        return added
+
+    def on_watched_path_changed(self, path):
+        self.fs_pending_paths.add(path)
+        self.fs_watch_timer.start() # Restart: apply once the burst of events has settled
+
+    def apply_pending_fs_changes(self):
+        if not self.server_root_path:
+            self.fs_pending_paths.clear()
+            return
+        if self.pack_scan_thread is not None or self.import_thread is not None:
+            self.fs_watch_timer.start() # A full scan or import is running; apply the changes after it
+            return
+
+        changed_folders = set()
+        changed_packs = {"behavior": set(), "resource": set()} # Packs with a changed manifest.json/lang file or folder
+        for path in self.fs_pending_paths:
+            if os.path.normpath(path) == os.path.normpath(self.server_root_path):
+                changed_folders.update(self.update_server_watch_paths())
+                continue
+            rel_parts = os.path.relpath(path, self.server_root_path).split(os.sep)
+            if rel_parts[0] in ("behavior_packs", "resource_packs") and len(rel_parts) > 1:
+                changed_packs[rel_parts[0][:-len("_packs")]].add(rel_parts[1])
+            elif rel_parts[0] in WATCHED_SERVER_FOLDERS:
+                changed_folders.add(rel_parts[0])
+        self.fs_pending_paths.clear()
+
+        pack_changes = []
+        for pack_type in ("behavior", "resource"):
+            relist = f"{pack_type}_packs" in changed_folders
+            if relist or changed_packs[pack_type]:
+                pack_changes.append(self.sync_server_pack_dir(pack_type, changed_packs[pack_type], relist))
+        if "worlds" in changed_folders:
+            self.sync_worlds_list()
+        if "world_backups" in changed_folders:
+            self.on_world_backups_changed()
+
+        added = sum(a for a, _ in pack_changes)
+        removed = sum(r for _, r in pack_changes)
+        if added or removed:
+            self.update_status(f"检测到服务器包变化: 新增/更新 {added} 个, 移除 {removed} 个", "info")
+
+    def sync_server_pack_dir(self, pack_type, changed_packs=(), relist=True):
+        """增量更新一个服务器包列表.
+
+        relist 为 True 时 (包目录本身有变化) 按目录差异增删包; changed_packs 是内部文件有变化的包文件夹名,
+        只重新 stat 这些包, manifest.json 或包名所用的 en_US.lang 签名变化 (或 manifest.json 刚出现) 时才重新解析.
+        """
+        tree = self.server_bp_tree if pack_type == "behavior" else self.server_rp_tree
+        pack_dir_path = os.path.join(self.server_root_path, f"{pack_type}_packs")
+        items = self.server_pack_items[pack_type]
+
+        if relist:
+            current_names = set()
+            if os.path.isdir(pack_dir_path):
+                with os.scandir(pack_dir_path) as it:
+                    current_names = {entry.name for entry in it if entry.is_dir()}
+            removed_names = set(items) - current_names
+        else:
+            current_names = set()
+            removed_names = {name for name in changed_packs
+                             if name in items and not os.path.isdir(os.path.join(pack_dir_path, name))}
+
+        refreshed_names = set()
+        for folder_name in set(changed_packs) & set(items) - removed_names:
+            pack_path = os.path.join(pack_dir_path, folder_name)
+            _, entry = self.pack_index.cached(f"{pack_type}_packs/{folder_name}", pack_path)
+            if entry is None:
+                refreshed_names.add(folder_name)
+            else:
+                self.watch_server_pack_files(pack_type, folder_name, entry) # Replacing a file drops its watch
+
+        for folder_name in removed_names | refreshed_names:
+            item = items.pop(folder_name)
+            tree.takeTopLevelItem(tree.indexOfTopLevelItem(item))
+            details = self.server_pack_uuid_to_manifest_details.get(item.text(2))
+            if details and details["type"] == pack_type and details["folder_name"] == folder_name:
+                del self.server_pack_uuid_to_manifest_details[item.text(2)]
+            self.unwatch_server_pack_files(pack_type, folder_name)
+            if folder_name in removed_names:
+                self.pack_index.forget(pack_type, folder_name)
+
+        new_items = []
+        for folder_name in (current_names | refreshed_names) - set(items):
+            pack_path = os.path.join(pack_dir_path, folder_name)
+            try:
+                folder_mtime = os.path.getmtime(pack_path)
+            except OSError:
+                continue # Removed again before we got to it
+            details = self.pack_index.lookup(pack_type, folder_name, pack_path)
+            new_items.append(self.create_server_pack_item(pack_type, folder_name, folder_mtime, details))
+        self.pack_index.save()
+
+        if new_items:
+            tree.addTopLevelItems(new_items)
+            search_text = self.server_pack_search.text().lower()
+            for item in new_items:
+                item.setHidden(not self.server_pack_item_matches(item, search_text))
+            self.sort_server_packs()
+        if new_items or removed_names:
+            self.on_server_pack_select()
+            if self.loaded_world_name:
+                self.refresh_world_packs_tree(pack_type)
+
+        return len(new_items), len(removed_names)
+
+    def watch_server_pack_files(self, pack_type, pack_folder_name, details):
+        """监视包的 manifest.json 和包名所用的 en_US.lang, 使原地修改也能增量刷新; 还没有 manifest.json 时监视包文件夹"""
+        pack_path = os.path.join(self.server_root_path, f"{pack_type}_packs", pack_folder_name)
+        if details.get("manifest_sig") is None:
+            # No manifest yet (e.g. the folder is still being copied): watch it until one appears
+            self.fs_watcher.addPath(pack_path)
+            return
+        self.fs_watcher.addPath(os.path.join(pack_path, "manifest.json"))
+        if "lang_sig" in details:
+            if details["lang_sig"] is not None:
+                self.fs_watcher.addPath(os.path.join(pack_path, "texts", "en_US.lang"))
+            else: # The name is a lang key but there is no en_US.lang yet
+                self.fs_watcher.addPaths([pack_path, os.path.join(pack_path, "texts")])
+
+    def unwatch_server_pack_files(self, pack_type, pack_folder_name):
+        pack_path = os.path.join(self.server_root_path, f"{pack_type}_packs", pack_folder_name)
+        self.fs_watcher.removePaths([pack_path, os.path.join(pack_path, "texts"), os.path.join(pack_path, "manifest.json"),
+                                     os.path.join(pack_path, "texts", "en_US.lang")])
+
+    def sync_worlds_list(self):
+        """按目录差异增量更新世界列表, 保留当前选择"""
+        worlds_dir = os.path.join(self.server_root_path, "worlds")
+        existing = {}
+        for i in range(self.worlds_list.topLevelItemCount()):
+            item = self.worlds_list.topLevelItem(i)
+            existing[item.text(0)] = item
+
+        current = set()
+        watched = set(self.fs_watcher.directories())
+        if os.path.isdir(worlds_dir):
+            for world_name in os.listdir(worlds_dir):
+                world_path = os.path.join(worlds_dir, world_name)
+                if not os.path.isdir(world_path) or world_name.startswith("."):
+                    continue
+                if not is_world_dir(world_path):
+                    # Possibly still being copied: watch it until levelname.txt/level.dat shows up
+                    if world_path not in watched:
+                        self.fs_watcher.addPath(world_path)
+                    continue
+                if world_path in watched:
+                    self.fs_watcher.removePath(world_path)
+                current.add(world_name)
+                if world_name not in existing:
+                    self.worlds_list.addTopLevelItem(self.create_world_item(world_name, world_path))
+        self.restore_world_btn.setEnabled(os.path.isdir(worlds_dir))
+
+        for world_name in set(existing) - current:
+            item = existing[world_name]
+            self.worlds_list.takeTopLevelItem(self.worlds_list.indexOfTopLevelItem(item))
+            if world_name == self.loaded_world_name:
+                self.reset_world_specific_ui()
+                self.disable_all_world_specific_controls()
+                self.update_status(f"已加载的世界 '{world_name}' 已被移除", "warning")
+        self.on_world_select()
+
+    def list_world_backup_names(self):
+        backup_dir = os.path.join(self.server_root_path, "world_backups")
+        if not os.path.isdir(backup_dir):
+            return set()
+        return {name for name in os.listdir(backup_dir) if not name.startswith(".")} # Skip .snapshot_store
+
+    def on_world_backups_changed(self):
+        current = self.list_world_backup_names()
+        external = current - self.known_world_backups # Backups not created through this manager
+        self.known_world_backups = current
+        if external:
+            self.update_status(f"检测到新的世界备份: {', '.join(sorted(external))}", "info")
+
     def refresh_server_packs_list(self):
+        self.cancel_server_pack_scan()
         self.server_bp_tree.clear()
         self.server_rp_tree.clear()
         self.server_pack_uuid_to_manifest_details.clear() # Clear the map before repopulating
+        self.server_pack_items = {"behavior": {}, "resource": {}}
         self.on_server_pack_select()
 
         if not self.server_root_path:
@@ -840,78 +2535,97 @@ class PackManagerApp(QMainWindow):
             "behavior": os.path.join(self.server_root_path, "behavior_packs"),
             "resource": os.path.join(self.server_root_path, "resource_packs")
         }
-        trees = {"behavior": self.server_bp_tree, "resource": self.server_rp_tree}
-
-        for pack_type, pack_dir_path in pack_dirs.items():
-            tree = trees[pack_type]
-            if os.path.exists(pack_dir_path):
-                for pack_folder_name in os.listdir(pack_dir_path): # pack_folder_name is the directory name
-                    pack_path = os.path.join(pack_dir_path, pack_folder_name)
-                    if os.path.isdir(pack_path):
-                        manifest_path = os.path.join(pack_path, "manifest.json")
-                        mod_time_str = ""
-                        manifest_name_str = "N/A"
-                        uuid_str = "N/A"
-                        version_str_display = "N/A"
-                        version_list = [0,0,0]
-
-                        if os.path.exists(manifest_path):
-                            try:
-                                with open(manifest_path, 'r', encoding='utf-8') as f:
-                                    manifest = json.load(f)
-                                header = manifest.get("header", {})
-                                manifest_name_str = header.get("name", "N/A")
-                                # Attempt to decode if it's a pack name string like "pack.name"
-                                if manifest_name_str.startswith("pack.") or manifest_name_str.startswith("resourcePack.") or manifest_name_str.startswith("behaviorPack.") :
-                                    # Look for texts/en_US.lang (or other lang)
-                                    lang_path_us = os.path.join(pack_path, "texts", "en_US.lang")
-                                    # lang_path_cn = os.path.join(pack_path, "texts", "zh_CN.lang") # Example for Chinese
-                                    # selected_lang_path = lang_path_cn if os.path.exists(lang_path_cn) else lang_path_us
-                                    selected_lang_path = lang_path_us # Default to en_US for simplicity
-
-                                    if os.path.exists(selected_lang_path):
-                                        try:
-                                            with open(selected_lang_path, 'r', encoding='utf-8') as lang_f:
-                                                for line in lang_f:
-                                                    if '=' in line:
-                                                        key, value = line.split('=', 1)
-                                                        if key.strip() == manifest_name_str:
-                                                            manifest_name_str = value.strip()
-                                                            break
-                                        except Exception:
-                                            pass # Keep original manifest_name_str if lang file parsing fails
-
-                                uuid_str = header.get("uuid", "N/A")
-                                version_list = header.get("version", [0,0,0])
-                                if isinstance(version_list, list) and len(version_list) > 0:
-                                     version_str_display = '.'.join(map(str, version_list))
-                                else:
-                                     version_list = [0,0,0] # ensure it's a list for storing
-                                     version_str_display = "0.0.0"
-
-                                mod_time = os.path.getmtime(manifest_path)
-                                mod_time_str = datetime.fromtimestamp(mod_time).strftime("%Y-%m-%d %H:%M")
-
-                                if uuid_str != "N/A":
-                                    self.server_pack_uuid_to_manifest_details[uuid_str] = {
-                                        "name": manifest_name_str,
-                                        "version_list": version_list,
-                                        "type": pack_type,
-                                        "folder_name": pack_folder_name
-                                    }
-                            except Exception as e:
-                                self.update_status(f"读取 {pack_folder_name} manifest.json 失败: {e}", "warning")
-                        
-                        # Columns: Folder Name, Manifest Name, UUID, Version, Mod Date
-                        item = QTreeWidgetItem([pack_folder_name, manifest_name_str, uuid_str, version_str_display, mod_time_str])
-                        item.setData(0, Qt.ItemDataRole.UserRole, os.path.getmtime(pack_path)) 
-                        if mod_time_str: 
-                             item.setData(4, Qt.ItemDataRole.UserRole, mod_time) # For sorting by manifest mod time (col 4)
-                        tree.addTopLevelItem(item)
-            
+        if self.pack_index is None or self.pack_index.server_root != self.server_root_path:
+            self.pack_index = PackIndex(self.server_root_path)
+
+        # Scanning runs in a worker thread; rows stream in through on_server_pack_scan_batch
+        self.pack_scan_generation += 1
+        self.pack_scan_count = 0
+        self.pack_scan_failures = 0
+        self.pack_scan_worker = PackScanWorker(self.pack_scan_generation, self.pack_index, pack_dirs)
+        self.pack_scan_thread = QThread()
+        self.pack_scan_worker.moveToThread(self.pack_scan_thread)
+        self.pack_scan_thread.started.connect(self.pack_scan_worker.run)
+        self.pack_scan_worker.batch_ready.connect(self.on_server_pack_scan_batch)
+        self.pack_scan_worker.scan_finished.connect(self.on_server_pack_scan_finished)
+        self.cancel_server_pack_scan_btn.setEnabled(True)
+        self.update_status("正在扫描服务器包...", "info")
+        self.pack_scan_thread.start()
+
+    def cancel_server_pack_scan(self):
+        if self.pack_scan_thread is None:
+            return
+        self.pack_scan_worker.cancel()
+        self.pack_scan_thread.quit()
+        self.pack_scan_thread.wait() # In-flight manifest parses finish quickly once cancelled
+        self.pack_scan_thread = None
+        self.pack_scan_worker = None
+        self.pack_scan_generation += 1 # Drop any batches still queued from the cancelled scan
+        self.cancel_server_pack_scan_btn.setEnabled(False)
+
+    def on_cancel_server_pack_scan_clicked(self):
+        self.cancel_server_pack_scan()
+        self.filter_server_packs()
+        self.sort_server_packs()
+        self.update_status(f"已取消服务器包扫描 (已加载 {self.pack_scan_count} 个)", "warning")
+
+    def on_server_pack_scan_batch(self, generation, rows):
+        if generation != self.pack_scan_generation:
+            return
+        with span("populate_pack_tree", "ui", rows=len(rows)):
+            trees = {"behavior": self.server_bp_tree, "resource": self.server_rp_tree}
+            new_items = {"behavior": [], "resource": []}
+            for pack_type, pack_folder_name, folder_mtime, details in rows:
+                if details["error"]:
+                    self.pack_scan_failures += 1
+                new_items[pack_type].append(self.create_server_pack_item(pack_type, pack_folder_name, folder_mtime, details))
+
+            search_text = self.server_pack_search.text().lower()
+            for pack_type, items in new_items.items():
+                if items:
+                    trees[pack_type].addTopLevelItems(items)
+                    if search_text:
+                        for item in items:
+                            item.setHidden(not self.server_pack_item_matches(item, search_text))
+        self.pack_scan_count += len(rows)
+        self.update_status(f"正在扫描服务器包... 已加载 {self.pack_scan_count} 个", "info")
+
+    def create_server_pack_item(self, pack_type, pack_folder_name, folder_mtime, details):
+        """为一个服务器包创建列表行, 并同步更新 UUID 映射和文件监视"""
+        if not details["error"] and details["uuid"] != "N/A":
+            self.server_pack_uuid_to_manifest_details[details["uuid"]] = {
+                "name": details["name"],
+                "version_list": details["version_list"],
+                "type": pack_type,
+                "folder_name": pack_folder_name
+            }
+        self.watch_server_pack_files(pack_type, pack_folder_name, details)
+
+        mod_time = details["manifest_mtime"]
+        mod_time_str = datetime.fromtimestamp(mod_time).strftime("%Y-%m-%d %H:%M") if mod_time else ""
+        # Columns: Folder Name, Manifest Name, UUID, Version, Mod Date
+        item = QTreeWidgetItem([pack_folder_name, details["name"], details["uuid"], details["version_display"], mod_time_str])
+        item.setData(0, Qt.ItemDataRole.UserRole, folder_mtime) 
+        if mod_time_str: 
+             item.setData(4, Qt.ItemDataRole.UserRole, mod_time) # For sorting by manifest mod time (col 4)
+        self.server_pack_items[pack_type][pack_folder_name] = item
+        return item
+
+    def on_server_pack_scan_finished(self, generation, cancelled):
+        if generation != self.pack_scan_generation:
+            return
+        self.pack_scan_thread.quit()
+        self.pack_scan_thread.wait()
+        self.pack_scan_thread = None
+        self.pack_scan_worker = None
+        self.cancel_server_pack_scan_btn.setEnabled(False)
+
         self.filter_server_packs() 
         self.sort_server_packs() 
-        self.update_status("已刷新服务器包列表", "info")
+        if self.pack_scan_failures:
+            self.update_status(f"已刷新服务器包列表, {self.pack_scan_failures} 个包的 manifest.json 读取失败", "warning")
+        else:
+            self.update_status("已刷新服务器包列表", "info")
         # After refreshing server packs, also refresh world packs if a world is loaded,
         # as the names might have updated.
         if self.loaded_world_name:
@@ -991,145 +2705,84 @@ class PackManagerApp(QMainWindow):
         )
         
         if file_paths:
-            imported_count = 0
-            failed_count = 0
-            for file_path in file_paths:
-                if self.import_pack(file_path):
-                    imported_count +=1
-                else:
-                    failed_count +=1
-            
-            summary_message = f"导入完成: {imported_count} 个成功"
-            if failed_count > 0:
-                summary_message += f", {failed_count} 个失败."
-            else:
-                summary_message += "."
-            self.update_status(summary_message, "info" if failed_count == 0 else "warning")
-            self.refresh_server_packs_list() # This will update UUID map and refresh world trees if loaded
+            self.start_batch_import(file_paths)
 
+    def start_batch_import(self, file_paths):
+        """在后台线程池中导入文件, 结果显示在批量导入窗口中; 全部结束后只刷新一次包列表"""
+        if self.import_thread is not None:
+            QMessageBox.information(self, "提示", "已有导入任务正在进行.")
+            return
+        copy_to_world = self.import_target_world_radio.isChecked() and self.loaded_world_name and self.import_to_world_subdirs_check.isChecked()
+
+        self.import_dialog = BatchImportDialog(self, file_paths)
+        self.import_worker = BatchImportWorker(file_paths, self.server_root_path,
+                                               self.loaded_world_path if copy_to_world else None)
+        self.import_thread = QThread()
+        self.import_worker.moveToThread(self.import_thread)
+        self.import_thread.started.connect(self.import_worker.run)
+        self.import_worker.file_started.connect(self.import_dialog.on_file_started)
+        self.import_worker.file_progress.connect(self.import_dialog.on_file_progress)
+        self.import_worker.file_finished.connect(self.import_dialog.on_file_finished)
+        self.import_worker.batch_finished.connect(self.import_dialog.on_batch_finished)
+        self.import_worker.batch_finished.connect(self.on_batch_import_finished)
+        self.import_dialog.cancel_requested.connect(self.import_worker.cancel, Qt.ConnectionType.DirectConnection)
+
+        self.import_pack_btn.setEnabled(False)
+        self.update_status(f"正在导入 {len(file_paths)} 个文件...", "info")
+        self.import_dialog.show()
+        self.import_thread.start()
+
+    def on_batch_import_finished(self, cancelled):
+        self.import_thread.quit()
+        self.import_thread.wait()
+        self.import_thread = None
+        self.import_worker = None
+        self.import_pack_btn.setEnabled(bool(self.server_root_path))
+
+        failed_count = self.import_dialog.state_counts["failed"]
+        self.update_status(self.import_dialog.summary_text(), "info" if failed_count == 0 and not cancelled else "warning")
+        self.refresh_server_packs_list() # This will update UUID map and refresh world trees if loaded
+
+    def cancel_batch_import(self):
+        if self.import_thread is None:
+            return
+        self.import_worker.cancel()
+        self.import_thread.quit()
+        self.import_thread.wait()
+        self.import_thread = None
+        self.import_worker = None
 
     def import_pack(self, file_path):
+        """在当前线程中导入单个包文件 (import_pack_archive 的简单封装), 出错时弹窗提示; 返回是否导入了包.
+
+        界面上的导入走 start_batch_import; 此方法保留给脚本和旧代码使用.
+        """
         if not os.path.exists(file_path):
             QMessageBox.critical(self, "错误", f"文件不存在: {file_path}")
             return False
 
-        file_extension = os.path.splitext(file_path)[1].lower()
-        is_mcaddon = file_extension == ".mcaddon"
-        
-        temp_dir_outer = tempfile.mkdtemp()
-        successful_extraction_overall = False
+        copy_to_world = self.import_target_world_radio.isChecked() and self.loaded_world_name and self.import_to_world_subdirs_check.isChecked()
         try:
-            with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir_outer)
-            
-            packs_to_process_paths = [] # Store paths to actual pack content directories
-            temp_dirs_to_clean = [] # Store paths of temporary directories created for inner mcpacks
-
-            if is_mcaddon:
-                for item_name in os.listdir(temp_dir_outer):
-                    item_path = os.path.join(temp_dir_outer, item_name)
-                    if item_name.lower().endswith(".mcpack") and os.path.isfile(item_path):
-                        temp_dir_inner_mcpack = tempfile.mkdtemp()
-                        temp_dirs_to_clean.append(temp_dir_inner_mcpack)
-                        with zipfile.ZipFile(item_path, 'r') as inner_zip_ref:
-                            inner_zip_ref.extractall(temp_dir_inner_mcpack)
-                        # The content of inner_mcpack might be directly the pack, or a folder containing the pack
-                        # Check if manifest.json is in temp_dir_inner_mcpack directly
-                        if os.path.exists(os.path.join(temp_dir_inner_mcpack, "manifest.json")):
-                            packs_to_process_paths.append(temp_dir_inner_mcpack)
-                        else: # manifest might be in a subfolder
-                            for sub_item_name in os.listdir(temp_dir_inner_mcpack):
-                                sub_item_path = os.path.join(temp_dir_inner_mcpack, sub_item_name)
-                                if os.path.isdir(sub_item_path) and os.path.exists(os.path.join(sub_item_path, "manifest.json")):
-                                    packs_to_process_paths.append(sub_item_path)
-                                    break # Assuming one pack per mcpack file
-
-                    elif os.path.isdir(item_path): 
-                        if os.path.exists(os.path.join(item_path, "manifest.json")):
-                             packs_to_process_paths.append(item_path) 
-            else: # It's an mcpack
-                # Check if manifest.json is in temp_dir_outer directly
-                if os.path.exists(os.path.join(temp_dir_outer, "manifest.json")):
-                     packs_to_process_paths.append(temp_dir_outer)
-                else: # manifest might be in a subfolder
-                    for sub_item_name in os.listdir(temp_dir_outer):
-                        sub_item_path = os.path.join(temp_dir_outer, sub_item_name)
-                        if os.path.isdir(sub_item_path) and os.path.exists(os.path.join(sub_item_path, "manifest.json")):
-                            packs_to_process_paths.append(sub_item_path)
-                            break # Assuming one pack per mcpack file
-
-
-            if not packs_to_process_paths:
-                QMessageBox.warning(self, "警告", f"文件 '{os.path.basename(file_path)}' 中未找到有效的包内容.")
-                return False
-
-            for extracted_pack_content_path in packs_to_process_paths:
-                manifest_path = os.path.join(extracted_pack_content_path, "manifest.json")
-                # Already checked existence, but double check doesn't hurt if logic changes
-                if not os.path.exists(manifest_path):
-                    self.update_status(f"跳过无效包 (无 manifest.json): {os.path.basename(extracted_pack_content_path)}", "warning")
-                    continue
-
-                with open(manifest_path, 'r', encoding='utf-8') as f:
-                    manifest = json.load(f)
-                
-                module_type = "unknown"
-                if "modules" in manifest and manifest["modules"]:
-                    module_type_from_manifest = manifest["modules"][0].get("type", "unknown").lower()
-                    if module_type_from_manifest == "data": 
-                        module_type = "behavior"
-                    elif module_type_from_manifest == "resources": 
-                        module_type = "resource"
-                    elif module_type_from_manifest == "script": # Script packs are often behavior packs
-                        module_type = "behavior" 
-
-
-                if module_type == "unknown":
-                    pack_folder_basename = os.path.basename(extracted_pack_content_path).lower()
-                    if "behavior" in pack_folder_basename or "bp" in pack_folder_basename:
-                        module_type = "behavior"
-                    elif "resource" in pack_folder_basename or "rp" in pack_folder_basename:
-                        module_type = "resource"
-                    else:
-                        QMessageBox.warning(self, "导入错误", f"无法确定包类型 (行为包/资源包) 从 manifest.json: {os.path.basename(extracted_pack_content_path)}")
-                        continue 
-
-                # Use the name of the folder containing manifest.json as the pack_folder_name for destination
-                pack_folder_name_for_dest = os.path.basename(extracted_pack_content_path)
-
-                target_base_dir_server = os.path.join(self.server_root_path, f"{module_type}_packs")
-                final_pack_dir_server = os.path.join(target_base_dir_server, pack_folder_name_for_dest)
-
-                os.makedirs(target_base_dir_server, exist_ok=True)
-                if os.path.exists(final_pack_dir_server):
-                    shutil.rmtree(final_pack_dir_server)
-                shutil.copytree(extracted_pack_content_path, final_pack_dir_server) # Copy the content path
-                self.update_status(f"包 '{pack_folder_name_for_dest}' 已导入到服务器.", "info")
-                successful_extraction_overall = True
-
-
-                if self.import_target_world_radio.isChecked() and self.loaded_world_name and self.import_to_world_subdirs_check.isChecked():
-                    target_base_dir_world = os.path.join(self.loaded_world_path, f"{module_type}_packs") # e.g. worlds/MyWorld/behavior_packs
-                    final_pack_dir_world = os.path.join(target_base_dir_world, pack_folder_name_for_dest)
-                    os.makedirs(target_base_dir_world, exist_ok=True)
-                    if os.path.exists(final_pack_dir_world):
-                        shutil.rmtree(final_pack_dir_world)
-                    shutil.copytree(extracted_pack_content_path, final_pack_dir_world)
-                    self.update_status(f"包 '{pack_folder_name_for_dest}' 也已复制到世界 '{self.loaded_world_name}'.", "info")
-            
+            imported, skipped = import_pack_archive(file_path, self.server_root_path,
+                                                    self.loaded_world_path if copy_to_world else None)
         except zipfile.BadZipFile:
             QMessageBox.critical(self, "错误", f"导入包失败: '{os.path.basename(file_path)}' 不是有效的ZIP/包文件.")
             return False
         except Exception as e:
             QMessageBox.critical(self, "错误", f"导入包 '{os.path.basename(file_path)}' 失败: {str(e)}")
             return False
-        finally:
-            shutil.rmtree(temp_dir_outer, ignore_errors=True) 
-            if 'temp_dirs_to_clean' in locals():
-                for temp_dir in temp_dirs_to_clean:
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-        
-        return successful_extraction_overall
+
+        for message in skipped:
+            QMessageBox.warning(self, "导入错误", message)
+        if not imported and not skipped:
+            QMessageBox.warning(self, "警告", f"文件 '{os.path.basename(file_path)}' 中未找到有效的包内容.")
+            return False
+
+        for module_type, pack_folder_name in imported:
+            self.update_status(f"包 '{pack_folder_name}' 已导入到服务器.", "info")
+            if copy_to_world:
+                self.update_status(f"包 '{pack_folder_name}' 也已复制到世界 '{self.loaded_world_name}'.", "info")
+        return bool(imported)
 
 
     def update_import_options_state(self):
@@ -1306,50 +2959,54 @@ class PackManagerApp(QMainWindow):
             QMessageBox.critical(self, "错误", f"保存世界 {pack_type} 包JSON失败: {str(e)}")
 
 
+    def server_pack_item_matches(self, item, search_text):
+        # Search in FolderName (0), ManifestName (1), UUID (2), Version (3)
+        return any(search_text in item.text(col).lower() for col in range(4))
+
     def filter_server_packs(self):
-        search_text = self.server_pack_search.text().lower()
-        for tree in [self.server_bp_tree, self.server_rp_tree]:
-            for i in range(tree.topLevelItemCount()):
-                item = tree.topLevelItem(i)
-                # Search in FolderName (0), ManifestName (1), UUID (2), Version (3)
-                match = any(search_text in item.text(col).lower() for col in range(4))
-                item.setHidden(not match)
+        with span("filter_server_packs", "ui", query=self.server_pack_search.text()):
+            search_text = self.server_pack_search.text().lower()
+            for tree in [self.server_bp_tree, self.server_rp_tree]:
+                for i in range(tree.topLevelItemCount()):
+                    item = tree.topLevelItem(i)
+                    item.setHidden(not self.server_pack_item_matches(item, search_text))
 
     def sort_server_packs(self):
         sort_option = self.server_pack_sort.currentText()
         
-        for tree in [self.server_bp_tree, self.server_rp_tree]:
-            sort_column = 0 
-            # Columns: 0:Folder, 1:ManifestName, 2:UUID, 3:Version, 4:ModDate
-            if sort_option == "按名称 (Manifest)":
-                sort_column = 1 
-            elif sort_option == "按文件夹名":
-                sort_column = 0
-            elif sort_option == "按版本":
-                sort_column = 3
-                def version_key(item_text):
-                    try:
-                        return [int(p) for p in item_text.split('.')]
-                    except:
-                        return [0,0,0] 
-                key_func = lambda item: version_key(item.text(sort_column))
-            elif sort_option == "按修改时间 (manifest)":
-                sort_column = 4 # UserRole data for manifest mod time is on col 4
-                key_func = lambda item: item.data(sort_column, Qt.ItemDataRole.UserRole) or 0 
-            else: # Default or fallback (should not happen with QComboBox)
-                key_func = lambda item: item.text(sort_column).lower()
-
-            if sort_option not in ["按版本", "按修改时间 (manifest)"]: 
-                tree.sortItems(sort_column, Qt.SortOrder.AscendingOrder)
-            else: 
-                items = []
-                for i in range(tree.topLevelItemCount()):
-                    items.append(tree.takeTopLevelItem(0)) 
+        with span("sort_server_packs", "ui", sort=sort_option):
+            for tree in [self.server_bp_tree, self.server_rp_tree]:
+                sort_column = 0 
+                # Columns: 0:Folder, 1:ManifestName, 2:UUID, 3:Version, 4:ModDate
+                if sort_option == "按名称 (Manifest)":
+                    sort_column = 1 
+                elif sort_option == "按文件夹名":
+                    sort_column = 0
+                elif sort_option == "按版本":
+                    sort_column = 3
+                    def version_key(item_text):
+                        try:
+                            return [int(p) for p in item_text.split('.')]
+                        except:
+                            return [0,0,0] 
+                    key_func = lambda item: version_key(item.text(sort_column))
+                elif sort_option == "按修改时间 (manifest)":
+                    sort_column = 4 # UserRole data for manifest mod time is on col 4
+                    key_func = lambda item: item.data(sort_column, Qt.ItemDataRole.UserRole) or 0 
+                else: # Default or fallback (should not happen with QComboBox)
+                    key_func = lambda item: item.text(sort_column).lower()
+
+                if sort_option not in ["按版本", "按修改时间 (manifest)"]: 
+                    tree.sortItems(sort_column, Qt.SortOrder.AscendingOrder)
+                else: 
+                    items = []
+                    for i in range(tree.topLevelItemCount()):
+                        items.append(tree.takeTopLevelItem(0)) 
                 
-                items.sort(key=key_func)
+                    items.sort(key=key_func)
                 
-                for item in items: 
-                    tree.addTopLevelItem(item)
+                    for item in items: 
+                        tree.addTopLevelItem(item)
     
     def edit_world_settings(self):
         if not self.loaded_world_name:
@@ -1477,6 +3134,8 @@ class PackManagerApp(QMainWindow):
 
     def toggle_dark_mode(self):
         if self.dark_mode_btn.isChecked():
+            if self.dark_palette is None:
+                self.build_dark_palette()
             QApplication.instance().setPalette(self.dark_palette)
             self.dark_mode_btn.setText("切换浅色模式")
             current_message = self.status_bar.currentMessage()
@@ -1491,15 +3150,18 @@ class PackManagerApp(QMainWindow):
         
 
     def update_server_controls_state(self):
-        server_running = self.server_process is not None and \
-                         self.server_process.state() != QProcess.ProcessState.NotRunning
+        if not self.server_console_built:
+            return
+        server_running = self.server_instance is not None and self.server_instance.is_running()
+        stopping = server_running and self.server_instance.stop_phase is not None
         
         root_loaded = bool(self.server_root_path)
 
         self.start_server_btn.setEnabled(root_loaded and not server_running)
-        self.stop_server_btn.setEnabled(root_loaded and server_running)
-        self.server_command_input.setEnabled(root_loaded and server_running)
-        self.send_command_btn.setEnabled(root_loaded and server_running)
+        self.stop_server_btn.setEnabled(root_loaded and server_running and not stopping)
+        self.stop_server_btn.setText("正在停止..." if stopping else "停止服务器")
+        self.server_command_input.setEnabled(root_loaded and server_running and not stopping)
+        self.send_command_btn.setEnabled(root_loaded and server_running and not stopping)
         self.edit_server_properties_btn.setEnabled(root_loaded)
 
         if not root_loaded: 
@@ -1510,95 +3172,367 @@ class PackManagerApp(QMainWindow):
             self.edit_server_properties_btn.setEnabled(False)
 
 
-    def start_server(self):
-        if not self.server_root_path:
-            QMessageBox.warning(self, "错误", "请先加载服务器根目录.")
+    @property
+    def server_process(self):
+        """已加载服务器根目录对应实例的 QProcess (未运行时为 None); 为兼容旧代码保留, 新代码请使用 server_instance"""
+        return self.server_instance.process if self.server_instance is not None else None
+
+    def get_server_instance(self, root_path):
+        """返回服务器根目录对应的实例, 不存在时创建并加入实例列表"""
+        root_path = os.path.normpath(root_path)
+        instance = self.server_instances.get(root_path)
+        if instance is None:
+            instance = ServerInstance(root_path, self.server_executable_name, self)
+            instance.state_changed.connect(lambda inst=instance: self.on_instance_state_changed(inst))
+            instance.server_event.connect(lambda event, inst=instance: self.on_instance_event(inst, event))
+            instance.server_output.connect(lambda data, inst=instance: self.on_instance_output(inst, data))
+            instance.process_finished.connect(lambda code, crashed, inst=instance: self.on_instance_finished(inst, code, crashed))
+            instance.process_error.connect(lambda error, inst=instance: self.on_instance_error(inst, error))
+            self.server_instances[root_path] = instance
+            self.save_server_instance_list()
+            self.refresh_supervisor_table()
+        return instance
+
+    def bind_primary_instance(self, instance):
+        """把实例绑定到“服务器控制台”标签页"""
+        if self.server_instance is instance:
             return
+        if self.server_instance is not None and self.server_console_built:
+            self.server_instance.console_output.disconnect(self.server_log_display.append_output)
+            self.server_instance.resources_sampled.disconnect(self.update_resource_sparklines)
+        self.server_instance = instance
+        if self.server_console_built:
+            self.attach_console(instance)
+        self.update_online_players_label()
+        self.update_server_controls_state()
 
-        server_exe_path = os.path.join(self.server_root_path, self.server_executable_name)
-        if not os.path.exists(server_exe_path):
-            QMessageBox.critical(self, "错误", f"服务器可执行文件未找到: {server_exe_path}\n请确保 '{self.server_executable_name}' 在服务器根目录中.")
+    def attach_console(self, instance):
+        """把控制台标签页切换到 instance 的输出 (包括创建标签页前已有的输出)"""
+        self.server_log_display.clear_console()
+        self.server_log_display.append_output("".join(instance.recent_output))
+        instance.console_output.connect(self.server_log_display.append_output)
+        instance.resources_sampled.connect(self.update_resource_sparklines)
+        self.update_resource_sparklines()
+
+    def server_resource_samples(self):
+        """已加载服务器进程最近的资源样本 (ResourceSample 列表, 按时间顺序)"""
+        return self.server_instance.resources.samples() if self.server_instance is not None else []
+
+    def update_resource_sparklines(self, sample=None):
+        samples = self.server_resource_samples()
+        for field, sparkline in self.resource_sparklines.items():
+            sparkline.set_values([getattr(item, field) for item in samples])
+        if samples:
+            latest = samples[-1]
+            overhead = self.server_instance.resources.overhead() * 100
+            self.resource_sparklines["rss_bytes"].setToolTip(f"峰值内存: {format_bytes(latest.peak_rss_bytes)}")
+            self.resource_interval_combo.setToolTip(f"资源采样间隔 (采样开销: {overhead:.3f}% CPU)")
+
+    def change_resource_interval(self):
+        interval_ms = self.resource_interval_combo.currentData()
+        QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION).setValue("resource_sample_interval_ms", interval_ms)
+        for instance in self.server_instances.values():
+            instance.set_resource_interval(interval_ms)
+
+    def instance_label(self, instance):
+        return "" if instance is self.server_instance else f"[{instance.name}] "
+
+    def running_port_conflicts(self, instance):
+        """返回 instance 与其它正在运行的实例之间的端口冲突 [(端口, 根目录)]"""
+        running = [root for root, other in self.server_instances.items() if other is not instance and other.is_running()]
+        return find_port_conflicts([instance.root_path] + running).get(instance.root_path, [])
+
+    def start_server_instance(self, instance):
+        from bedrock_core.daemon import daemon_running # Only needed here; keeps socketserver/subprocess out of startup
+        if daemon_running(instance.root_path):
+            QMessageBox.warning(self, "提示", f"服务器 '{instance.name}' 正由命令行守护进程运行 (python -m bedrock_core), "
+                                           f"请使用命令行的 stop/send 控制它.")
             return
-        
-        if self.server_process and self.server_process.state() != QProcess.ProcessState.NotRunning:
-            QMessageBox.information(self, "提示", "服务器已在运行中.")
+        if self.restore_worker is not None and os.path.normpath(self.restore_worker.target_world_path) == \
+           os.path.normpath(os.path.join(instance.root_path, "worlds", read_server_properties(instance.root_path).get("level-name", ""))):
+            QMessageBox.warning(self, "提示", f"正在恢复世界 '{self.restore_worker.world_name}', 请等待恢复完成后再启动服务器.")
             return
+        conflicts = self.running_port_conflicts(instance)
+        if conflicts:
+            details = "\n".join(f"端口 {port}: {self.server_instances[root].name} ({root})" for port, root in conflicts)
+            QMessageBox.warning(self, "端口冲突", f"无法启动 '{instance.name}', 以下端口已被正在运行的实例使用:\n{details}\n"
+                                               f"请修改其 server.properties 中的 server-port / server-portv6.")
+            return
+        error = instance.start()
+        if error:
+            if instance.is_running():
+                QMessageBox.information(self, "提示", error)
+            else:
+                QMessageBox.critical(self, "错误", error)
 
-        self.server_process = QProcess(self)
-        self.server_process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels) 
-        self.server_process.readyReadStandardOutput.connect(self.handle_server_output)
-        self.server_process.started.connect(self.handle_server_started)
-        self.server_process.finished.connect(self.handle_server_finished) 
-        self.server_process.errorOccurred.connect(self.handle_server_error)
-        
-        self.server_process.setWorkingDirectory(self.server_root_path)
-        
-        self.server_log_display.clear()
-        self.server_log_display.append(f"正在启动服务器: {server_exe_path}...")
-        
-        if platform.system() == "Linux" and not os.access(server_exe_path, os.X_OK):
-             self.server_log_display.append(f"警告: {self.server_executable_name} 可能没有执行权限.请尝试 'chmod +x {self.server_executable_name}'.")
-
-        self.server_process.start(server_exe_path, [])
+    def start_server(self):
+        if not self.server_root_path or self.server_instance is None:
+            QMessageBox.warning(self, "错误", "请先加载服务器根目录.")
+            return
+        self.start_server_instance(self.server_instance)
 
     def stop_server(self):
-        if self.server_process and self.server_process.state() != QProcess.ProcessState.NotRunning:
-            self.server_log_display.append("正在发送 'stop' 命令到服务器...")
-            self.server_process.write("stop\n".encode('utf-8')) 
-            self.server_process.waitForBytesWritten(1000)
-
-            if not self.server_process.waitForFinished(5000): 
-                self.server_log_display.append("服务器未能优雅停止,正在强制终止...")
-                self.server_process.terminate() 
-                if not self.server_process.waitForFinished(2000): 
-                    self.server_log_display.append("服务器未能终止,正在强制杀死进程...")
-                    self.server_process.kill() 
-        else:
-            self.server_log_display.append("服务器未运行或已停止.")
-        self.update_server_controls_state()
+        """异步停止服务器 (见 ServerInstance.stop)"""
+        if self.server_instance is None:
+            return
+        self.server_instance.stop()
+        if self.server_instance.stop_phase is not None:
+            self.update_status("正在停止服务器...", "info")
 
     def send_server_command(self):
-        if self.server_process and self.server_process.state() != QProcess.ProcessState.NotRunning:
+        if self.server_instance is not None and self.server_instance.is_running():
             command = self.server_command_input.text().strip()
             if command:
-                self.server_log_display.append(f"> {command}") 
-                self.server_process.write((command + "\n").encode('utf-8'))
-                self.server_process.waitForBytesWritten(500)
+                self.server_instance.message(f"> {command}")
+                self.write_server_command(command) # QProcess flushes from the event loop; never block here
                 self.server_command_input.clear()
         else:
             QMessageBox.warning(self, "错误", "服务器未运行.")
 
-    def handle_server_output(self):
-        if not self.server_process: return
-        data = self.server_process.readAllStandardOutput().data().decode('utf-8', errors='replace')
-        
-        self.server_log_display.moveCursor(QTextCursor.MoveOperation.End)
-        self.server_log_display.insertPlainText(data)
+    def on_instance_output(self, instance, data):
+        if self.hot_backup is not None and instance is self.server_instance:
+            self.feed_hot_backup_output(data)
 
-    def handle_server_started(self):
-        self.server_log_display.append("服务器已启动.\n")
-        self.update_status("服务器运行中", "success")
-        self.update_server_controls_state()
+    def on_instance_state_changed(self, instance):
+        if instance is self.server_instance:
+            self.update_server_controls_state()
+            self.update_online_players_label()
+        self.update_supervisor_row(instance)
+        if self.close_after_server_stop and not any(other.is_running() for other in self.server_instances.values()):
+            QTimer.singleShot(0, self.close) # Let QProcess finish emitting before the window goes away
 
-    def handle_server_finished(self, exit_code, exit_status):
-        status_msg = "已停止" if exit_status == QProcess.ExitStatus.NormalExit else "意外终止"
-        self.server_log_display.append(f"\n服务器进程 {status_msg} (退出码: {exit_code}).")
-        self.update_status(f"服务器 {status_msg}", "info")
-        self.server_process = None 
-        self.update_server_controls_state()
+    def update_online_players_label(self):
+        if not self.server_console_built:
+            return
+        players = self.server_instance.online_players if self.server_instance is not None else {}
+        self.online_players_label.setText(f"在线玩家: {len(players)}")
+        self.online_players_label.setToolTip("\n".join(f"{name} (xuid: {xuid})" for name, xuid in sorted(players.items())))
+
+    def on_instance_event(self, instance, event):
+        label = self.instance_label(instance)
+        if event.kind == "player_connected":
+            self.update_status(f"{label}玩家已连接: {event.data['player']}", "info")
+        elif event.kind == "player_disconnected":
+            self.update_status(f"{label}玩家已断开: {event.data['player']}", "info")
+        elif event.kind == "server_started":
+            self.update_status(f"{label}服务器已就绪, 可以连接", "success")
+        elif event.kind in ("error", "script_error"):
+            message = event.data.get("error") or event.data.get("message")
+            prefix = "脚本错误" if event.kind == "script_error" else "服务器错误"
+            self.update_status(f"{label}{prefix}: {message}", "error")
+
+    def on_instance_finished(self, instance, exit_code, crashed):
+        if instance is self.server_instance:
+            self.abort_hot_backup("服务器已停止")
+        self.update_status(f"{self.instance_label(instance)}服务器 {'意外终止' if crashed else '已停止'}", "info")
+
+    def on_instance_error(self, instance, error_string):
+        if instance is self.server_instance and not instance.is_running():
+            self.abort_hot_backup(f"服务器进程错误: {error_string}")
+        self.update_status(f"{self.instance_label(instance)}服务器错误: {error_string}", "error")
+
+    def create_server_supervisor_section(self):
+        group = QGroupBox("服务器实例")
+        layout = QVBoxLayout(group)
+
+        self.supervisor_table = QTableWidget(0, 6)
+        self.supervisor_table.setHorizontalHeaderLabels(["名称", "状态", "端口 (IPv4/IPv6)", "在线玩家", "端口冲突", "服务器根目录"])
+        self.supervisor_table.horizontalHeader().setSectionResizeMode(5, QHeaderView.ResizeMode.Stretch)
+        self.supervisor_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.supervisor_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.supervisor_table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.supervisor_table.doubleClicked.connect(self.open_selected_instance_console)
+        layout.addWidget(self.supervisor_table)
+
+        buttons_layout = QHBoxLayout()
+        for text, icon, slot in (("添加服务器", QStyle.StandardPixmap.SP_DirOpenIcon, self.add_server_instance),
+                                 ("移除", QStyle.StandardPixmap.SP_TrashIcon, self.remove_selected_instance),
+                                 ("启动", QStyle.StandardPixmap.SP_MediaPlay, self.start_selected_instance),
+                                 ("停止", QStyle.StandardPixmap.SP_MediaStop, self.stop_selected_instance),
+                                 ("全部停止", QStyle.StandardPixmap.SP_BrowserStop, self.stop_all_instances),
+                                 ("打开控制台", QStyle.StandardPixmap.SP_FileDialogDetailedView, self.open_selected_instance_console)):
+            button = QPushButton(text)
+            button.setIcon(self.style().standardIcon(icon))
+            button.clicked.connect(slot)
+            buttons_layout.addWidget(button)
+        layout.addLayout(buttons_layout)
+
+        self.supervisor_summary_label = QLabel()
+        layout.addWidget(self.supervisor_summary_label)
+
+        self.instance_console_tab_widget = QTabWidget()
+        self.instance_console_tab_widget.setTabsClosable(True)
+        self.instance_console_tab_widget.tabCloseRequested.connect(self.close_instance_console_tab)
+        layout.addWidget(self.instance_console_tab_widget)
+
+        self.supervisor_rows = [] # Row order of the table: server roots
+        self.refresh_supervisor_table()
+        return group
+
+    def restore_server_instances(self):
+        """恢复上次保存的实例列表 (启动后首次绘制完成时调用)"""
+        for root_path in QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION).value("server_instances", [], type=list):
+            if os.path.isdir(root_path):
+                self.get_server_instance(root_path)
+
+    def save_server_instance_list(self):
+        QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION).setValue("server_instances", list(self.server_instances))
+
+    def refresh_supervisor_table(self):
+        """重建实例表格 (添加/移除实例或修改 server.properties 后); 状态变化只更新对应的行"""
+        if not hasattr(self, "supervisor_table"):
+            return # Instances restored while the table is being built
+        self.supervisor_rows = sorted(self.server_instances, key=lambda root: self.server_instances[root].name.lower())
+        conflicts = find_port_conflicts(self.supervisor_rows)
+        self.supervisor_table.setRowCount(len(self.supervisor_rows))
+        for row, root_path in enumerate(self.supervisor_rows):
+            instance = self.server_instances[root_path]
+            ports = server_ports(root_path)
+            conflict_text = ", ".join(f"{port} ({self.server_instances[other].name})" for port, other in conflicts.get(root_path, []))
+            cells = [instance.name, "", f"{ports['server-port']} / {ports['server-portv6']}", "", conflict_text, root_path]
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if column == 4 and text:
+                    item.setForeground(QColor("red"))
+                self.supervisor_table.setItem(row, column, item)
+            self.update_supervisor_row(instance)
+
+    def update_supervisor_row(self, instance):
+        if not hasattr(self, "supervisor_table") or instance.root_path not in self.supervisor_rows:
+            return
+        row = self.supervisor_rows.index(instance.root_path)
+        state = instance.state_text()
+        pid = instance.process.processId() if instance.process is not None else 0
+        self.supervisor_table.item(row, 1).setText(f"{state} (PID {pid})" if pid else state)
+        self.supervisor_table.item(row, 3).setText(str(len(instance.online_players)))
+        running = [other for other in self.server_instances.values() if other.is_running()]
+        players = sum(len(other.online_players) for other in running)
+        self.supervisor_summary_label.setText(f"共 {len(self.server_instances)} 个实例, 运行中 {len(running)} 个, 在线玩家 {players} 人")
+
+    def selected_instance(self):
+        rows = self.supervisor_table.selectionModel().selectedRows()
+        if not rows:
+            QMessageBox.information(self, "提示", "请先在列表中选择一个服务器实例.")
+            return None
+        return self.server_instances[self.supervisor_rows[rows[0].row()]]
+
+    def add_server_instance(self):
+        dir_path = QFileDialog.getExistingDirectory(self, "选择要添加的服务器根目录", "", QFileDialog.Option.ShowDirsOnly)
+        if dir_path:
+            instance = self.get_server_instance(dir_path)
+            self.update_status(f"已添加服务器实例: {instance.name}", "success")
+
+    def remove_selected_instance(self):
+        instance = self.selected_instance()
+        if instance is None:
+            return
+        if instance.is_running():
+            QMessageBox.warning(self, "警告", f"请先停止服务器实例 '{instance.name}'.")
+            return
+        if instance is self.server_instance:
+            QMessageBox.warning(self, "警告", "不能移除当前加载的服务器根目录对应的实例.")
+            return
+        tab = self.instance_console_tabs.get(instance.root_path)
+        if tab is not None:
+            self.close_instance_console_tab(self.instance_console_tab_widget.indexOf(tab))
+        del self.server_instances[instance.root_path]
+        instance.deleteLater()
+        self.save_server_instance_list()
+        self.refresh_supervisor_table()
+
+    def start_selected_instance(self):
+        instance = self.selected_instance()
+        if instance is not None:
+            self.start_server_instance(instance)
+
+    def stop_selected_instance(self):
+        instance = self.selected_instance()
+        if instance is not None:
+            instance.stop()
+
+    def stop_all_instances(self):
+        for instance in self.server_instances.values():
+            if instance.is_running():
+                instance.stop()
+
+    def open_selected_instance_console(self):
+        instance = self.selected_instance()
+        if instance is None:
+            return
+        if instance is self.server_instance:
+            self.left_tab_widget.setCurrentWidget(self.server_control_group)
+            return
+        tab = self.instance_console_tabs.get(instance.root_path)
+        if tab is None:
+            tab = ServerConsoleTab(instance)
+            self.instance_console_tabs[instance.root_path] = tab
+            self.instance_console_tab_widget.addTab(tab, instance.name)
+        self.instance_console_tab_widget.setCurrentWidget(tab)
+
+    def close_instance_console_tab(self, index):
+        tab = self.instance_console_tab_widget.widget(index)
+        self.instance_console_tab_widget.removeTab(index)
+        tab.detach()
+        del self.instance_console_tabs[tab.instance.root_path]
+        tab.deleteLater()
+
+    def search_server_logs(self):
+        query = self.log_search_input.text().strip()
+        if not query or not self.server_root_path:
+            return
+        if self.log_search_thread is not None:
+            QMessageBox.information(self, "提示", "日志搜索正在进行中.")
+            return
+        seconds = LOG_SEARCH_RANGES[self.log_search_range_combo.currentText()]
+        self.log_search_worker = LogSearchWorker(os.path.join(self.server_root_path, SERVER_LOG_DIRNAME), query,
+                                                 time.time() - seconds if seconds else None)
+        self.log_search_thread = QThread()
+        self.log_search_worker.moveToThread(self.log_search_thread)
+        self.log_search_thread.started.connect(self.log_search_worker.run)
+        self.log_search_worker.search_finished.connect(self.on_log_search_finished)
+        self.log_search_btn.setEnabled(False)
+        self.update_status(f"正在搜索日志: {query}...", "info")
+        self.log_search_thread.start()
+
+    def on_log_search_finished(self, results, stats):
+        if self.log_search_thread is None:
+            return
+        query = self.log_search_worker.query
+        self.log_search_thread.quit()
+        self.log_search_thread.wait()
+        self.log_search_thread = None
+        self.log_search_worker = None
+        self.log_search_btn.setEnabled(True)
+        if "error" in stats:
+            self.update_status(f"搜索日志失败: {stats['error']}", "error")
+            return
+
+        summary = (f"找到 {len(results)} 行{' (仅显示前 ' + str(len(results)) + ' 行)' if stats['truncated'] else ''}; "
+                   f"共 {stats['segments']} 个日志段, 按索引跳过 {stats['skipped']} 个, 实际读取 {stats['searched']} 个")
+        self.update_status(f"日志搜索 '{query}': {summary}", "success" if results else "info")
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"日志搜索结果 - {query}")
+        dialog.setMinimumSize(900, 500)
+        dialog.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dialog_layout = QVBoxLayout(dialog)
+        dialog_layout.addWidget(QLabel(summary))
+        result_view = QPlainTextEdit()
+        result_view.setReadOnly(True)
+        result_view.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        result_view.setFont(QFont("Consolas", 9))
+        result_view.setPlainText("\n".join(f"[{segment}:{line_no}] {line}" for segment, line_no, line in results))
+        dialog_layout.addWidget(result_view)
+        dialog.show()
+
+    def cancel_log_search(self):
+        if self.log_search_thread is None:
+            return
+        self.log_search_worker.cancel()
+        self.log_search_thread.quit()
+        self.log_search_thread.wait()
+        self.log_search_thread = None
+        self.log_search_worker = None
 
-    def handle_server_error(self, error):
-        error_map = {
-            QProcess.ProcessError.FailedToStart: "启动失败", QProcess.ProcessError.Crashed: "崩溃",
-            QProcess.ProcessError.Timedout: "超时", QProcess.ProcessError.ReadError: "读取错误",
-            QProcess.ProcessError.WriteError: "写入错误", QProcess.ProcessError.UnknownError: "未知错误"
-        }
-        error_string = error_map.get(error, "未知错误")
-        self.server_log_display.append(f"服务器进程错误: {error_string}")
-        self.update_status(f"服务器错误: {error_string}", "error")
-        self.server_process = None 
-        self.update_server_controls_state()
-        
     def edit_server_properties(self):
         if not self.server_root_path:
             QMessageBox.warning(self, "警告", "请先加载服务器根目录.")
@@ -1656,6 +3590,7 @@ class PackManagerApp(QMainWindow):
             with open(properties_path, 'w', encoding='utf-8') as f:
                 f.write(content)
             self.update_status("server.properties 已保存.", "success")
+            self.refresh_supervisor_table() # Ports may have changed
             QMessageBox.information(self, "成功", "server.properties 已保存.\n某些更改可能需要重启服务器才能生效.")
             dialog.accept()
         except Exception as e:
@@ -1692,14 +3627,24 @@ class PackManagerApp(QMainWindow):
             QMessageBox.warning(self, "错误", f"无法打开文件夹: {path_to_open}")
 
     def closeEvent(self, event):
-        if self.server_process and self.server_process.state() != QProcess.ProcessState.NotRunning:
+        running = [instance for instance in self.server_instances.values() if instance.is_running()]
+        if self.close_after_server_stop and running:
+            self.update_status("正在停止服务器, 停止后将自动退出...", "info")
+            event.ignore()
+            return
+        if running:
+            names = ", ".join(instance.name for instance in running)
             reply = QMessageBox.question(self, "服务器运行中",
-                                       "服务器仍在运行中.是否要停止服务器并退出?",
+                                       f"有 {len(running)} 个服务器仍在运行中 ({names}).是否要停止服务器并退出?",
                                        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel,
                                        QMessageBox.StandardButton.Cancel)
             if reply == QMessageBox.StandardButton.Yes:
-                self.stop_server()
-                event.accept()
+                # Stop asynchronously and close once every process has exited (see on_instance_state_changed)
+                self.close_after_server_stop = True
+                self.stop_all_instances()
+                self.update_status("正在停止服务器, 停止后将自动退出...", "info")
+                event.ignore()
+                return
             elif reply == QMessageBox.StandardButton.No: 
                 event.accept()
             else: 
@@ -1707,8 +3652,37 @@ class PackManagerApp(QMainWindow):
         else:
             event.accept()
 
+        if event.isAccepted():
+            self.save_worlds_snapshot()
+            if self.hot_backup_copy_thread is not None:
+                shutil.rmtree(self.stop_hot_backup_copy_thread().staging_path, ignore_errors=True)
+            if self.hot_backup is not None:
+                self.hot_backup_timer.stop()
+                self.hot_backup = None
+                self.write_server_command("save resume") # Never leave a server that keeps running with saves held
+            if self.backup_thread is not None:
+                self.update_status("正在等待备份完成...", "info")
+                self.stop_backup_thread()
+            if self.restore_thread is not None:
+                self.restore_worker.cancel() # Unless the world is already being swapped, this leaves it untouched
+                self.stop_restore_thread()
+            trace_path = os.environ.get(trace.TRACE_ENV_VAR)
+            if trace_path and trace.event_count():
+                try:
+                    trace.export_chrome_trace(trace_path)
+                except OSError:
+                    pass # Best effort; never block closing the window
+            self.cancel_server_pack_scan()
+            self.cancel_batch_import()
+            self.cancel_retention()
+            self.cancel_backup_verification()
+            self.cancel_log_search()
+            for instance in self.server_instances.values():
+                instance.wait_for_log_stores()
+
 
 if __name__ == "__main__":
+    trace.enable_from_env()
     app = QApplication(sys.argv)
     window = PackManagerApp()
     window.show()
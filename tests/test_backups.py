@@ -0,0 +1,462 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+import zlib
+
+import pytest
+
+from bedrock_core import backups
+from bedrock_core.backups import (SNAPSHOT_STORE_DIRNAME, BackupCatalog, backup_manifest_path, ZIP64_LIMIT, ZipArchiveWriter, create_backup, create_zip_backup,
+                                  record_backup, create_world_snapshot, prune_snapshot_store, zip_member_dest,
+                                  RETENTION_DEFAULT_POLICY, retention_policy_for, select_expired_backups,
+                                  RestoreCancelled, restore_world_backup, split_zip_members, check_zip_members, verify_backups)
+from bedrock_core.storage import ContentStore
+
+
+def write_world(world_path, files):
+    for rel_path, data in files.items():
+        path = os.path.join(world_path, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+@pytest.fixture
+def backup_dir(tmp_path):
+    path = tmp_path / "world_backups"
+    path.mkdir()
+    return str(path)
+
+
+def load_manifest(backup_dir, name):
+    with open(backup_manifest_path(backup_dir, name), encoding="utf-8") as f:
+        return {entry["path"]: entry for entry in json.load(f)["files"]}
+
+
+def test_folder_backup_links_unchanged_files(tmp_path, backup_dir):
+    world_path = str(tmp_path / "W")
+    write_world(world_path, {"level.dat": b"level", "db/000005.ldb": b"chunk", "db/CURRENT": b"MANIFEST-1"})
+    first, first_stats = create_backup(world_path, backup_dir, "W", "folder", "W_backup_20240101_000001")
+    assert (first_stats["linked"], first_stats["copied"]) == (0, 3)
+    write_world(world_path, {"db/CURRENT": b"MANIFEST-2"})
+
+    second, stats = create_backup(world_path, backup_dir, "W", "folder", "W_backup_20240101_000002")
+
+    assert (stats["linked"], stats["copied"]) == (2, 1)
+    assert os.path.samefile(os.path.join(backup_dir, first, "db", "000005.ldb"),
+                            os.path.join(backup_dir, second, "db", "000005.ldb"))
+    assert read_world(os.path.join(backup_dir, second))["db/CURRENT"] == b"MANIFEST-2"
+    assert read_world(os.path.join(backup_dir, first))["db/CURRENT"] == b"MANIFEST-1"
+
+
+def test_folder_backup_hashes_files_with_unchanged_size_and_mtime(tmp_path, backup_dir):
+    world_path = str(tmp_path / "W")
+    write_world(world_path, {"level.dat": b"level", "db/000005.ldb": b"chunk v1"})
+    first, _ = create_backup(world_path, backup_dir, "W", "folder", "W_backup_20240101_000001")
+    # Rewritten within the mtime granularity, or with the mtime restored afterwards
+    ldb_path = os.path.join(world_path, "db", "000005.ldb")
+    st = os.stat(ldb_path)
+    write_world(world_path, {"db/000005.ldb": b"chunk v2"})
+    os.utime(ldb_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    second, stats = create_backup(world_path, backup_dir, "W", "folder", "W_backup_20240101_000002")
+
+    assert (stats["linked"], stats["copied"]) == (1, 1)
+    assert read_world(os.path.join(backup_dir, second))["db/000005.ldb"] == b"chunk v2"
+    assert read_world(os.path.join(backup_dir, first))["db/000005.ldb"] == b"chunk v1"
+    assert load_manifest(backup_dir, second)["db/000005.ldb"]["sha256"] == hashlib.sha256(b"chunk v2").hexdigest()
+
+
+def test_backup_catalog_records_and_syncs(tmp_path, backup_dir):
+    world_path = str(tmp_path / "W")
+    write_world(world_path, {"level.dat": b"level", "db/000005.ldb": b"chunk"})
+    zip_name = make_zip_backup(tmp_path, backup_dir, {})
+    os.makedirs(os.path.join(backup_dir, "W_backup_20200101_120000")) # Copied in by hand: no checksum
+    os.makedirs(os.path.join(backup_dir, "notes")) # Not a backup name
+
+    with BackupCatalog(backup_dir).update() as catalog:
+        catalog.sync()
+
+    catalog = BackupCatalog(backup_dir)
+    assert set(catalog.entries) == {zip_name, "W_backup_20200101_120000"}
+    assert catalog.entries[zip_name]["sha256"] == backups.hash_file(os.path.join(backup_dir, zip_name))
+    assert catalog.entries["W_backup_20200101_120000"]["sha256"] is None
+    assert [name for name, _ in catalog.backups_for("W")] == [zip_name, "W_backup_20200101_120000"]
+
+    os.unlink(os.path.join(backup_dir, zip_name))
+    with BackupCatalog(backup_dir).update() as catalog:
+        catalog.sync()
+    assert set(BackupCatalog(backup_dir).entries) == {"W_backup_20200101_120000"}
+
+
+def test_backup_catalog_concurrent_updates_keep_every_entry(backup_dir, monkeypatch):
+    save = BackupCatalog.save
+    def slow_save(catalog):
+        time.sleep(0.02) # Widen the window between reading and rewriting the file
+        save(catalog)
+    monkeypatch.setattr(BackupCatalog, "save", slow_save)
+
+    names = [f"W_backup_20240101_0000{i:02d}.zip" for i in range(8)]
+    barrier = threading.Barrier(len(names))
+    def add(name):
+        barrier.wait()
+        record_backup(backup_dir, name, "W", "zip", {"archive_bytes": 1, "files": 1, "sha256": name})
+    threads = [threading.Thread(target=add, args=(name,)) for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    entries = BackupCatalog(backup_dir).entries
+    assert sorted(entries) == names
+    assert all(entries[name]["sha256"] == name for name in names)
+
+
+def test_zip_backup_round_trip_picks_codec_per_file(tmp_path):
+    files = {"level.dat": b"level data " * 1000, "db/000005.ldb": b"already compressed " * 100,
+             "db/MANIFEST-000001": os.urandom(100 * 1024), "levelname.txt": "世界".encode("utf-8")}
+    world_path = str(tmp_path / "W")
+    write_world(world_path, files)
+    zip_path = str(tmp_path / "W.zip")
+    create_zip_backup(world_path, zip_path)
+
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        assert {info.filename: zf.read(info) for info in zf.infolist()} == files
+        methods = {info.filename: info.compress_type for info in zf.infolist()}
+    assert methods["level.dat"] == zipfile.ZIP_DEFLATED
+    assert methods["db/000005.ldb"] == zipfile.ZIP_STORED # By extension
+    assert methods["db/MANIFEST-000001"] == zipfile.ZIP_STORED # Incompressible sample
+
+
+@pytest.mark.parametrize("change", [b"", b"appended while the backup ran"])
+def test_zip_backup_crc_matches_stored_data_of_changing_file(tmp_path, monkeypatch, change):
+    world_path = str(tmp_path / "W")
+    write_world(world_path, {"level.dat": b"level", "db/000005.ldb": b"x" * 5000})
+    ldb_path = os.path.join(world_path, "db", "000005.ldb")
+    compress_backup_member = backups.compress_backup_member
+    def changing_member(file_path, level):
+        result = compress_backup_member(file_path, level)
+        if file_path == ldb_path: # Rewritten (shrunk or grown) between planning and writing the member
+            with open(ldb_path, "wb") as f:
+                f.write(b"y" * 100 + change)
+        return result
+    monkeypatch.setattr(backups, "compress_backup_member", changing_member)
+    zip_path = str(tmp_path / "W.zip")
+
+    create_zip_backup(world_path, zip_path, max_workers=1)
+
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        assert zf.read("db/000005.ldb") == b"y" * 100 + change
+
+
+def add_member(writer, arcname, data, method=zipfile.ZIP_STORED):
+    payload = data
+    if method == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        payload = compressor.compress(data) + compressor.flush()
+    writer.add(arcname, method, zlib.crc32(data), len(data), len(payload), time.time(), io.BytesIO(payload))
+
+
+def test_zip_archive_writer_zip64_offsets(tmp_path):
+    zip_path = str(tmp_path / "big.zip")
+    with open(zip_path, "wb") as f:
+        f.seek(ZIP64_LIMIT + 1) # Sparse: members start past 4 GiB without writing 4 GiB
+        writer = ZipArchiveWriter(f)
+        add_member(writer, "stored.bin", b"stored")
+        add_member(writer, "deflated.txt", b"deflated " * 100, zipfile.ZIP_DEFLATED)
+        with open(tmp_path / "streamed.ldb", "wb") as src:
+            src.write(b"streamed")
+        with open(tmp_path / "streamed.ldb", "rb") as src:
+            writer.add_stored("streamed.ldb", time.time(), src)
+        writer.close()
+
+    with zipfile.ZipFile(zip_path) as zf:
+        assert all(info.header_offset > ZIP64_LIMIT for info in zf.infolist())
+        assert zf.read("stored.bin") == b"stored"
+        assert zf.read("deflated.txt") == b"deflated " * 100
+        assert zf.read("streamed.ldb") == b"streamed"
+
+
+def test_zip_archive_writer_zip64_member_count(tmp_path):
+    zip_path = str(tmp_path / "many.zip")
+    with open(zip_path, "wb") as f:
+        writer = ZipArchiveWriter(f)
+        for i in range(0xFFFF + 1):
+            add_member(writer, f"f{i}", b"")
+        writer.close()
+
+    with zipfile.ZipFile(zip_path) as zf:
+        names = zf.namelist()
+        assert len(names) == 0xFFFF + 1 and names[-1] == "f65535"
+
+
+def read_world(world_path):
+    files = {}
+    for root, _, file_names in os.walk(world_path):
+        for file_name in file_names:
+            path = os.path.join(root, file_name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, world_path).replace(os.sep, "/")] = f.read()
+    return files
+
+
+@pytest.mark.parametrize("filename, parts", [
+    ("level.dat", ["level.dat"]),
+    ("db/000005.ldb", ["db", "000005.ldb"]),
+    ("./db//CURRENT", ["db", "CURRENT"]),
+    ("db\\MANIFEST-000001", ["db", "MANIFEST-000001"]),
+])
+def test_zip_member_dest(tmp_path, filename, parts):
+    assert zip_member_dest(str(tmp_path), filename) == os.path.join(str(tmp_path), *parts)
+
+
+@pytest.mark.parametrize("filename", ["", "/", "../level.dat", "db/../../level.dat", "/etc/passwd", "C:/level.dat",
+                                      "C:level.dat"])
+def test_zip_member_dest_rejects_unsafe_paths(tmp_path, filename):
+    with pytest.raises(ValueError):
+        zip_member_dest(str(tmp_path), filename)
+
+
+@pytest.mark.parametrize("backup_type", ["folder", "zip", "snapshot"])
+def test_restore_world_backup_replaces_world(tmp_path, backup_dir, backup_type):
+    world_path = str(tmp_path / "worlds" / "W")
+    saved = {"level.dat": b"level v1", "levelname.txt": b"W", "db/000005.ldb": os.urandom(1000)}
+    write_world(world_path, saved)
+    name, _ = create_backup(world_path, backup_dir, "W", backup_type)
+    write_world(world_path, {"level.dat": b"level v2", "db/000006.ldb": b"newer chunk"})
+
+    stats, kept_path = restore_world_backup(os.path.join(backup_dir, name), world_path, keep_old=True)
+
+    assert read_world(world_path) == saved
+    assert stats["files"] == len(saved)
+    assert read_world(kept_path)["db/000006.ldb"] == b"newer chunk"
+    # Only the restored world and the kept copy remain: no staging directories are left behind
+    assert sorted(os.listdir(tmp_path / "worlds")) == sorted(["W", os.path.basename(kept_path)])
+
+
+def test_restore_world_backup_leaves_world_untouched_on_failure(tmp_path, backup_dir):
+    world_path = str(tmp_path / "worlds" / "W")
+    current = {"level.dat": b"current", "db/000005.ldb": b"current chunk"}
+    write_world(world_path, current)
+    not_a_world = str(tmp_path / "broken.zip")
+    with zipfile.ZipFile(not_a_world, "w") as zf:
+        zf.writestr("db/000005.ldb", b"no level.dat here")
+    unsafe = str(tmp_path / "unsafe.zip")
+    with zipfile.ZipFile(unsafe, "w") as zf:
+        zf.writestr("level.dat", b"level")
+        zf.writestr("../escaped.dat", b"outside the world")
+
+    for backup_path in (not_a_world, unsafe):
+        with pytest.raises(ValueError):
+            restore_world_backup(backup_path, world_path)
+        assert read_world(world_path) == current
+        assert os.listdir(tmp_path / "worlds") == ["W"]
+    assert not os.path.exists(tmp_path / "worlds" / "escaped.dat")
+
+
+def test_restore_folder_backup_rejects_modified_files(tmp_path, backup_dir):
+    world_path = str(tmp_path / "worlds" / "W")
+    write_world(world_path, {"level.dat": b"level", "db/000005.ldb": b"chunk"})
+    name, _ = create_backup(world_path, backup_dir, "W", "folder")
+    with open(os.path.join(backup_dir, name, "db", "000005.ldb"), "wb") as f:
+        f.write(b"bit rot")
+    write_world(world_path, {"level.dat": b"current"})
+
+    with pytest.raises(ValueError):
+        restore_world_backup(os.path.join(backup_dir, name), world_path)
+    assert read_world(world_path)["level.dat"] == b"current"
+    assert os.listdir(tmp_path / "worlds") == ["W"]
+
+
+
+@pytest.mark.parametrize("backup_type", ["folder", "zip", "snapshot"])
+def test_restore_world_backup_reports_progress(tmp_path, backup_dir, backup_type):
+    world_path = str(tmp_path / "worlds" / "W")
+    write_world(world_path, {"level.dat": b"level", "levelname.txt": b"W",
+                             **{f"db/{i:06}.ldb": os.urandom(100 + i) for i in range(20)}})
+    name, _ = create_backup(world_path, backup_dir, "W", backup_type)
+    reports = []
+
+    stats, _ = restore_world_backup(os.path.join(backup_dir, name), world_path, max_workers=4,
+                                    progress=lambda done, total: reports.append((done, total)))
+
+    assert len(reports) == stats["files"]
+    assert [done for done, _ in reports] == sorted(done for done, _ in reports)
+    assert reports[-1] == (stats["bytes"], stats["bytes"])
+
+
+@pytest.mark.parametrize("backup_type", ["folder", "zip", "snapshot"])
+def test_restore_world_backup_cancel_leaves_world_untouched(tmp_path, backup_dir, backup_type):
+    world_path = str(tmp_path / "worlds" / "W")
+    write_world(world_path, {"level.dat": b"level", **{f"db/{i:06}.ldb": os.urandom(100) for i in range(20)}})
+    name, _ = create_backup(world_path, backup_dir, "W", backup_type)
+    write_world(world_path, {"level.dat": b"current"})
+    current = read_world(world_path)
+    cancel_event = threading.Event()
+
+    def on_progress(done, total):
+        cancel_event.set() # Cancel as soon as the first file has been restored
+
+    with pytest.raises(RestoreCancelled):
+        restore_world_backup(os.path.join(backup_dir, name), world_path, max_workers=1,
+                             progress=on_progress, cancel_event=cancel_event)
+    assert read_world(world_path) == current
+    assert os.listdir(tmp_path / "worlds") == ["W"]
+
+RETENTION_BACKUPS = [ # Newest first, as BackupCatalog.backups_for() returns them
+    ("b1", "2024-03-20T12:40:00"), ("b2", "2024-03-20T12:20:00"), ("b3", "2024-03-20T12:00:00"),
+    ("b4", "2024-03-20T11:30:00"), ("b5", "2024-03-20T10:10:00"), ("b6", "2024-03-19T23:00:00"),
+    ("b7", "2024-03-19T08:00:00"), # Same day as b6 and same ISO week (12) as b1
+    ("b8", "2024-03-12T09:00:00"), # ISO week 11
+    ("b9", "2024-03-05T09:00:00"), # ISO week 10
+]
+
+
+def retention_backups():
+    return [(name, {"world": "W", "created": created}) for name, created in RETENTION_BACKUPS]
+
+
+def test_select_expired_backups_keeps_newest_per_bucket():
+    policy = {"keep_last": 2, "hourly": 3, "daily": 2, "weekly": 2}
+    # keep_last: b1 b2; hourly: b1 (12h) b4 (11h) b5 (10h); daily: b1 b6; weekly: b1 b8
+    assert select_expired_backups(retention_backups(), policy) == ["b3", "b7", "b9"]
+
+
+def test_select_expired_backups_always_keeps_newest():
+    policy = {"keep_last": 0, "hourly": 0, "daily": 0, "weekly": 0}
+    assert select_expired_backups(retention_backups(), policy) == [name for name, _ in RETENTION_BACKUPS[1:]]
+    assert select_expired_backups([], policy) == []
+
+
+def test_retention_policy_for_fills_defaults():
+    policies = {"W": {"enabled": True, "daily": 14}}
+    assert retention_policy_for(policies, "W") == {**RETENTION_DEFAULT_POLICY, "enabled": True, "daily": 14}
+    assert retention_policy_for(policies, "Other") == RETENTION_DEFAULT_POLICY
+
+
+def test_snapshot_stores_only_changed_files(tmp_path, backup_dir, monkeypatch):
+    world_path = str(tmp_path / "W")
+    files = {"level.dat": b"level", **{f"db/{i:06}.ldb": os.urandom(500) for i in range(5)}}
+    write_world(world_path, files)
+    first_path, first = create_world_snapshot(world_path, backup_dir, "W", "W_backup_20240101_000001")
+    assert (first["stored_files"], first["reused"]) == (6, 0)
+
+    stored = []
+    add_file = ContentStore.add_file
+    monkeypatch.setattr(ContentStore, "add_file", lambda self, path: stored.append(os.path.relpath(path, world_path))
+                        or add_file(self, path))
+    write_world(world_path, {"db/000002.ldb": b"rewritten chunk", "db/000009.ldb": b"new chunk"})
+    second_path, second = create_world_snapshot(world_path, backup_dir, "W", "W_backup_20240101_000002")
+
+    assert sorted(stored) == [os.path.join("db", "000002.ldb"), os.path.join("db", "000009.ldb")]
+    assert (second["files"], second["reused"], second["stored_files"]) == (7, 5, 2)
+    assert second["stored_bytes"] == len(b"rewritten chunk") + len(b"new chunk")
+    with open(second_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert manifest["parent"] == "W_backup_20240101_000001"
+    with open(first_path, encoding="utf-8") as f:
+        first_files = {entry["path"]: entry["sha256"] for entry in json.load(f)["files"]}
+    for entry in manifest["files"]:
+        if entry["path"] not in ("db/000002.ldb", "db/000009.ldb"):
+            assert entry["sha256"] == first_files[entry["path"]]
+
+
+def test_snapshot_parent_is_latest_snapshot_of_same_world(tmp_path, backup_dir):
+    for world_name in ("W", "W_backup_20240101_000009"): # A world whose name looks like a backup of W
+        write_world(str(tmp_path / world_name), {"level.dat": world_name.encode()})
+    create_world_snapshot(str(tmp_path / "W"), backup_dir, "W", "W_backup_20240101_000001")
+    create_world_snapshot(str(tmp_path / "W_backup_20240101_000009"), backup_dir, "W_backup_20240101_000009",
+                          "W_backup_20240101_000009_backup_20240101_000002")
+    path, stats = create_world_snapshot(str(tmp_path / "W"), backup_dir, "W", "W_backup_20240101_000003")
+
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["parent"] == "W_backup_20240101_000001"
+    assert stats["reused"] == 1
+
+
+def test_prune_snapshot_store_keeps_referenced_objects(tmp_path, backup_dir):
+    world_path = str(tmp_path / "W")
+    write_world(world_path, {"level.dat": b"level", "db/000001.ldb": b"chunk v1"})
+    first_path, _ = create_world_snapshot(world_path, backup_dir, "W", "W_backup_1")
+    write_world(world_path, {"db/000001.ldb": b"chunk v2!"})
+    create_world_snapshot(world_path, backup_dir, "W", "W_backup_2")
+
+    assert prune_snapshot_store(backup_dir) == 0
+    os.unlink(first_path)
+    assert prune_snapshot_store(backup_dir) == len(b"chunk v1")
+
+
+def test_prune_snapshot_store_waits_for_snapshot_in_progress(backup_dir):
+    # A snapshot stores its objects before its manifest exists; pruning must not run in between
+    store = ContentStore(os.path.join(backup_dir, SNAPSHOT_STORE_DIRNAME))
+    pruned = threading.Event()
+    with store.lock():
+        object_path = store.add_stream(io.BytesIO(b"not yet in any manifest"))
+        pruner = threading.Thread(target=lambda: (prune_snapshot_store(backup_dir), pruned.set()))
+        pruner.start()
+        assert not pruned.wait(0.2)
+        assert os.path.exists(object_path)
+    pruner.join(5)
+    assert pruned.is_set() and not os.path.exists(object_path) # Unreferenced once the writer gave up
+
+
+def make_zip_backup(tmp_path, backup_dir, files):
+    world_path = str(tmp_path / "W")
+    write_world(world_path, files)
+    name, stats = create_backup(world_path, backup_dir, "W", "zip")
+    record_backup(backup_dir, name, "W", "zip", stats)
+    return name
+
+
+def test_split_zip_members_bounds_task_size(tmp_path, backup_dir):
+    name = make_zip_backup(tmp_path, backup_dir, {f"db/{i:06d}.ldb": os.urandom(3000) for i in range(10)})
+    with zipfile.ZipFile(os.path.join(backup_dir, name)) as zf:
+        infos = [info for info in zf.infolist() if not info.is_dir()]
+    groups = split_zip_members(infos, max_bytes=7000)
+    assert [info.filename for group in groups for info in group] == [info.filename for info in infos]
+    assert all(sum(info.compress_size for info in group) <= 7000 for group in groups)
+    assert split_zip_members(infos[:1], max_bytes=1) == [infos[:1]] # An oversized member still gets a task
+
+
+def test_verify_zip_backup_detects_corruption(tmp_path, backup_dir):
+    name = make_zip_backup(tmp_path, backup_dir, {"level.dat": b"level" * 100, "db/000001.ldb": os.urandom(4096)})
+    assert verify_backups(backup_dir, [name])[name] == ("ok", [])
+    path = os.path.join(backup_dir, name)
+    with zipfile.ZipFile(path) as zf:
+        info = zf.getinfo("db/000001.ldb")
+        data_offset = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+    with open(path, "r+b") as f:
+        f.seek(data_offset + 100)
+        f.write(b"\0" * 16)
+    status, problems = verify_backups(backup_dir, [name])[name]
+    assert status == "corrupt" and any("db/000001.ldb" in problem for problem in problems)
+
+
+def test_check_zip_members_stops_when_cancelled(tmp_path, backup_dir):
+    # A corrupt member is only detected once it has been read to the end; cancelling stops before that
+    name = make_zip_backup(tmp_path, backup_dir, {"db/big.ldb": os.urandom(4 * 1024 * 1024)})
+    path = os.path.join(backup_dir, name)
+    with zipfile.ZipFile(path) as zf:
+        infos = zf.infolist()
+    with open(path, "r+b") as f:
+        f.seek(infos[0].header_offset + 3 * 1024 * 1024)
+        f.write(b"\0" * 16)
+    assert check_zip_members(path, infos)
+    cancel_event = threading.Event()
+    cancel_event.set()
+    assert check_zip_members(path, infos, cancel_event) == []
+
+
+def test_verify_backups_cancel_leaves_backup_unreported(tmp_path, backup_dir, monkeypatch):
+    monkeypatch.setattr(backups, "VERIFY_ZIP_TASK_BYTES", 4096)
+    name = make_zip_backup(tmp_path, backup_dir, {f"db/{i:06d}.ldb": os.urandom(4096) for i in range(20)})
+    cancel_event = threading.Event()
+    results = verify_backups(backup_dir, [name], max_workers=1, cancel_event=cancel_event,
+                             progress=lambda done, total: cancel_event.set())
+    assert results == {}
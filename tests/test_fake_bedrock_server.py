@@ -0,0 +1,59 @@
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+
+from bedrock_core.server import ServerEventParser, parse_save_query_files
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_fake_server(server_root, commands, *args):
+    return subprocess.run([sys.executable, "-m", "benchmarks.fake_bedrock_server", *args],
+                          input="".join(command + "\n" for command in commands), capture_output=True, text=True,
+                          cwd=server_root, env=dict(os.environ, PYTHONPATH=PACKAGE_ROOT), timeout=30)
+
+
+@pytest.fixture
+def server_root(tmp_path):
+    (tmp_path / "server.properties").write_text("level-name=My World\n")
+    world = tmp_path / "worlds" / "My World"
+    (world / "db").mkdir(parents=True)
+    (world / "db" / "CURRENT").write_bytes(b"MANIFEST-000001\n")
+    (world / "level.dat").write_bytes(b"x" * 42)
+    return str(tmp_path)
+
+
+def test_fake_server_speaks_the_real_console_format(server_root):
+    result = run_fake_server(server_root, ["list", "save hold", "save query", "save query", "save resume",
+                                           "nonsense", "stop", "list"])
+    assert result.returncode == 0
+    output = result.stdout
+    kinds = [event.kind for event in ServerEventParser().feed(output)]
+    assert kinds[:4] == ["server_version", "port_open", "port_open", "server_started"]
+    assert "There are 0/10 players online:" in output
+    assert output.count("A previous save has not been completed.") == 1 # The first query is not ready yet
+    assert sorted(parse_save_query_files(output)) == [("My World/db/CURRENT", 16), ("My World/level.dat", 42)]
+    assert "Changes to the level are resumed." in output
+    assert "Unknown command: nonsense." in output
+    assert output.rstrip().endswith("Quit correctly") # Nothing is handled after stop
+
+
+def test_fake_server_ignores_stop_until_stdin_closes(server_root):
+    result = run_fake_server(server_root, ["stop", "list"], "--on-stop", "ignore")
+    assert result.returncode == 0
+    assert "Stop ignored" in result.stdout and "players online" in result.stdout
+    assert "Quit correctly" not in result.stdout
+
+
+@pytest.mark.skipif(os.name != "posix", reason="SIGABRT exit status")
+def test_fake_server_crash_after(server_root):
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.fake_bedrock_server", "--crash-after", "0.1"],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=server_root,
+                               env=dict(os.environ, PYTHONPATH=PACKAGE_ROOT))
+    assert process.wait(timeout=30) == -signal.SIGABRT # stdin stays open: only the crash ends the process
+    assert "Crash requested by --crash-after" in process.stdout.read()
+    process.stdin.close()
+    process.stdout.close()
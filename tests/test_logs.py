@@ -0,0 +1,177 @@
+import gzip
+import os
+import threading
+import time
+
+import pytest
+
+from bedrock_core import logs
+from bedrock_core.logs import (BloomFilter, LogSegmentIndex, ServerLogStore, compress_log_segment, load_log_indexes,
+                               open_log_segment_lock, recover_log_segments, release_log_segment_lock, search_logs)
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    path = tmp_path / "server_logs"
+    path.mkdir()
+    return str(path)
+
+
+def write_segment(log_dir, name, text):
+    with open(os.path.join(log_dir, name + ".log"), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def write_indexed_segment(log_dir, name, lines, start=1000.0):
+    """One line per second starting at start; returns the closed index"""
+    index = LogSegmentIndex(name, start)
+    with open(os.path.join(log_dir, name + ".log"), "wb") as f:
+        for i, line in enumerate(lines):
+            data = (line + "\n").encode("utf-8")
+            f.write(data)
+            index.add(line + "\n", start + i, len(data))
+    index.finish()
+    compress_log_segment(log_dir, name, index)
+    return index
+
+
+def test_bloom_filter_round_trip():
+    bloom = BloomFilter()
+    for word in ("steve", "connected", "xuid"):
+        bloom.add(word)
+    restored = BloomFilter.from_text(bloom.to_text())
+    assert all(word in restored for word in ("steve", "connected", "xuid"))
+    assert "alex" not in restored
+
+
+def test_compressed_segment_has_one_gzip_member_per_index_entry(log_dir, monkeypatch):
+    monkeypatch.setattr(logs, "LOG_INDEX_INTERVAL_BYTES", 100)
+    lines = [f"line {i} player{i % 7} did something" for i in range(100)]
+    index = write_indexed_segment(log_dir, "server-a", lines)
+
+    gz_path = os.path.join(log_dir, "server-a.log.gz")
+    assert len(index.members) == len(index.entries) > 10
+    with open(gz_path, "rb") as f:
+        data = f.read()
+    assert all(data[offset:offset + 2] == b"\x1f\x8b" for offset in index.members)
+    with gzip.open(gz_path, "rt", encoding="utf-8") as f:
+        assert f.read() == "".join(line + "\n" for line in lines)
+
+
+def test_search_logs_uses_time_index_and_bloom_filter(log_dir, monkeypatch):
+    monkeypatch.setattr(logs, "LOG_INDEX_INTERVAL_BYTES", 100)
+    lines = [f"Player connected: player{i}, xuid: {i}" for i in range(100)]
+    write_indexed_segment(log_dir, "server-a", lines, start=1000.0)
+    write_indexed_segment(log_dir, "server-b", ["Server started.", "No players here"], start=5000.0)
+
+    results, stats = search_logs(log_dir, "player80")
+    assert results == [("server-a", 81, "Player connected: player80, xuid: 80")]
+    assert stats["skipped"] == 1 # server-b's bloom filter rules it out
+
+    # Lines 91-96 were written at 1090-1095; the search starts and stops at the nearest index entries
+    results, _ = search_logs(log_dir, "player connected", start=1090.0, end=1095.0)
+    line_nos = [line_no for _, line_no, _ in results]
+    assert set(range(91, 97)) <= set(line_nos)
+    assert line_nos == list(range(line_nos[0], line_nos[-1] + 1))
+    assert line_nos[0] > 80 and line_nos[-1] < 100
+    assert ("server-a", 92, "Player connected: player91, xuid: 91") in results
+
+    results, stats = search_logs(log_dir, "connected", limit=5)
+    assert len(results) == 5 and stats["truncated"]
+
+
+def test_recover_compresses_abandoned_segment(log_dir):
+    # A crashed writer leaves its segment and (released) lock file behind
+    write_segment(log_dir, "server-crashed", "Player connected: Steve\n")
+    open(os.path.join(log_dir, "server-crashed.log.lock"), "wb").close()
+
+    recover_log_segments(log_dir)
+
+    assert sorted(os.listdir(log_dir)) == ["server-crashed.idx.json", "server-crashed.log.gz"]
+    [index] = load_log_indexes(log_dir)
+    assert index["lines"] == 1
+
+
+def test_recover_skips_segment_owned_by_live_writer(log_dir):
+    write_segment(log_dir, "server-live", "still being written\n")
+    lock = open_log_segment_lock(log_dir, "server-live")
+    try:
+        recover_log_segments(log_dir)
+        assert os.path.exists(os.path.join(log_dir, "server-live.log"))
+        assert load_log_indexes(log_dir) == []
+    finally:
+        release_log_segment_lock(log_dir, "server-live", lock)
+
+
+def test_second_store_leaves_active_segment_alone(log_dir):
+    first = ServerLogStore(log_dir)
+    first.write("first server line\n")
+    for _ in range(200):
+        if any(name.endswith(".log") for name in os.listdir(log_dir)):
+            break
+        time.sleep(0.01)
+    [active] = [name for name in os.listdir(log_dir) if name.endswith(".log")]
+
+    second = ServerLogStore(log_dir)
+    second.close()
+    assert os.path.exists(os.path.join(log_dir, active))
+
+    first.write("second line\n")
+    first.close()
+    assert not os.path.exists(os.path.join(log_dir, active))
+    assert [index["lines"] for index in load_log_indexes(log_dir)] == [2]
+    assert not any(name.endswith(".lock") for name in os.listdir(log_dir))
+
+
+def read_segments(log_dir):
+    text = ""
+    for index in load_log_indexes(log_dir):
+        with gzip.open(os.path.join(log_dir, index["file"]), "rt", encoding="utf-8") as f:
+            text += f.read()
+    return text
+
+
+def test_store_keeps_writing_after_an_unexpected_error(log_dir, monkeypatch):
+    original_add = LogSegmentIndex.add
+
+    def add(self, text, now, size):
+        if "boom" in text:
+            raise RuntimeError("unexpected")
+        original_add(self, text, now, size)
+
+    monkeypatch.setattr(LogSegmentIndex, "add", add)
+    store = ServerLogStore(log_dir)
+    for text in ("before\n", "boom\n", "after\n"):
+        store.write(text)
+    store.close()
+
+    assert not store.thread.is_alive()
+    assert store.failed == 1
+    assert "after\n" in read_segments(log_dir) # Written to a new segment
+    assert not any(name.endswith((".log", ".lock")) for name in os.listdir(log_dir))
+
+
+def test_store_drops_oldest_output_when_queue_is_full(log_dir, monkeypatch):
+    monkeypatch.setattr(logs, "LOG_QUEUE_MAX_ITEMS", 5)
+    writer_busy, release = threading.Event(), threading.Event()
+    original_lock = logs.open_log_segment_lock
+
+    def slow_lock(log_dir, name):
+        writer_busy.set()
+        release.wait(10) # Simulates a disk that stalls while the server keeps printing
+        return original_lock(log_dir, name)
+
+    monkeypatch.setattr(logs, "open_log_segment_lock", slow_lock)
+    store = ServerLogStore(log_dir)
+    store.write("line 0\n")
+    assert writer_busy.wait(10)
+    for i in range(1, 11):
+        store.write(f"line {i}\n")
+    assert store.dropped == 5
+    release.set()
+    store.close()
+
+    lines = read_segments(log_dir).splitlines()
+    assert lines[0] == "line 0"
+    assert "丢弃了 5 块输出" in lines[1]
+    assert lines[2:] == [f"line {i}" for i in range(6, 11)]
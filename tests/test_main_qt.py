@@ -0,0 +1,442 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+pytest.importorskip("PyQt6.QtWidgets")
+
+from benchmarks.common import create_application, wait_until # Selects the offscreen Qt platform
+
+import main_qt
+from bedrock_core.packs import PACK_INDEX_FILENAME
+
+WAIT_TIMEOUT = 10 # 秒
+
+
+def manifest(name):
+    return json.dumps({"format_version": 2, "header": {"name": name, "uuid": "11111111-2222-3333-4444-555555555555",
+                                                      "version": [1, 0, 0]},
+                       "modules": [{"type": "data", "uuid": "66666666-7777-8888-9999-000000000000", "version": [1, 0, 0]}]})
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    return create_application(str(tmp_path_factory.mktemp("settings")))
+
+
+@pytest.fixture
+def window(app):
+    window = main_qt.PackManagerApp()
+    yield window
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+
+
+@pytest.fixture
+def server_root(tmp_path):
+    root = tmp_path / "server"
+    (root / "worlds").mkdir(parents=True)
+    plain = root / "behavior_packs" / "plain_pack"
+    plain.mkdir(parents=True)
+    (plain / "manifest.json").write_text(manifest("Plain v1"))
+    translated = root / "behavior_packs" / "translated_pack"
+    (translated / "texts").mkdir(parents=True)
+    (translated / "manifest.json").write_text(manifest("pack.name"))
+    (translated / "texts" / "en_US.lang").write_text("pack.name=Translated v1\n")
+    return str(root)
+
+
+def load(window, server_root):
+    window.load_server_root(server_root)
+    assert wait_until(lambda: window.pack_scan_thread is None, WAIT_TIMEOUT)
+
+
+def wait_for_name(window, folder_name, name):
+    item = lambda: window.server_pack_items["behavior"].get(folder_name)
+    return wait_until(lambda: item() is not None and item().text(1) == name, WAIT_TIMEOUT)
+
+
+def test_pack_edits_are_picked_up_without_relisting(window, server_root, monkeypatch):
+    load(window, server_root)
+    assert window.server_pack_items["behavior"]["plain_pack"].text(1) == "Plain v1"
+    assert window.server_pack_items["behavior"]["translated_pack"].text(1) == "Translated v1"
+    syncs = []
+    sync = window.sync_server_pack_dir
+    monkeypatch.setattr(window, "sync_server_pack_dir",
+                        lambda pack_type, changed_packs=(), relist=True: syncs.append((set(changed_packs), relist))
+                        or sync(pack_type, changed_packs, relist))
+    plain_manifest = os.path.join(server_root, "behavior_packs", "plain_pack", "manifest.json")
+
+    with open(plain_manifest, "w") as f: # In place: the pack folder itself does not change
+        f.write(manifest("Plain v2 (edited)"))
+    assert wait_for_name(window, "plain_pack", "Plain v2 (edited)")
+
+    with open(plain_manifest + ".tmp", "w") as f: # Saved by replacing the file, as many editors do
+        f.write(manifest("Plain v3"))
+    os.replace(plain_manifest + ".tmp", plain_manifest)
+    assert wait_for_name(window, "plain_pack", "Plain v3")
+    with open(plain_manifest, "w") as f: # Still watched after the replace
+        f.write(manifest("Plain v4 (edited again)"))
+    assert wait_for_name(window, "plain_pack", "Plain v4 (edited again)")
+
+    with open(os.path.join(server_root, "behavior_packs", "translated_pack", "texts", "en_US.lang"), "w") as f:
+        f.write("pack.name=Translated v2\n")
+    assert wait_for_name(window, "translated_pack", "Translated v2")
+
+    assert syncs and all(not relist for _, relist in syncs)
+    assert set().union(*(changed for changed, _ in syncs)) == {"plain_pack", "translated_pack"}
+    assert window.server_bp_tree.topLevelItemCount() == 2
+
+
+def test_added_and_removed_packs_are_synced(window, server_root):
+    load(window, server_root)
+    pack_dir = os.path.join(server_root, "behavior_packs")
+
+    os.mkdir(os.path.join(pack_dir, "copied_pack")) # Listed before its manifest.json has been copied
+    assert wait_until(lambda: "copied_pack" in window.server_pack_items["behavior"], WAIT_TIMEOUT)
+    with open(os.path.join(pack_dir, "copied_pack", "manifest.json"), "w") as f:
+        f.write(manifest("Copied"))
+    assert wait_for_name(window, "copied_pack", "Copied")
+
+    os.remove(os.path.join(pack_dir, "plain_pack", "manifest.json"))
+    os.rmdir(os.path.join(pack_dir, "plain_pack"))
+    assert wait_until(lambda: "plain_pack" not in window.server_pack_items["behavior"], WAIT_TIMEOUT)
+    assert sorted(window.server_pack_items["behavior"]) == ["copied_pack", "translated_pack"]
+    assert window.server_bp_tree.topLevelItemCount() == 2
+
+
+def add_packs(server_root, pack_type, count, name="Pack"):
+    for i in range(count):
+        pack = os.path.join(server_root, f"{pack_type}_packs", f"pack_{i:03}")
+        os.makedirs(pack, exist_ok=True)
+        with open(os.path.join(pack, "manifest.json"), "w") as f:
+            f.write(manifest(f"{name} {i}"))
+
+
+def run_scan_worker(server_root, cancel=False):
+    """Runs PackScanWorker in the calling thread; returns (rows in arrival order, scan_finished arguments)"""
+    pack_dirs = {pack_type: os.path.join(server_root, f"{pack_type}_packs") for pack_type in ("behavior", "resource")}
+    worker = main_qt.PackScanWorker(7, main_qt.PackIndex(server_root), pack_dirs, max_workers=4)
+    rows, finished = [], []
+    worker.batch_ready.connect(lambda generation, batch: rows.extend(batch))
+    worker.scan_finished.connect(lambda generation, cancelled: finished.append((generation, cancelled)))
+    if cancel:
+        worker.cancel()
+    worker.run()
+    return rows, finished
+
+
+def test_pack_scan_worker_reparses_only_changed_packs(app, server_root, monkeypatch):
+    monkeypatch.setattr(main_qt, "PACK_SCAN_BATCH_SIZE", 10)
+    add_packs(server_root, "resource", 50)
+    rows, finished = run_scan_worker(server_root)
+    assert finished == [(7, False)]
+    assert len(rows) == 52 and len({(pack_type, folder) for pack_type, folder, _, _ in rows}) == 52
+
+    parsed = []
+    read_pack_manifest = main_qt.read_pack_manifest
+    monkeypatch.setattr(main_qt, "read_pack_manifest", lambda pack_path: parsed.append(os.path.basename(pack_path))
+                        or read_pack_manifest(pack_path))
+    os.remove(os.path.join(server_root, "behavior_packs", "translated_pack", "texts", "en_US.lang"))
+    add_packs(server_root, "resource", 5, name="Changed") # The manifest size changes even within one mtime tick
+    rows, _ = run_scan_worker(server_root)
+
+    assert sorted(parsed) == ["pack_000", "pack_001", "pack_002", "pack_003", "pack_004", "translated_pack"]
+    names = {folder: details["name"] for _, folder, _, details in rows}
+    assert len(rows) == 52
+    assert names["pack_004"] == "Changed 4" and names["pack_005"] == "Pack 5"
+    assert names["translated_pack"] == "pack.name" # The lang file is gone, so the raw key is shown
+
+
+def test_cancelled_pack_scan_reports_nothing_and_keeps_index(app, server_root):
+    run_scan_worker(server_root)
+    index_path = os.path.join(server_root, PACK_INDEX_FILENAME)
+    saved = open(index_path).read()
+    add_packs(server_root, "resource", 3)
+
+    rows, finished = run_scan_worker(server_root, cancel=True)
+    assert rows == [] and finished == [(7, True)]
+    assert open(index_path).read() == saved
+
+
+def test_refresh_during_scan_shows_each_pack_once(window, server_root):
+    add_packs(server_root, "resource", 300)
+    window.load_server_root(server_root)
+    window.refresh_server_packs_list() # Supersedes the scan started by load_server_root
+    window.refresh_server_packs_list()
+    assert wait_until(lambda: window.pack_scan_thread is None, WAIT_TIMEOUT)
+    assert window.server_bp_tree.topLevelItemCount() == 2
+    assert window.server_rp_tree.topLevelItemCount() == 300
+
+
+def write_addon(path, folder_names):
+    with zipfile.ZipFile(path, "w") as zf:
+        for folder_name in folder_names:
+            zf.writestr(f"{folder_name}/manifest.json", manifest(folder_name))
+            zf.writestr(f"{folder_name}/scripts/main.js", "x" * 1000)
+    return str(path)
+
+
+def run_batch_import(window, file_paths, cancel=False):
+    window.start_batch_import(file_paths)
+    if cancel:
+        window.import_dialog.on_cancel_clicked()
+    assert wait_until(lambda: window.import_thread is None, WAIT_TIMEOUT)
+    dialog = window.import_dialog
+    return {dialog.table.item(row, 0).text(): dialog.table.item(row, 1).text() for row in range(dialog.table.rowCount())}
+
+
+def test_batch_import_reports_each_file(window, server_root, tmp_path):
+    load(window, server_root)
+    good = [write_addon(tmp_path / f"good_{i}.mcaddon", [f"addon_{i}_bp"]) for i in range(6)]
+    corrupt = tmp_path / "corrupt.mcpack"
+    corrupt.write_bytes(b"not a zip")
+    empty = write_addon(tmp_path / "empty.mcaddon", [])
+
+    states = run_batch_import(window, good + [str(corrupt), empty])
+
+    assert states == {**{f"good_{i}.mcaddon": "成功" for i in range(6)}, "corrupt.mcpack": "失败", "empty.mcaddon": "失败"}
+    assert window.import_dialog.summary_text() == "导入完成: 6 个成功, 2 个失败."
+    assert wait_until(lambda: window.pack_scan_thread is None, WAIT_TIMEOUT) # The list is refreshed once at the end
+    assert {f"addon_{i}_bp" for i in range(6)} <= set(window.server_pack_items["behavior"])
+
+
+def test_cancelled_batch_import_finishes_every_row(window, server_root, tmp_path):
+    load(window, server_root)
+    addons = [write_addon(tmp_path / f"addon_{i}.mcaddon", [f"addon_{i}_bp"]) for i in range(40)]
+
+    states = run_batch_import(window, addons, cancel=True)
+
+    assert set(states.values()) <= {"成功", "已取消"} and "已取消" in states.values()
+    assert window.import_dialog.finished_count == 40
+    imported = {name for name in os.listdir(os.path.join(server_root, "behavior_packs")) if name.startswith("addon_")}
+    assert imported == {f"addon_{i}_bp" for i, name in enumerate(addons) if states[os.path.basename(name)] == "成功"}
+
+
+def test_console_batches_output_into_one_flush(app, monkeypatch):
+    flushes = []
+    flush = main_qt.LogConsole.flush
+    monkeypatch.setattr(main_qt.LogConsole, "flush", lambda self: flushes.append(len(self.pending)) or flush(self))
+    console = main_qt.LogConsole()
+
+    for i in range(1000):
+        console.append_output(f"line {i}\n")
+    console.append_output("partial")
+    console.append_line("message") # Starts on a new line after unterminated output
+    assert console.toPlainText() == "" # Nothing is laid out until the timer fires
+    assert wait_until(lambda: not console.pending, WAIT_TIMEOUT)
+
+    assert flushes == [1002]
+    lines = console.toPlainText().split("\n")
+    assert lines[:2] == ["line 0", "line 1"] and lines[-3:] == ["partial", "message", ""]
+
+
+def test_console_keeps_bounded_lines_and_pending_output(app, monkeypatch):
+    console = main_qt.LogConsole()
+    console.append_output("".join(f"line {i}\n" for i in range(main_qt.CONSOLE_MAX_LINES + 1000)))
+    console.flush()
+    assert console.document().blockCount() <= main_qt.CONSOLE_MAX_LINES
+    assert console.toPlainText().split("\n")[-2] == f"line {main_qt.CONSOLE_MAX_LINES + 999}"
+
+    monkeypatch.setattr(main_qt, "CONSOLE_PENDING_LIMIT", 1000)
+    console.clear_console()
+    for i in range(1000): # A stalled GUI: the flush timer never gets to run
+        console.append_output(f"chunk {i}\n")
+    assert console.pending_size <= 1000
+    assert "".join(console.pending).endswith("chunk 999\n")
+
+
+def test_console_autoscrolls_only_when_at_bottom(app):
+    console = main_qt.LogConsole()
+    console.resize(400, 200)
+    console.show()
+    scroll_bar = console.verticalScrollBar()
+    console.append_output("".join(f"line {i}\n" for i in range(500)))
+    console.flush()
+    assert scroll_bar.value() == scroll_bar.maximum() > 0
+
+    scroll_bar.setValue(10) # The user scrolled up to read something
+    console.append_output("".join(f"more {i}\n" for i in range(100)))
+    console.flush()
+    assert scroll_bar.value() == 10
+    console.close()
+
+
+fake_server = pytest.mark.skipif(os.name != "posix", reason="the fake bedrock_server is a shebang script")
+
+
+@pytest.fixture
+def instance(app, server_root):
+    instance = main_qt.ServerInstance(server_root, "bedrock_server")
+    finished = []
+    instance.process_finished.connect(lambda exit_code, crashed: finished.append(crashed))
+    instance.finished_crashed = finished
+    yield instance
+    if instance.is_running():
+        instance.process.kill()
+        instance.process.waitForFinished(WAIT_TIMEOUT * 1000)
+    instance.wait_for_log_stores()
+    instance.deleteLater()
+    app.processEvents()
+
+
+def start_fake_server(instance, *args):
+    from benchmarks.fake_bedrock_server import install_fake_server
+    install_fake_server(instance.root_path, *args)
+    started = []
+    instance.server_event.connect(lambda event: event.kind == "server_started" and started.append(event))
+    assert instance.start() is None
+    assert wait_until(lambda: started, WAIT_TIMEOUT)
+    assert instance.state_text() == "运行中"
+
+
+def stop_and_wait(instance):
+    phases = []
+    instance.state_changed.connect(lambda: phases.append(instance.stop_phase))
+    instance.stop_timer.timeout.connect(lambda: phases.append(instance.stop_phase))
+    instance.stop()
+    assert instance.state_text() == "正在停止"
+    assert wait_until(lambda: instance.finished_crashed, WAIT_TIMEOUT)
+    assert instance.state_text() == "已停止"
+    assert instance.process is None and instance.stop_phase is None
+    assert not instance.write_command("list")
+    return [phase for phase in dict.fromkeys(phases) if phase is not None]
+
+
+@fake_server
+def test_stop_exits_gracefully(instance):
+    start_fake_server(instance)
+    assert instance.write_command("list")
+    assert stop_and_wait(instance) == ["stopping"]
+    assert instance.finished_crashed == [False]
+    assert "Quit correctly" in "".join(instance.recent_output)
+
+
+@fake_server
+@pytest.mark.parametrize("on_stop, phases", [
+    ("ignore", ["stopping", "terminating"]), # SIGTERM ends it
+    ("hang", ["stopping", "terminating", "killed"]), # SIGTERM is ignored, only kill ends it
+])
+def test_stop_escalates_when_server_does_not_exit(instance, monkeypatch, on_stop, phases):
+    monkeypatch.setattr(main_qt, "SERVER_STOP_TIMEOUT_MS", 300)
+    monkeypatch.setattr(main_qt, "SERVER_TERMINATE_TIMEOUT_MS", 300)
+    start_fake_server(instance, "--on-stop", on_stop)
+    assert stop_and_wait(instance) == phases
+    assert instance.finished_crashed == [True]
+
+
+@fake_server
+def test_second_stop_does_not_restart_escalation(instance, monkeypatch):
+    monkeypatch.setattr(main_qt, "SERVER_STOP_TIMEOUT_MS", 500)
+    start_fake_server(instance, "--on-stop", "ignore")
+    instance.stop()
+    wait_until(lambda: False, 0.3)
+    instance.stop() # Must not write another stop or push the terminate deadline back
+    assert instance.stop_phase == "stopping"
+    assert instance.stop_timer.remainingTime() < 300
+    assert wait_until(lambda: instance.finished_crashed, WAIT_TIMEOUT)
+    assert "".join(instance.recent_output).count("Stop ignored") == 1
+
+
+@fake_server
+def test_crash_is_reported(instance):
+    start_fake_server(instance, "--crash-after", "0.2")
+    assert wait_until(lambda: instance.finished_crashed, WAIT_TIMEOUT)
+    assert instance.finished_crashed == [True]
+    assert instance.state_text() == "已停止"
+    assert not instance.write_command("list")
+    instance.stop() # Nothing left to stop
+    assert "服务器未运行或已停止." in "".join(instance.recent_output)
+
+
+@fake_server
+def test_supervisor_refuses_port_conflicts_and_stops_all(window, tmp_path, monkeypatch):
+    from benchmarks.fake_bedrock_server import install_fake_server
+    warnings = []
+    monkeypatch.setattr(main_qt.QMessageBox, "warning", lambda parent, title, text: warnings.append(title))
+    roots = []
+    for name in ("alpha", "beta"):
+        root = tmp_path / name
+        (root / "worlds").mkdir(parents=True)
+        install_fake_server(str(root))
+        roots.append(str(root))
+    titles = [window.left_tab_widget.tabText(i) for i in range(window.left_tab_widget.count())]
+    window.left_tab_widget.setCurrentIndex(titles.index("服务器实例"))
+    alpha, beta = (window.get_server_instance(root) for root in roots)
+    table = window.supervisor_table
+    assert [table.item(row, 0).text() for row in range(table.rowCount())] == ["alpha", "beta"]
+    assert table.item(1, 4).text() == "19132 (alpha), 19133 (alpha)"
+
+    window.start_server_instance(alpha)
+    assert wait_until(lambda: alpha.state_text() == "运行中", WAIT_TIMEOUT)
+    window.start_server_instance(beta)
+    assert warnings == ["端口冲突"] and not beta.is_running()
+
+    with open(os.path.join(roots[1], "server.properties"), "w") as f:
+        f.write("server-port=29132\nserver-portv6=29133\n")
+    window.refresh_supervisor_table()
+    assert table.item(1, 2).text() == "29132 / 29133" and table.item(1, 4).text() == ""
+    window.start_server_instance(beta)
+    assert wait_until(lambda: beta.state_text() == "运行中", WAIT_TIMEOUT)
+    assert table.item(1, 1).text().startswith("运行中 (PID ")
+    assert "运行中 2 个" in window.supervisor_summary_label.text()
+
+    window.stop_all_instances()
+    assert wait_until(lambda: not alpha.is_running() and not beta.is_running(), WAIT_TIMEOUT)
+    assert [table.item(row, 1).text() for row in range(2)] == ["已停止", "已停止"]
+    assert "运行中 0 个" in window.supervisor_summary_label.text()
+    for instance in (alpha, beta):
+        instance.wait_for_log_stores()
+
+
+def select_tab(window, title):
+    titles = [window.left_tab_widget.tabText(i) for i in range(window.left_tab_widget.count())]
+    window.left_tab_widget.setCurrentIndex(titles.index(title))
+
+
+def test_console_tabs_are_built_on_first_open(window, server_root):
+    assert not window.server_console_built
+    assert not hasattr(window, "server_log_display") and not hasattr(window, "supervisor_table")
+    load(window, server_root)
+    window.server_instance.message("output before the tab existed")
+
+    select_tab(window, "服务器控制台")
+    assert window.server_console_built
+    console = window.server_log_display
+    assert not hasattr(window, "supervisor_table") # Only the opened tab is built
+    select_tab(window, "服务器实例")
+    select_tab(window, "服务器控制台")
+    assert window.server_log_display is console # Built once
+    console.flush()
+    assert "output before the tab existed" in console.toPlainText()
+    window.server_instance.message("output after")
+    console.flush()
+    assert console.toPlainText().rstrip().endswith("output after")
+
+
+def test_last_server_root_loads_after_first_paint(app, server_root):
+    settings = main_qt.QSettings(main_qt.SETTINGS_ORGANIZATION, main_qt.SETTINGS_APPLICATION)
+    settings.setValue("restore_last_server_root", True)
+    settings.setValue("last_server_root", server_root)
+    settings.setValue("worlds_snapshot", json.dumps({"root": server_root, "worlds": [["Cached World", "cached"]]}))
+    window = main_qt.PackManagerApp()
+    try:
+        # Only the cached world list is shown while the window is being built
+        assert window.startup_pending_root == server_root and not window.server_root_path
+        assert window.pack_scan_thread is None and not window.worlds_list.isEnabled()
+        assert window.worlds_list.topLevelItem(0).text(0) == "Cached World"
+
+        window.show()
+        assert wait_until(lambda: window.first_paint_done and window.startup_pending_root is None, WAIT_TIMEOUT)
+        assert wait_until(lambda: window.pack_scan_thread is None, WAIT_TIMEOUT)
+        assert window.server_root_path == server_root and window.worlds_list.isEnabled()
+        assert set(window.server_pack_items["behavior"]) == {"plain_pack", "translated_pack"}
+        assert window.worlds_list.topLevelItemCount() == 0 # The real scan replaced the cached rows
+    finally:
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+        for key in ("last_server_root", "worlds_snapshot"):
+            settings.remove(key)
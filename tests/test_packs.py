@@ -0,0 +1,237 @@
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import zipfile
+
+import pytest
+
+from bedrock_core import packs
+from bedrock_core.packs import (PACK_INDEX_FILENAME, PACK_STORE_DIRNAME, PackIndex, find_pack_in_zip, import_pack_archive,
+                                iter_archive_packs, pack_target_dir, scan_server_packs)
+from bedrock_core.storage import ContentStore
+
+
+def manifest(module_type="data", name="Test"):
+    return json.dumps({"format_version": 2, "header": {"name": name, "uuid": "11111111-2222-3333-4444-555555555555",
+                                                      "version": [1, 0, 0]},
+                       "modules": [{"type": module_type, "uuid": "66666666-7777-8888-9999-000000000000",
+                                    "version": [1, 0, 0]}]})
+
+
+def write_archive(path, members):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return str(path)
+
+
+@pytest.fixture
+def server_root(tmp_path):
+    root = tmp_path / "server"
+    installed = root / "behavior_packs" / "installed_pack"
+    installed.mkdir(parents=True)
+    (installed / "manifest.json").write_text(manifest())
+    return str(root)
+
+
+def test_import_mcaddon_pack_folder(server_root, tmp_path):
+    archive = write_archive(tmp_path / "addon.mcaddon", {"my_bp/manifest.json": manifest(), "my_bp/scripts/main.js": "x"})
+    imported, skipped = import_pack_archive(archive, server_root)
+    assert imported == [("behavior", "my_bp")] and skipped == []
+    with open(os.path.join(server_root, "behavior_packs", "my_bp", "scripts", "main.js")) as f:
+        assert f.read() == "x"
+    assert os.path.exists(os.path.join(server_root, "behavior_packs", "installed_pack", "manifest.json"))
+
+
+def zip_bytes(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("members, prefix", [
+    ({"manifest.json": "{}", "pack_icon.png": ""}, ""),
+    ({"My Pack/manifest.json": "{}", "My Pack/texts/en_US.lang": ""}, "My Pack/"),
+    ({"a/b/manifest.json": "{}"}, None), # Only the root or one folder deep
+    ({"readme.txt": ""}, None),
+])
+def test_find_pack_in_zip(members, prefix):
+    with zipfile.ZipFile(io.BytesIO(zip_bytes(members))) as zf:
+        assert find_pack_in_zip(zf) == prefix
+
+
+def test_iter_archive_packs_names(tmp_path):
+    mcpack = write_archive(tmp_path / "Cool RP.mcpack", {"manifest.json": manifest("resources")})
+    nested_root = zip_bytes({"manifest.json": manifest()})
+    nested_folder = zip_bytes({"inner_rp/manifest.json": manifest("resources")})
+    addon = write_archive(tmp_path / "bundle.mcaddon", {"Root BP.mcpack": nested_root, "folder.mcpack": nested_folder,
+                                                         "plain_bp/manifest.json": manifest()})
+    with contextlib.ExitStack() as stack:
+        with zipfile.ZipFile(mcpack) as zf:
+            assert [(prefix, name) for _, prefix, name in iter_archive_packs(zf, mcpack, stack)] == [("", "Cool RP")]
+        zf = stack.enter_context(zipfile.ZipFile(addon))
+        assert sorted((prefix, name) for _, prefix, name in iter_archive_packs(zf, addon, stack)) == [
+            ("", "Root BP"), ("inner_rp/", "inner_rp"), ("plain_bp/", "plain_bp")]
+
+
+@pytest.mark.parametrize("member", ["/manifest.json", "../manifest.json", "./manifest.json", "C:/manifest.json"])
+def test_import_rejects_unsafe_pack_folder(server_root, tmp_path, member):
+    archive = write_archive(tmp_path / "evil.mcaddon", {member: manifest(), "installed_pack/manifest.json": manifest()})
+    with pytest.raises(ValueError):
+        import_pack_archive(archive, server_root)
+    # Nothing was replaced: the existing packs and the server root are untouched
+    assert os.listdir(os.path.join(server_root, "behavior_packs")) == ["installed_pack"]
+    assert os.path.exists(os.path.join(server_root, "behavior_packs", "installed_pack", "manifest.json"))
+
+
+@pytest.mark.parametrize("name", ["", ".", "..", "a/b", "a\\b", "C:", "../x"])
+def test_pack_target_dir_rejects_unsafe_names(tmp_path, name):
+    with pytest.raises(ValueError):
+        pack_target_dir(str(tmp_path), "behavior", name)
+
+
+def test_pack_target_dir_is_direct_child(tmp_path):
+    target = pack_target_dir(str(tmp_path), "resource", "my_rp")
+    assert os.path.dirname(target) == os.path.join(os.path.abspath(tmp_path), "resource_packs")
+
+
+def test_editing_imported_pack_leaves_world_copy_and_store(server_root, tmp_path):
+    archive = write_archive(tmp_path / "addon.mcaddon", {"my_bp/manifest.json": manifest(), "my_bp/main.js": "original"})
+    world_path = os.path.join(server_root, "worlds", "W")
+    import_pack_archive(archive, server_root, world_path=world_path)
+
+    with open(os.path.join(server_root, "behavior_packs", "my_bp", "main.js"), "r+") as f:
+        f.write("EDITED")
+
+    with open(os.path.join(world_path, "behavior_packs", "my_bp", "main.js")) as f:
+        assert f.read() == "original"
+    store = ContentStore(os.path.join(server_root, PACK_STORE_DIRNAME))
+    with open(store.object_path(hashlib.sha256(b"original").hexdigest()), "rb") as f:
+        assert f.read() == b"original"
+
+
+def test_concurrent_imports_of_same_pack(server_root, tmp_path, monkeypatch):
+    # Two archives of one batch import can target the same behavior_packs/<folder>
+    archives = [write_archive(tmp_path / f"v{i}.mcaddon", {"my_bp/manifest.json": manifest(),
+                                                           **{f"my_bp/file{n}.js": str(i) for n in range(20)}})
+                for i in range(2)]
+    replace_dir = packs.replace_dir
+    active = []
+    def slow_replace_dir(src_dir, dest_dir, staging_root, keep_old_path=None):
+        active.append(dest_dir)
+        try:
+            assert active.count(dest_dir) == 1, "two imports are swapping the same folder at once"
+            time.sleep(0.05) # Widen the window between the exists-check and the renames
+            replace_dir(src_dir, dest_dir, staging_root, keep_old_path)
+        finally:
+            active.remove(dest_dir)
+    monkeypatch.setattr(packs, "replace_dir", slow_replace_dir)
+
+    barrier = threading.Barrier(len(archives))
+    errors = []
+    def run(archive):
+        barrier.wait()
+        try:
+            import_pack_archive(archive, server_root)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=run, args=(archive,)) for archive in archives]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    pack_dir = os.path.join(server_root, "behavior_packs", "my_bp")
+    assert len({open(os.path.join(pack_dir, f"file{n}.js")).read() for n in range(20)}) == 1 # One whole version won
+    assert sorted(os.listdir(os.path.join(server_root, "behavior_packs"))) == ["installed_pack", "my_bp"]
+
+
+def test_reimport_collects_replaced_pack_files(server_root, tmp_path):
+    store = ContentStore(os.path.join(server_root, PACK_STORE_DIRNAME))
+    first = write_archive(tmp_path / "v1.mcaddon", {"my_bp/manifest.json": manifest(), "my_bp/old.js": "old"})
+    second = write_archive(tmp_path / "v2.mcaddon", {"my_bp/manifest.json": manifest(), "my_bp/new.js": "new"})
+    import_pack_archive(first, server_root, world_path=os.path.join(server_root, "worlds", "W"))
+    import_pack_archive(second, server_root)
+
+    # The world copy still uses old.js, so it survives until that copy is gone too
+    assert store.collect_garbage() == 0
+    shutil.rmtree(os.path.join(server_root, "worlds", "W", "behavior_packs", "my_bp"))
+    assert store.collect_garbage() == len("old")
+    assert os.path.exists(os.path.join(server_root, "behavior_packs", "my_bp", "new.js"))
+    assert os.path.exists(store.object_path(hashlib.sha256(b"new").hexdigest()))
+
+
+@pytest.fixture
+def manifest_reads(monkeypatch):
+    """Records the pack folders whose manifest.json actually gets parsed"""
+    reads = []
+    read_pack_manifest = packs.read_pack_manifest
+    def counting_read(pack_path):
+        reads.append(os.path.basename(pack_path))
+        return read_pack_manifest(pack_path)
+    monkeypatch.setattr(packs, "read_pack_manifest", counting_read)
+    return reads
+
+
+def scanned_names(server_root):
+    return {folder_name: details["name"] for folder_name, _, _, details in scan_server_packs(server_root)["behavior"]}
+
+
+def test_pack_index_reuses_unchanged_entries(server_root, manifest_reads):
+    assert scanned_names(server_root) == {"installed_pack": "Test"}
+    assert manifest_reads == ["installed_pack"]
+    assert os.path.exists(os.path.join(server_root, PACK_INDEX_FILENAME))
+
+    manifest_reads.clear()
+    assert scanned_names(server_root) == {"installed_pack": "Test"}
+    assert manifest_reads == []
+
+
+def test_pack_index_invalidates_changed_and_removed_packs(server_root, manifest_reads):
+    scanned_names(server_root)
+    pack_dir = os.path.join(server_root, "behavior_packs", "installed_pack")
+    with open(os.path.join(pack_dir, "manifest.json"), "w") as f:
+        f.write(manifest(name="Renamed pack")) # Different size, so the signature changes even within one mtime tick
+    manifest_reads.clear()
+    assert scanned_names(server_root) == {"installed_pack": "Renamed pack"}
+    assert manifest_reads == ["installed_pack"]
+
+    shutil.rmtree(pack_dir)
+    assert scanned_names(server_root) == {}
+    assert PackIndex(server_root).entries == {}
+
+
+def test_pack_index_tracks_lang_file_for_translated_names(server_root, manifest_reads):
+    pack_dir = os.path.join(server_root, "behavior_packs", "installed_pack")
+    with open(os.path.join(pack_dir, "manifest.json"), "w") as f:
+        f.write(manifest(name="pack.name"))
+    os.makedirs(os.path.join(pack_dir, "texts"))
+    lang_path = os.path.join(pack_dir, "texts", "en_US.lang")
+    with open(lang_path, "w") as f:
+        f.write("pack.name=Old name\n")
+    assert scanned_names(server_root) == {"installed_pack": "Old name"}
+
+    with open(lang_path, "w") as f:
+        f.write("pack.name=A new name\n")
+    manifest_reads.clear()
+    assert scanned_names(server_root) == {"installed_pack": "A new name"}
+    assert manifest_reads == ["installed_pack"]
+
+
+def test_pack_index_ignores_corrupt_or_old_index(server_root):
+    index_path = os.path.join(server_root, PACK_INDEX_FILENAME)
+    with open(index_path, "w") as f:
+        f.write("{not json")
+    assert PackIndex(server_root).entries == {}
+    with open(index_path, "w") as f:
+        json.dump({"version": 0, "packs": {"behavior_packs/x": {}}}, f)
+    assert PackIndex(server_root).entries == {}
+    assert scanned_names(server_root) == {"installed_pack": "Test"}
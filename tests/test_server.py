@@ -0,0 +1,158 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bedrock_core.server import (SAVE_QUERY_READY_MARKER, ProcessSampler, ServerEventParser, copy_hot_backup_files,
+                                 find_port_conflicts, parse_save_query_files, server_ports)
+
+
+SAVE_QUERY_REPLY = ("[2024-01-01 12:00:00:000 INFO] " + SAVE_QUERY_READY_MARKER + "\n"
+                    "W/db/000005.ldb:1024, W/db/CURRENT:16, W/level.dat:42\n")
+
+
+@pytest.mark.parametrize("output, files", [
+    ("Saving...\n", None), # save hold still in progress
+    ("[INFO] " + SAVE_QUERY_READY_MARKER + "\n", None), # The file list line has not arrived yet
+    ("[INFO] " + SAVE_QUERY_READY_MARKER + "\nW/db/000005.ldb:10", None), # Nor completely
+    (SAVE_QUERY_REPLY, [("W/db/000005.ldb", 1024), ("W/db/CURRENT", 16), ("W/level.dat", 42)]),
+    ("noise\n" + SAVE_QUERY_REPLY + "[INFO] Player connected: Steve, xuid: 1\n",
+     [("W/db/000005.ldb", 1024), ("W/db/CURRENT", 16), ("W/level.dat", 42)]),
+    ("[INFO] " + SAVE_QUERY_READY_MARKER + "\nMy World: 2/db/CURRENT:16\n", [("My World: 2/db/CURRENT", 16)]),
+    ("[INFO] " + SAVE_QUERY_READY_MARKER + "\nW/level.dat:abc\n", None),
+])
+def test_parse_save_query_files(output, files):
+    assert parse_save_query_files(output) == files
+
+
+def test_parse_save_query_files_uses_latest_reply():
+    older = "[INFO] " + SAVE_QUERY_READY_MARKER + "\nW/level.dat:1\n"
+    assert parse_save_query_files(older + SAVE_QUERY_REPLY)[-1] == ("W/level.dat", 42)
+
+
+def test_copy_hot_backup_files_truncates_to_reported_lengths(tmp_path):
+    worlds_dir = tmp_path / "worlds"
+    world = worlds_dir / "W"
+    (world / "db").mkdir(parents=True)
+    (world / "db" / "000005.ldb").write_bytes(b"a" * 100 + b"written after save hold")
+    (world / "db" / "stale.ldb").write_bytes(b"not part of the saved state")
+    (world / "level.dat").write_bytes(b"level")
+    (world / "world_behavior_packs.json").write_text("[]")
+    dest = tmp_path / "staging"
+
+    copy_hot_backup_files(str(worlds_dir), "W", [("W/db/000005.ldb", 100), ("W/level.dat", 5)], str(dest))
+
+    assert (dest / "db" / "000005.ldb").read_bytes() == b"a" * 100
+    assert not (dest / "db" / "stale.ldb").exists()
+    assert (dest / "level.dat").read_bytes() == b"level"
+    assert (dest / "world_behavior_packs.json").read_text() == "[]" # Outside db/: copied as is
+    assert os.path.getmtime(dest / "level.dat") == os.path.getmtime(world / "level.dat")
+
+
+@pytest.mark.parametrize("line, kind, data", [
+    ("[2024-01-01 12:00:00:123 INFO] Player connected: Steve Jobs, xuid: 2535400000000001", "player_connected",
+     {"player": "Steve Jobs", "xuid": "2535400000000001"}),
+    ("[2024-01-01 12:00:00:123 INFO] Player disconnected: Alex, xuid: 2535400000000002, pfid: abc", "player_disconnected",
+     {"player": "Alex", "xuid": "2535400000000002"}),
+    ("[2024-01-01 12:00:00:123 INFO] Player Spawned: Alex xuid: 2535400000000002, pfid: abc", "player_spawned",
+     {"player": "Alex", "xuid": "2535400000000002"}),
+    ("[2024-01-01 12:00:00:123 INFO] Server started.", "server_started", {}),
+    ("[2024-01-01 12:00:00:123 INFO] Version: 1.20.81.01", "server_version", {"version": "1.20.81.01"}),
+    ("[2024-01-01 12:00:00:123 INFO] IPv4 supported, port: 19132: Used for gameplay", "port_open",
+     {"protocol": "IPv4", "port": "19132"}),
+    ("[2024-01-01 12:00:00:123 ERROR] [Scripting] TypeError: x is undefined", "script_error",
+     {"error": "TypeError: x is undefined"}),
+    ("[2024-01-01 12:00:00:123 INFO] [Scripting] Unhandled promise rejection: boom", "script_error",
+     {"error": "Unhandled promise rejection: boom"}),
+    ("[2024-01-01 12:00:00:123 ERROR] Failed to open level", "error", {"message": "Failed to open level"}),
+    ("NO LOG FILE! - setting up server logging...", None, None),
+    ("[2024-01-01 12:00:00:123 INFO] [Scripting] hello from console.log", None, None), # Not an error
+    ("[2024-01-01 12:00:00:123 INFO] Player connected without a name", None, None),
+])
+def test_server_event_parser_lines(line, kind, data):
+    event = ServerEventParser().parse_line(line)
+    if kind is None:
+        assert event is None
+    else:
+        assert (event.kind, event.data, event.line) == (kind, data, line)
+
+
+def test_server_event_parser_timestamps_and_levels():
+    event = ServerEventParser().parse_line("[2024-01-01 12:00:00:123 INFO] Server started.")
+    assert (event.timestamp, event.level) == ("2024-01-01 12:00:00", "INFO")
+    event = ServerEventParser().parse_line("Server started.") # Older servers print bare lines
+    assert (event.kind, event.timestamp, event.level) == ("server_started", None, None)
+
+
+def test_server_event_parser_joins_lines_across_chunks_and_dispatches():
+    parser = ServerEventParser()
+    connected, everything = [], []
+    parser.subscribe("player_connected", connected.append)
+    parser.subscribe(None, everything.append)
+
+    prefix = "[2024-01-01 12:00:00:123 INFO] "
+    assert parser.feed(prefix + "Player conn") == []
+    events = parser.feed(f"ected: Steve, xuid: 1\r\n{prefix}Server started.\n{prefix}Player connected: Alex, xuid: 2")
+    assert [event.kind for event in events] == ["player_connected", "server_started"]
+    assert [event.data["player"] for event in connected] == ["Steve"]
+    assert events[0].line == prefix + "Player connected: Steve, xuid: 1" # Without the \r
+
+    assert [event.data["player"] for event in parser.finish()] == ["Alex"] # The unterminated last line
+    assert [event.kind for event in everything] == ["player_connected", "server_started", "player_connected"]
+    assert parser.finish() == []
+
+
+def write_properties(root, text):
+    root.mkdir()
+    (root / "server.properties").write_text(text)
+    return str(root)
+
+
+def test_find_port_conflicts_between_server_roots(tmp_path):
+    default = write_properties(tmp_path / "default", "# Default ports\nlevel-name=W\n")
+    same_v4 = write_properties(tmp_path / "same_v4", "server-port=19132\nserver-portv6=29133\n")
+    separate = write_properties(tmp_path / "separate", "server-port=29132\nserver-portv6=bad\n")
+
+    assert server_ports(separate) == {"server-port": 29132, "server-portv6": 19133} # Invalid values fall back
+    conflicts = find_port_conflicts([default, same_v4, separate])
+    assert conflicts == {default: [(19132, same_v4), (19133, separate)],
+                         same_v4: [(19132, default)],
+                         separate: [(19133, default)]}
+    assert find_port_conflicts([same_v4, str(tmp_path / "missing")]) == {
+        same_v4: [(19132, str(tmp_path / "missing"))], str(tmp_path / "missing"): [(19132, same_v4)]}
+
+
+proc_only = pytest.mark.skipif(not ProcessSampler.supported(), reason="needs /proc")
+
+
+@proc_only
+def test_process_sampler_samples_a_live_process():
+    sampler = ProcessSampler(history_size=3)
+    assert sampler.attach(os.getpid())
+    first = sampler.sample()
+    assert first.cpu_percent is None and first.read_bytes_per_s is None # Rates need two samples
+    sum(i * i for i in range(200000)) # Burn some CPU between samples
+    samples = [sampler.sample() for _ in range(4)]
+    assert sampler.samples() == samples[1:] # The ring buffer keeps only the newest
+    latest = sampler.latest()
+    assert latest.cpu_percent >= 0 and latest.threads >= 1
+    assert 0 < latest.rss_bytes <= latest.peak_rss_bytes
+    assert sampler.overhead() > 0
+    sampler.detach()
+    assert sampler.sample() is None
+
+
+@proc_only
+def test_process_sampler_stops_when_process_exits():
+    sampler = ProcessSampler()
+    assert not sampler.attach(0)
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    try:
+        assert sampler.attach(process.pid)
+        assert sampler.sample() is not None
+    finally:
+        process.kill()
+        process.wait() # Reaped: the open /proc files now fail with ESRCH
+    assert sampler.sample() is None
+    assert sampler.pid is None and sampler.fds == {}
@@ -0,0 +1,99 @@
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+
+from bedrock_core.storage import ContentStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ContentStore(str(tmp_path / "store"))
+
+
+@pytest.fixture(params=["reflink_or_copy", "copy"])
+def copying_store(request, store):
+    if request.param == "copy":
+        # Filesystems without reflinks (ext4, tmpfs, NTFS, ...) fall back to plain copies
+        store.reflink_supported = False
+    return store
+
+
+def materialize_dir(store, target_dir, contents):
+    os.makedirs(target_dir, exist_ok=True)
+    object_paths = []
+    for name, data in contents.items():
+        object_path = store.add_stream(io.BytesIO(data))
+        store.materialize(object_path, os.path.join(target_dir, name))
+        object_paths.append(object_path)
+    store.set_refs(target_dir, object_paths)
+    return object_paths
+
+
+def test_add_stream_deduplicates(store):
+    first = store.add_stream(io.BytesIO(b"same"))
+    second = store.add_stream(io.BytesIO(b"same"))
+    assert first == second == store.object_path(hashlib.sha256(b"same").hexdigest())
+    with open(first, "rb") as f:
+        assert f.read() == b"same"
+
+
+def test_collect_garbage_keeps_referenced_objects(copying_store, tmp_path):
+    kept = materialize_dir(copying_store, str(tmp_path / "pack_a"), {"a.txt": b"a", "shared.txt": b"shared"})
+    assert copying_store.collect_garbage() == 0
+    assert all(os.path.exists(path) for path in kept)
+
+
+def test_collect_garbage_removes_replaced_and_deleted_targets(copying_store, tmp_path):
+    old = materialize_dir(copying_store, str(tmp_path / "pack_a"), {"old.txt": b"old", "shared.txt": b"shared"})
+    # Re-importing the pack replaces its refs; the other pack keeps the shared file alive
+    for name in os.listdir(tmp_path / "pack_a"):
+        os.unlink(tmp_path / "pack_a" / name)
+    new = materialize_dir(copying_store, str(tmp_path / "pack_a"), {"new.txt": b"new"})
+    other = materialize_dir(copying_store, str(tmp_path / "pack_b"), {"shared.txt": b"shared"})
+
+    assert copying_store.collect_garbage() == len(b"old")
+    assert not os.path.exists(old[0])
+    assert all(os.path.exists(path) for path in new + other)
+
+    for name in os.listdir(tmp_path / "pack_b"):
+        os.unlink(tmp_path / "pack_b" / name)
+    os.rmdir(tmp_path / "pack_b")
+    assert copying_store.collect_garbage() == len(b"shared")
+    assert os.listdir(copying_store.refs_dir) == [os.path.basename(copying_store.ref_path(str(tmp_path / "pack_a")))]
+
+
+def test_collect_garbage_keeps_unregistered_linked_objects(store, tmp_path):
+    # Stores written before refs existed: objects still hardlinked from a pack folder survive
+    object_path = store.add_stream(io.BytesIO(b"legacy"))
+    os.link(object_path, tmp_path / "legacy.txt")
+    unlinked = store.add_stream(io.BytesIO(b"orphan"))
+    store.collect_garbage()
+    assert os.path.exists(object_path) and not os.path.exists(unlinked)
+
+
+def test_editing_materialized_copy_leaves_store_and_other_copies(copying_store, tmp_path):
+    [object_path] = materialize_dir(copying_store, str(tmp_path / "server_pack"), {"main.js": b"original"})
+    materialize_dir(copying_store, str(tmp_path / "world_pack"), {"main.js": b"original"})
+
+    with open(tmp_path / "server_pack" / "main.js", "r+b") as f: # Edited in place, as an editor saving over it would
+        f.write(b"EDITED")
+
+    assert (tmp_path / "world_pack" / "main.js").read_bytes() == b"original"
+    with open(object_path, "rb") as f:
+        assert hashlib.sha256(f.read()).hexdigest() == os.path.basename(object_path)
+
+
+def test_collect_garbage_waits_for_writers(store, tmp_path):
+    # An import holds the shared lock between add_stream() and set_refs(); collection must not run in between
+    collected = threading.Event()
+    with store.lock():
+        object_path = store.add_stream(io.BytesIO(b"in flight"))
+        collector = threading.Thread(target=lambda: (store.collect_garbage(), collected.set()))
+        collector.start()
+        assert not collected.wait(0.2)
+        store.set_refs(str(tmp_path), [object_path])
+    collector.join(5)
+    assert collected.is_set() and os.path.exists(object_path)
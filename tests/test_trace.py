@@ -0,0 +1,88 @@
+import json
+import threading
+
+import pytest
+
+from bedrock_core import trace
+
+
+@pytest.fixture
+def tracing():
+    trace.clear()
+    trace.set_enabled(True)
+    yield
+    trace.set_enabled(False)
+    trace.clear()
+
+
+def complete_events():
+    return {event["name"]: event for event in trace.chrome_trace()["traceEvents"] if event["ph"] == "X"}
+
+
+def test_disabled_tracing_records_nothing():
+    trace.clear()
+    assert not trace.is_enabled()
+    with trace.span("ignored", file="x") as s:
+        s.add(bytes=1)
+    assert s is trace.NULL_SPAN
+    assert trace.event_count() == 0
+
+
+def test_nested_spans_with_counters_and_errors(tracing):
+    @trace.traced(category="io")
+    def copy_files():
+        with trace.span("inner", "io", file="a") as inner:
+            inner.add(bytes=10, files=1)
+            inner.add(bytes=5)
+
+    with trace.span("outer") as outer:
+        copy_files()
+        outer.set(result="ok")
+    with pytest.raises(ValueError):
+        with trace.span("failing"):
+            raise ValueError("boom")
+
+    events = complete_events()
+    name = "test_nested_spans_with_counters_and_errors.<locals>.copy_files"
+    assert set(events) == {"outer", name, "inner", "failing"}
+    outer, wrapped, inner = events["outer"], events[name], events["inner"]
+    assert inner["args"] == {"file": "a", "bytes": 15, "files": 1}
+    assert (outer["cat"], wrapped["cat"], outer["args"]) == ("op", "io", {"result": "ok"})
+    # Children lie inside their parents on the same thread, which is how the viewers nest them
+    for parent, child in ((outer, wrapped), (wrapped, inner)):
+        assert parent["tid"] == child["tid"]
+        assert parent["ts"] <= child["ts"] and child["ts"] + child["dur"] <= parent["ts"] + parent["dur"]
+    assert events["failing"]["args"] == {"error": "ValueError"}
+
+
+def test_export_chrome_trace_names_threads(tracing, tmp_path):
+    def work():
+        with trace.span("in worker"):
+            pass
+
+    worker = threading.Thread(target=work, name="scan worker")
+    worker.start()
+    worker.join()
+    with trace.span("in main"):
+        pass
+
+    path = str(tmp_path / "trace.json")
+    assert trace.export_chrome_trace(path) == 5 # Process name, two thread names, two spans
+    with open(path, encoding="utf-8") as f:
+        exported = json.load(f)
+    metadata = {event["tid"]: event["args"]["name"] for event in exported["traceEvents"] if event["name"] == "thread_name"}
+    spans = {event["name"]: event["tid"] for event in exported["traceEvents"] if event["ph"] == "X"}
+    assert metadata[spans["in worker"]] == "scan worker"
+    assert metadata[spans["in main"]] == threading.current_thread().name
+    assert exported["displayTimeUnit"] == "ms"
+    assert not (tmp_path / "trace.json.tmp").exists()
+
+
+def test_enable_from_env(monkeypatch):
+    monkeypatch.delenv(trace.TRACE_ENV_VAR, raising=False)
+    assert trace.enable_from_env() is None and not trace.is_enabled()
+    monkeypatch.setenv(trace.TRACE_ENV_VAR, "/tmp/out.json")
+    try:
+        assert trace.enable_from_env() == "/tmp/out.json" and trace.is_enabled()
+    finally:
+        trace.set_enabled(False)